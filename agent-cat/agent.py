@@ -3,7 +3,6 @@ import os
 import asyncio
 
 import httpx
-import aiohttp
 import numpy as np
 from dotenv import load_dotenv
 
@@ -13,6 +12,7 @@ from livekit.agents import (
     Agent,
     AgentSession,
     JobContext,
+    JobProcess,
     WorkerOptions,
     cli,
     tts as tts_module,
@@ -22,6 +22,7 @@ from livekit.agents import (
 from livekit.agents.types import DEFAULT_API_CONNECT_OPTIONS
 from livekit.agents.beta.tools import EndCallTool
 from livekit.plugins import openai as lk_openai, deepgram, silero
+import http_client
 from session_logger import SessionLogger
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
@@ -161,32 +162,32 @@ async def search_knowledge(query: str) -> str:
     if not PINECONE_API_KEY or not PINECONE_INDEX_HOST:
         return ""
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                f"{PINECONE_INDEX_HOST}/records/namespaces/__default__/search",
-                headers={
-                    "Api-Key": PINECONE_API_KEY,
-                    "Content-Type": "application/json",
-                    "X-Pinecone-Api-Version": "2025-10",
-                },
-                json={
-                    "query": {"inputs": {"text": query}, "top_k": 4},
-                    "fields": ["text", "category"],
-                },
-            ) as res:
-                if res.status != 200:
-                    return ""
-                data = await res.json()
-                hits = data.get("result", {}).get("hits", [])
-                relevant = [
-                    h["fields"]["text"]
-                    for h in hits
-                    if (h.get("_score", 0) >= 0.2 and h.get("fields", {}).get("text"))
-                ]
-                if relevant:
-                    context = "\n".join(f"{i+1}. {t}" for i, t in enumerate(relevant))
-                    return f"Relevant knowledge from our knowledge base:\n{context}"
+        session = http_client.session()
+        async with session.post(
+            f"{PINECONE_INDEX_HOST}/records/namespaces/__default__/search",
+            headers={
+                "Api-Key": PINECONE_API_KEY,
+                "Content-Type": "application/json",
+                "X-Pinecone-Api-Version": "2025-10",
+            },
+            json={
+                "query": {"inputs": {"text": query}, "top_k": 4},
+                "fields": ["text", "category"],
+            },
+        ) as res:
+            if res.status != 200:
                 return ""
+            data = await res.json()
+            hits = data.get("result", {}).get("hits", [])
+            relevant = [
+                h["fields"]["text"]
+                for h in hits
+                if (h.get("_score", 0) >= 0.2 and h.get("fields", {}).get("text"))
+            ]
+            if relevant:
+                context = "\n".join(f"{i+1}. {t}" for i, t in enumerate(relevant))
+                return f"Relevant knowledge from our knowledge base:\n{context}"
+            return ""
     except Exception as e:
         logger.error(f"Pinecone search error: {e}")
         return ""
@@ -225,6 +226,10 @@ class CatAgent(Agent):
 
 
 
+def prewarm(proc: JobProcess):
+    http_client.prewarm([PINECONE_INDEX_HOST])
+
+
 async def entrypoint(ctx: JobContext):
     session_log = SessionLogger()
 
@@ -233,6 +238,8 @@ async def entrypoint(ctx: JobContext):
         await session_log.send_email()
 
     ctx.add_shutdown_callback(send_report)
+    http_client.start()
+    ctx.add_shutdown_callback(http_client.close)
     await ctx.connect()
     logger.info("Cat agent connected to LiveKit room")
 
@@ -267,5 +274,6 @@ async def entrypoint(ctx: JobContext):
 if __name__ == "__main__":
     cli.run_app(WorkerOptions(
         entrypoint_fnc=entrypoint,
+        prewarm_fnc=prewarm,
         agent_name="aimediaflow-cat-agent"
     ))
@@ -10,6 +10,7 @@ from livekit.agents import (
     Agent,
     AgentSession,
     JobContext,
+    JobProcess,
     WorkerOptions,
     WorkerType,
     cli,
@@ -21,6 +22,8 @@ from livekit.plugins import groq as lk_groq
 from livekit.plugins import simli
 from livekit.plugins.turn_detector.english import EnglishModel
 
+import http_client
+
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 logger = logging.getLogger("aimediaflow-herbs")
 
@@ -91,7 +94,7 @@ async def delete_room(room_name: str):
     if not all([LIVEKIT_URL, LIVEKIT_API_KEY, LIVEKIT_API_SECRET]):
         return
     try:
-        async with lk_api.LiveKitAPI(LIVEKIT_URL, LIVEKIT_API_KEY, LIVEKIT_API_SECRET) as lkapi:
+        async with lk_api.LiveKitAPI(LIVEKIT_URL, LIVEKIT_API_KEY, LIVEKIT_API_SECRET, session=http_client.session()) as lkapi:
             await lkapi.room.delete_room(lk_api.DeleteRoomRequest(room=room_name))
             logger.info(f"Room {room_name} deleted")
     except Exception as e:
@@ -154,30 +157,36 @@ async def search_herbs_knowledge(query: str) -> str:
     """Called when the visitor asks about herbs, remedies, shop, delivery or health conditions."""
     logger.info(f"RAG query: {repr(query)}")
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                f"{HERBS_RAG_URL}/query",
-                headers={"Content-Type": "application/json"},
-                json={"question": query, "mode": "hybrid"},
-                timeout=aiohttp.ClientTimeout(total=10),
-            ) as res:
-                if res.status != 200:
-                    return ""
-                data = await res.json()
-                answer = data.get("answer", "")
-                if not answer:
-                    return ""
-                if "### References" in answer:
-                    answer = answer[:answer.index("### References")].strip()
-                result = answer[:600] if len(answer) > 600 else answer
-                logger.info(f"RAG result length: {len(result)}")
-                return result
+        session = http_client.session()
+        async with session.post(
+            f"{HERBS_RAG_URL}/query",
+            headers={"Content-Type": "application/json"},
+            json={"question": query, "mode": "hybrid"},
+            timeout=aiohttp.ClientTimeout(total=10),
+        ) as res:
+            if res.status != 200:
+                return ""
+            data = await res.json()
+            answer = data.get("answer", "")
+            if not answer:
+                return ""
+            if "### References" in answer:
+                answer = answer[:answer.index("### References")].strip()
+            result = answer[:600] if len(answer) > 600 else answer
+            logger.info(f"RAG result length: {len(result)}")
+            return result
     except Exception as e:
         logger.error(f"RAG query error: {e}")
         return ""
 
 
+def prewarm(proc: JobProcess):
+    http_client.prewarm([HERBS_RAG_URL])
+
+
 async def entrypoint(ctx: JobContext):
+    http_client.start()
+    ctx.add_shutdown_callback(http_client.close)
     await ctx.connect()
     logger.info("Herbs agent connected to LiveKit room")
 
@@ -207,6 +216,7 @@ async def entrypoint(ctx: JobContext):
 if __name__ == "__main__":
     cli.run_app(WorkerOptions(
         entrypoint_fnc=entrypoint,
+        prewarm_fnc=prewarm,
         agent_name="aimediaflow-herbs",
         worker_type=WorkerType.ROOM,
     ))
@@ -11,6 +11,7 @@ from livekit.agents import (
     Agent,
     AgentSession,
     JobContext,
+    JobProcess,
     RoomInputOptions,
     WorkerOptions,
     cli,
@@ -23,6 +24,8 @@ from livekit.agents.llm import ChatChunk, ChoiceDelta
 from livekit.plugins import groq, openai, silero
 from livekit.plugins.turn_detector.english import EnglishModel
 
+import http_client
+
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
@@ -70,28 +73,28 @@ async def ask_hermes(message: str) -> str:
     }
 
     try:
-        async with aiohttp.ClientSession() as http:
-            async with http.post(
-                HERMES_API_URL,
-                json=payload,
-                headers=headers,
-                timeout=aiohttp.ClientTimeout(total=60),
-            ) as resp:
-                if resp.status != 200:
-                    text = await resp.text()
-                    logger.error(f"Hermes API error {resp.status}: {text[:200]}")
-                    return "Sorry, I had trouble processing that. Please try again."
-
-                # Save session ID for continuity
-                new_session_id = resp.headers.get("X-Hermes-Session-Id", "")
-                if new_session_id and new_session_id != session_id:
-                    save_voice_session_id(new_session_id)
-                    logger.info(f"Voice session saved: {new_session_id}")
-
-                data = await resp.json()
-                content = data["choices"][0]["message"]["content"]
-                logger.info(f"HERMES RESPONSE: {content[:200]}")
-                return content or "I didn't get a response. Please try again."
+        http = http_client.session()
+        async with http.post(
+            HERMES_API_URL,
+            json=payload,
+            headers=headers,
+            timeout=aiohttp.ClientTimeout(total=60),
+        ) as resp:
+            if resp.status != 200:
+                text = await resp.text()
+                logger.error(f"Hermes API error {resp.status}: {text[:200]}")
+                return "Sorry, I had trouble processing that. Please try again."
+
+            # Save session ID for continuity
+            new_session_id = resp.headers.get("X-Hermes-Session-Id", "")
+            if new_session_id and new_session_id != session_id:
+                save_voice_session_id(new_session_id)
+                logger.info(f"Voice session saved: {new_session_id}")
+
+            data = await resp.json()
+            content = data["choices"][0]["message"]["content"]
+            logger.info(f"HERMES RESPONSE: {content[:200]}")
+            return content or "I didn't get a response. Please try again."
 
     except asyncio.TimeoutError:
         logger.error("Hermes API timed out")
@@ -155,9 +158,15 @@ No markdown, no bullet points — plain speech only.
 """
 
 
+def prewarm(proc: JobProcess):
+    http_client.prewarm([HERMES_API_URL])
+
+
 async def entrypoint(ctx: JobContext):
     logger.info("Hermes Voice Agent starting")
 
+    http_client.start()
+    ctx.add_shutdown_callback(http_client.close)
     await ctx.connect()
     logger.info("Connected to LiveKit room")
 
@@ -211,5 +220,6 @@ async def entrypoint(ctx: JobContext):
 if __name__ == "__main__":
     cli.run_app(WorkerOptions(
         entrypoint_fnc=entrypoint,
+        prewarm_fnc=prewarm,
         agent_name=os.getenv("AGENT_NAME", "hermes-voice-agent"),
     ))
@@ -1,11 +1,12 @@
 import asyncio
 import base64
+import hashlib
+import json
 import logging
 import os
 from datetime import date
 from typing import Annotated
 
-import aiohttp
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -15,15 +16,18 @@ from livekit.agents import (
     Agent,
     AgentSession,
     JobContext,
+    JobProcess,
     WorkerOptions,
     cli,
     function_tool,
+    get_job_context,
 )
 from livekit.plugins import openai as lk_openai
 from livekit.plugins import deepgram as lk_deepgram
 from livekit.plugins import silero
 from livekit.plugins import groq as lk_groq
 from livekit.plugins.turn_detector.english import EnglishModel
+import http_client
 from session_logger import SessionLogger
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
@@ -120,6 +124,12 @@ ROOM NUMBERS:
 - "one oh one" = 101, "one oh five" = 105, "one ten" = 110
 - "one hundred and five" = 105, "one hundred five" = 105
 
+FLEXIBLE DATES:
+If the caller is flexible ("sometime in March", "when is a Superior free for three nights?"):
+1. Ask how many nights and which room type, if they haven't said
+2. Call find_free_dates ONCE with the whole range they'd accept — do NOT call check_availability for each guess
+3. Offer the first one or two options by date and price only, then continue with the BOOKING FLOW from step 6
+
 RESCHEDULING A BOOKING:
 If a caller wants to move their booking to new dates:
 1. Ask for their phone number (used to identify the booking)
@@ -163,7 +173,7 @@ async def delete_room(room_name: str):
     if not LIVEKIT_URL or not LIVEKIT_API_KEY or not LIVEKIT_API_SECRET:
         return
     try:
-        async with lk_api.LiveKitAPI(LIVEKIT_URL, LIVEKIT_API_KEY, LIVEKIT_API_SECRET) as lkapi:
+        async with lk_api.LiveKitAPI(LIVEKIT_URL, LIVEKIT_API_KEY, LIVEKIT_API_SECRET, session=http_client.session()) as lkapi:
             await lkapi.room.delete_room(lk_api.DeleteRoomRequest(room=room_name))
             logger.info(f"Room {room_name} deleted")
     except Exception as e:
@@ -179,14 +189,14 @@ async def check_availability(
 ) -> str:
     """Check which hotel rooms are available for the given dates."""
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(
-                f"{HOTEL_API_URL}/availability",
-                params={"check_in": check_in, "check_out": check_out},
-            ) as res:
-                if res.status != 200:
-                    return "Sorry, I cannot check availability right now."
-                rooms = await res.json()
+        session = http_client.session()
+        async with session.get(
+            f"{HOTEL_API_URL}/availability",
+            params={"check_in": check_in, "check_out": check_out},
+        ) as res:
+            if res.status != 200:
+                return "Sorry, I cannot check availability right now."
+            rooms = await res.json()
 
         # Parse dates for nights calculation
         ci = date.fromisoformat(check_in)
@@ -208,6 +218,47 @@ async def check_availability(
         return "I'm having trouble checking availability. Please try again."
 
 
+@function_tool
+async def find_free_dates(
+    room_type: Annotated[str, "Room type the caller wants, e.g. 'Superior'. Empty for any type."],
+    nights: Annotated[int, "Number of nights the caller wants to stay"],
+    earliest_check_in: Annotated[str, "Earliest acceptable check-in date in YYYY-MM-DD format"],
+    latest_check_in: Annotated[str, "Latest acceptable check-in date in YYYY-MM-DD format"],
+) -> str:
+    """Find the earliest dates a room type is free for a number of nights, when the caller's dates are flexible."""
+    try:
+        params = {"nights": nights, "from": earliest_check_in, "to": latest_check_in, "limit": 5}
+        if room_type:
+            params["room_type"] = room_type
+        session = http_client.session()
+        async with session.get(f"{HOTEL_API_URL}/availability/search", params=params) as res:
+            if res.status != 200:
+                return "Sorry, I cannot search for free dates right now."
+            data = await res.json()
+
+        kind = f"{room_type} room" if room_type else "room"
+        if not data["windows"]:
+            return f"No {kind} is free for {nights} night(s) with check-in between {earliest_check_in} and {latest_check_in}."
+
+        lines = [f"Earliest {nights}-night stays with a free {kind}:"]
+        for w in data["windows"]:
+            rooms = ", ".join(f"Room {r['number']} ({r['type']}, €{r['price_per_night']}/night)" for r in w["rooms"])
+            lines.append(f"{w['check_in']} to {w['check_out']}: {rooms}")
+        return "\n".join(lines)
+    except Exception as e:
+        logger.error(f"find_free_dates error: {e}")
+        return "I'm having trouble searching for dates. Please try again."
+
+
+def _idempotency_key(tool: str, **args) -> str:
+    """Same key whenever this call session repeats a tool call with the same arguments."""
+    try:
+        session = get_job_context().job.id
+    except RuntimeError:  # outside a job (console tests)
+        session = ""
+    return hashlib.sha256(f"{session}|{tool}|{json.dumps(args, sort_keys=True)}".encode()).hexdigest()
+
+
 @function_tool
 async def book_room(
     room_number: Annotated[str, "Room number e.g. '105'"],
@@ -218,26 +269,29 @@ async def book_room(
     guest_email: Annotated[str, "Guest email address (optional)"] = "",
 ) -> str:
     """Book a hotel room for a guest."""
+    booking = {
+        "room_number": room_number,
+        "guest_name": guest_name,
+        "check_in": check_in,
+        "check_out": check_out,
+        "phone": guest_phone,
+        "email": guest_email,
+    }
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                f"{HOTEL_API_URL}/bookings",
-                json={
-                    "room_number": room_number,
-                    "guest_name": guest_name,
-                    "check_in": check_in,
-                    "check_out": check_out,
-                    "phone": guest_phone,
-                    "email": guest_email,
-                },
-            ) as res:
-                if res.status == 409:
-                    return f"Room {room_number} is no longer available for those dates. Please choose another room."
-                if res.status == 404:
-                    return f"Room {room_number} does not exist."
-                if res.status != 200:
-                    return "Booking failed. Please try again."
-                data = await res.json()
+        session = http_client.session()
+        # a repeated or retried call gets the first booking back instead of making a second one
+        async with session.post(
+            f"{HOTEL_API_URL}/bookings",
+            json=booking,
+            headers={"Idempotency-Key": _idempotency_key("book_room", **booking)},
+        ) as res:
+            if res.status == 409:
+                return f"Room {room_number} is no longer available for those dates. Please choose another room."
+            if res.status == 404:
+                return f"Room {room_number} does not exist."
+            if res.status != 200:
+                return "Booking failed. Please try again."
+            data = await res.json()
 
         return (
             f"Booking confirmed! Booking ID: {data['booking_id']}. "
@@ -258,18 +312,18 @@ async def reschedule_booking(
 ) -> str:
     """Reschedule an existing booking to new dates, identified by phone number."""
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                f"{HOTEL_API_URL}/bookings/reschedule",
-                json={"phone": guest_phone, "new_check_in": new_check_in, "new_check_out": new_check_out},
-            ) as res:
-                if res.status == 404:
-                    return "I couldn't find an upcoming booking for that phone number."
-                if res.status == 409:
-                    return f"Unfortunately the room is not available for those new dates. Would you like to try different dates?"
-                if res.status != 200:
-                    return "I'm having trouble rescheduling. Please try again."
-                data = await res.json()
+        session = http_client.session()
+        async with session.post(
+            f"{HOTEL_API_URL}/bookings/reschedule",
+            json={"phone": guest_phone, "new_check_in": new_check_in, "new_check_out": new_check_out},
+        ) as res:
+            if res.status == 404:
+                return "I couldn't find an upcoming booking for that phone number."
+            if res.status == 409:
+                return f"Unfortunately the room is not available for those new dates. Would you like to try different dates?"
+            if res.status != 200:
+                return "I'm having trouble rescheduling. Please try again."
+            data = await res.json()
         return (
             f"Done! Booking rescheduled for {data['guest_name']}. "
             f"Room {data['room_number']} ({data['room_type']}), "
@@ -288,16 +342,16 @@ async def find_upcoming_booking(
 ) -> str:
     """Look up an upcoming booking by phone and name WITHOUT cancelling it. Use this before cancel to read back dates to the caller."""
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(
-                f"{HOTEL_API_URL}/bookings/find-by-phone",
-                params={"phone": guest_phone, "guest_name": guest_name},
-            ) as res:
-                if res.status == 404:
-                    return "I couldn't find an upcoming booking for that name and phone number."
-                if res.status != 200:
-                    return "I'm having trouble looking up the booking. Please try again."
-                data = await res.json()
+        session = http_client.session()
+        async with session.get(
+            f"{HOTEL_API_URL}/bookings/find-by-phone",
+            params={"phone": guest_phone, "guest_name": guest_name},
+        ) as res:
+            if res.status == 404:
+                return "I couldn't find an upcoming booking for that name and phone number."
+            if res.status != 200:
+                return "I'm having trouble looking up the booking. Please try again."
+            data = await res.json()
         return (
             f"Found booking: Room {data['room_number']} for {data['guest_name']}, "
             f"check-in {data['check_in']}, check-out {data['check_out']}."
@@ -314,16 +368,16 @@ async def cancel_booking_by_phone(
 ) -> str:
     """Cancel an upcoming booking identified by phone number and guest name."""
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                f"{HOTEL_API_URL}/bookings/cancel-by-phone",
-                json={"phone": guest_phone, "guest_name": guest_name},
-            ) as res:
-                if res.status == 404:
-                    return "I couldn't find an upcoming booking for that name and phone number."
-                if res.status != 200:
-                    return "I'm having trouble cancelling. Please try again."
-                data = await res.json()
+        session = http_client.session()
+        async with session.post(
+            f"{HOTEL_API_URL}/bookings/cancel-by-phone",
+            json={"phone": guest_phone, "guest_name": guest_name},
+        ) as res:
+            if res.status == 404:
+                return "I couldn't find an upcoming booking for that name and phone number."
+            if res.status != 200:
+                return "I'm having trouble cancelling. Please try again."
+            data = await res.json()
         return (
             f"Booking cancelled. Room {data['room_number']} for {data['guest_name']}, "
             f"{data['check_in']} to {data['check_out']}. We hope to see you another time!"
@@ -368,17 +422,17 @@ async def send_room_photo(
             ],
         }
 
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                "https://api.brevo.com/v3/smtp/email",
-                json=payload,
-                headers={"api-key": BREVO_API_KEY, "Content-Type": "application/json"},
-            ) as res:
-                if res.status in (200, 201):
-                    return f"Photo sent to {guest_email}. The guest will receive it shortly."
-                body = await res.text()
-                logger.error(f"Brevo send_room_photo error {res.status}: {body}")
-                return "I'm sorry, I couldn't send the email right now. Please check back later."
+        session = http_client.session()
+        async with session.post(
+            "https://api.brevo.com/v3/smtp/email",
+            json=payload,
+            headers={"api-key": BREVO_API_KEY, "Content-Type": "application/json"},
+        ) as res:
+            if res.status in (200, 201):
+                return f"Photo sent to {guest_email}. The guest will receive it shortly."
+            body = await res.text()
+            logger.error(f"Brevo send_room_photo error {res.status}: {body}")
+            return "I'm sorry, I couldn't send the email right now. Please check back later."
     except FileNotFoundError:
         logger.error(f"Room photo not found at {ROOM_PHOTO_PATH}")
         return "I'm sorry, the room photo is not available at the moment."
@@ -402,7 +456,7 @@ class HotelAgent(Agent):
                 base_url="http://piper-wrapper:8881/v1",
                 api_key="not-needed",
             ),
-            tools=[check_availability, book_room, reschedule_booking, find_upcoming_booking, cancel_booking_by_phone, send_room_photo],
+            tools=[check_availability, find_free_dates, book_room, reschedule_booking, find_upcoming_booking, cancel_booking_by_phone, send_room_photo],
         )
         self.session_log = session_log
         self._ctx = ctx
@@ -426,6 +480,10 @@ class HotelAgent(Agent):
             asyncio.ensure_future(delayed_delete())
 
 
+def prewarm(proc: JobProcess):
+    http_client.prewarm([HOTEL_API_URL])
+
+
 async def entrypoint(ctx: JobContext):
     session_log = SessionLogger()
 
@@ -434,6 +492,8 @@ async def entrypoint(ctx: JobContext):
         await session_log.send_email()
 
     ctx.add_shutdown_callback(send_report)
+    http_client.start()
+    ctx.add_shutdown_callback(http_client.close)
     await ctx.connect()
     logger.info("Hotel agent connected to LiveKit room")
 
@@ -473,5 +533,6 @@ async def entrypoint(ctx: JobContext):
 if __name__ == "__main__":
     cli.run_app(WorkerOptions(
         entrypoint_fnc=entrypoint,
+        prewarm_fnc=prewarm,
         agent_name="aimediaflow-hotel"
     ))
@@ -2,6 +2,7 @@ import asyncio
 import logging
 import os
 import time
+from collections import OrderedDict
 from typing import Annotated
 
 import aiohttp
@@ -14,6 +15,7 @@ from livekit.agents import (
     Agent,
     AgentSession,
     JobContext,
+    JobProcess,
     WorkerOptions,
     cli,
     llm,
@@ -21,6 +23,8 @@ from livekit.agents import (
 from livekit.plugins import deepgram as lk_deepgram
 from livekit.plugins import openai as lk_openai, silero
 from livekit.plugins.turn_detector.english import EnglishModel
+import http_client
+from catalog_mirror import CatalogMirror
 from session_logger import SessionLogger
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
@@ -37,6 +41,22 @@ DEEPGRAM_API_KEY = os.getenv("DEEPGRAM_API_KEY", "")
 TYPESENSE_BASE = f"http://{TYPESENSE_HOST}:{TYPESENSE_PORT}"
 CART_API_BASE = os.getenv("CART_API_BASE", "http://cart-api:8000")
 
+catalog = CatalogMirror(TYPESENSE_BASE, TYPESENSE_API_KEY)  # loaded in prewarm, refreshed while a job runs
+
+SEARCH_CACHE_TTL_SECONDS = int(os.getenv("SEARCH_CACHE_TTL_SECONDS", "120"))
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "256"))
+PREFETCH_WAIT_SECONDS = 1.0  # how long a follow-up tool waits for a prefetch still in flight
+
+# Cross-sell category per product category (see CROSS-SELL in the prompt), prefetched after a search
+COMPLEMENTARY_CATEGORIES = {
+    "hoodies": "accessories",
+    "sweatshirts": "accessories",
+    "jackets": "accessories",
+    "tshirts": "bottoms",
+    "bottoms": "tshirts",
+    "accessories": "hoodies",
+}
+
 FAREWELL_WORDS = {"bye", "goodbye", "that's all", "that is all", "thanks bye", "thank you bye", "see you", "talk later", "have a good", "have a great", "cheers"}
 
 USER_AWAY_TIMEOUT = 40
@@ -50,7 +70,7 @@ async def delete_room(room_name: str):
         logger.warning("LiveKit credentials not set, cannot delete room")
         return
     try:
-        async with lk_api.LiveKitAPI(LIVEKIT_URL, LIVEKIT_API_KEY, LIVEKIT_API_SECRET) as lkapi:
+        async with lk_api.LiveKitAPI(LIVEKIT_URL, LIVEKIT_API_KEY, LIVEKIT_API_SECRET, session=http_client.session()) as lkapi:
             await lkapi.room.delete_room(lk_api.DeleteRoomRequest(room=room_name))
             logger.info(f"Room {room_name} deleted")
     except Exception as e:
@@ -102,6 +122,7 @@ AVAILABLE CATEGORIES (exact values for search_products category parameter):
 
 SHOPPING CART:
 - add_to_cart(product_id, qty, size): when user says "add to cart", "I'll take it", "buy this", "add one", "get it"
+- add_several_to_cart(product_ids, qtys, sizes): when user asks for several different products at once, e.g. "add two of these and one of those"
 - remove_from_cart(product_id): when user says "remove", "take it out", "I changed my mind", "don't want it"
 - read_cart(): ONLY when user asks about cart CONTENTS without wanting to see it: "what's in my cart?", "what's my total?", "how many items?"
 - show_hide_cart(state): state='open' when user says "show my cart", "open cart", "open my cart", "show me my cart" — then also call read_cart(); state='close' when user says "close cart", "hide cart", "close my cart", "close the cart"
@@ -130,19 +151,21 @@ say a short warm farewell like "Bye! Come back anytime!" and nothing else."""
 # ── Typesense categories ───────────────────────────────────────────────────────
 
 async def _fetch_categories() -> list[str]:
-    """Fetch product categories from Typesense facets."""
+    """Product categories, most products first, from the catalog mirror or Typesense facets."""
+    if catalog.ready:
+        return catalog.categories_by_count()
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(
-                f"{TYPESENSE_BASE}/collections/products/documents/search",
-                headers={"X-TYPESENSE-API-KEY": TYPESENSE_API_KEY},
-                params={"q": "*", "query_by": "name", "facet_by": "category", "per_page": 0},
-            ) as res:
-                if res.status != 200:
-                    return []
-                data = await res.json()
-                counts = data.get("facet_counts", [{}])[0].get("counts", [])
-                return [c["value"] for c in counts]
+        session = http_client.session()
+        async with session.get(
+            f"{TYPESENSE_BASE}/collections/products/documents/search",
+            headers={"X-TYPESENSE-API-KEY": TYPESENSE_API_KEY},
+            params={"q": "*", "query_by": "name", "facet_by": "category", "per_page": 0},
+        ) as res:
+            if res.status != 200:
+                return []
+            data = await res.json()
+            counts = data.get("facet_counts", [{}])[0].get("counts", [])
+            return [c["value"] for c in counts]
     except Exception as e:
         logger.error(f"Typesense categories fetch error: {e}")
         return []
@@ -150,8 +173,11 @@ async def _fetch_categories() -> list[str]:
 
 async def _fetch_new_arrivals(limit: int = 3) -> str:
     """Return new arrivals formatted as product context (id + name + price), sorted by created_at desc."""
-    try:
-        async with aiohttp.ClientSession() as session:
+    if catalog.ready:
+        hits = catalog.top(catalog.mask("", [], [], None, None, stock_only=True), "created_at:desc", limit)
+    else:
+        try:
+            session = http_client.session()
             async with session.get(
                 f"{TYPESENSE_BASE}/collections/products/documents/search",
                 headers={"X-TYPESENSE-API-KEY": TYPESENSE_API_KEY},
@@ -167,20 +193,18 @@ async def _fetch_new_arrivals(limit: int = 3) -> str:
                     return ""
                 data = await res.json()
                 hits = data.get("hits", [])
-                if not hits:
-                    return ""
-                lines = []
-                for h in hits:
-                    d = h["document"]
-                    pid = d.get("id", "")
-                    name = d.get("name", "")
-                    price = d.get("price", 0)
-                    sizes = ", ".join(d.get("sizes", [])) or "one size"
-                    lines.append(f"[id:{pid}] {name} €{price:.2f} | sizes: {sizes}")
-                return "\n".join(lines)
-    except Exception as e:
-        logger.error(f"_fetch_new_arrivals error: {e}")
-        return ""
+        except Exception as e:
+            logger.error(f"_fetch_new_arrivals error: {e}")
+            return ""
+    lines = []
+    for h in hits:
+        d = h["document"]
+        pid = d.get("id", "")
+        name = d.get("name", "")
+        price = d.get("price", 0)
+        sizes = ", ".join(d.get("sizes", [])) or "one size"
+        lines.append(f"[id:{pid}] {name} €{price:.2f} | sizes: {sizes}")
+    return "\n".join(lines)
 
 
 # ── Typesense search ───────────────────────────────────────────────────────────
@@ -192,6 +216,7 @@ def _build_filter(
     price_min: float | None,
     price_max: float | None,
     stock_only: bool,
+    created_after: int | None = None,
 ) -> str:
     parts = []
     if stock_only:
@@ -210,10 +235,16 @@ def _build_filter(
         parts.append(f"price:<{price_max}")
     elif price_min is not None:
         parts.append(f"price:>={price_min}")
+    if created_after is not None:
+        parts.append(f"created_at:>{created_after}")
     return " && ".join(parts)
 
 
-async def _do_search(q: str, filter_by: str, sort_by: str = "_text_match:desc") -> list:
+async def _do_multi_search(q: str, tiers: list[tuple[str, str]], sort_by: str = "_text_match:desc") -> tuple[str, list]:
+    """Run every (tier name, filter_by) in one Typesense multi_search request.
+
+    Returns the name and hits of the first tier with any hits, or ("", []).
+    """
     params: dict = {
         "q": q or "*",
         "query_by": "name,description",
@@ -222,23 +253,28 @@ async def _do_search(q: str, filter_by: str, sort_by: str = "_text_match:desc")
         "per_page": "5",
         "sort_by": sort_by,
     }
-    if filter_by:
-        params["filter_by"] = filter_by
+    searches = [{"collection": "products", **({"filter_by": f} if f else {})} for _, f in tiers]
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(
-                f"{TYPESENSE_BASE}/collections/products/documents/search",
-                headers={"X-TYPESENSE-API-KEY": TYPESENSE_API_KEY},
-                params=params,
-            ) as res:
-                if res.status != 200:
-                    logger.warning(f"Typesense returned {res.status}: {await res.text()}")
-                    return []
-                data = await res.json()
-                return data.get("hits", [])
+        session = http_client.session()
+        async with session.post(
+            f"{TYPESENSE_BASE}/multi_search",
+            headers={"X-TYPESENSE-API-KEY": TYPESENSE_API_KEY},
+            params=params,
+            json={"searches": searches},
+        ) as res:
+            if res.status != 200:
+                logger.warning(f"Typesense returned {res.status}: {await res.text()}")
+                return "", []
+            data = await res.json()
     except Exception as e:
         logger.error(f"Typesense search error: {e}")
-        return []
+        return "", []
+    for (name, _), result in zip(tiers, data.get("results", [])):
+        if "error" in result:
+            logger.warning(f"Typesense search tier {name!r} failed: {result['error']}")
+        elif result.get("hits"):
+            return name, result["hits"]
+    return "", []
 
 
 async def _search_products_raw(
@@ -259,81 +295,304 @@ async def _search_products_raw(
     }
     sort_by = sort_map.get(sort_order, "_text_match:desc")
 
-    # For new arrivals, add a 30-day date filter; fall back to no date filter if empty
-    date_filter = ""
+    # Relaxation tiers, strictest first; the first with hits wins. New arrivals first try the last 30 days.
+    strict = {"category": category, "colors": colors, "sizes": sizes, "price_min": price_min, "price_max": price_max}
+    tiers: list[tuple[str, dict]] = []
     if sort_order == "newest":
-        cutoff = int(time.time()) - 30 * 24 * 3600
-        date_filter = f"created_at:>{cutoff}"
+        tiers.append(("last 30 days", {**strict, "stock_only": True, "created_after": int(time.time()) - 30 * 24 * 3600}))
+    tiers.append(("in stock", {**strict, "stock_only": True}))
+    tiers.append(("any stock", {**strict, "stock_only": False}))
+    if colors or sizes:
+        # keep category and price, drop size/color
+        tiers.append(("any color/size", {**strict, "colors": [], "sizes": [], "stock_only": True}))
+
+    if catalog.ready:
+        # Filters are evaluated on the local mirror; only free text needs Typesense's ranking,
+        # and only for the tiers that have candidates at all.
+        masks = [(name, catalog.mask(**t)) for name, t in tiers]
+        if not q.strip() or q.strip() == "*":
+            tier, hits = next(((name, catalog.top(mask, sort_by)) for name, mask in masks if mask.any()), ("", []))
+        else:
+            candidates = [(name, _build_filter(**t)) for (name, t), (_, mask) in zip(tiers, masks) if mask.any()]
+            tier, hits = await _do_multi_search(q, candidates, sort_by) if candidates else ("", [])
+    else:
+        tier, hits = await _do_multi_search(q, [(name, _build_filter(**t)) for name, t in tiers], sort_by)
+    if tier and tier != tiers[0][0]:
+        logger.info(f"product search relaxed to {tier!r} (query={q!r})")
 
-    # Try with stock filter first
-    filter_by = _build_filter(category, colors, sizes, price_min, price_max, stock_only=True)
-    if date_filter:
-        filter_by = (filter_by + " && " + date_filter) if filter_by else date_filter
-    hits = await _do_search(q, filter_by, sort_by)
+    if not hits:
+        return "", []
 
-    # If new arrivals found nothing with date filter, retry without it
-    if not hits and date_filter:
-        filter_by = _build_filter(category, colors, sizes, price_min, price_max, stock_only=True)
-        hits = await _do_search(q, filter_by, sort_by)
+    ids = [h["document"].get("id", "") for h in hits if h["document"].get("id")]
+    lines = [_format_product(h["document"]) for h in hits]
+    return "Matching products from the shop:\n" + "\n".join(lines), ids
 
-    # Relax stock filter if nothing found
-    if not hits:
-        filter_by = _build_filter(category, colors, sizes, price_min, price_max, stock_only=False)
-        hits = await _do_search(q, filter_by, sort_by)
 
-    # Relax size/color filters but keep category and price
-    if not hits and (colors or sizes):
-        filter_by = _build_filter(category, [], [], price_min, price_max, stock_only=True)
-        hits = await _do_search(q, filter_by, sort_by)
+def _format_product(d: dict) -> str:
+    """One product as a context line: "- [id:p001] Classic Hoodie €49.99 | sizes: ... | in stock: 3 | description"."""
+    name = d.get("name", "")
+    price = d.get("price", 0)
+    stock = d.get("stock", 0)
+    sizes_avail = ", ".join(d.get("sizes", [])) or "one size"
+    colors_avail = ", ".join(d.get("colors", [])) or ""
+    desc = d.get("description", "")
+    stock_label = f"in stock: {stock}" if stock > 0 else "OUT OF STOCK"
+    color_part = f" | colors: {colors_avail}" if colors_avail else ""
+    pid = d.get("id", "")
+    return f"- [id:{pid}] {name} €{price:.2f} | sizes: {sizes_avail}{color_part} | {stock_label} | {desc}"
+
+
+async def _fetch_documents(ids: list[str]) -> dict[str, dict]:
+    """Full product documents for ids, by id: from the catalog mirror, else one Typesense search."""
+    if catalog.ready:
+        return catalog.documents(ids)
+    try:
+        session = http_client.session()
+        async with session.get(
+            f"{TYPESENSE_BASE}/collections/products/documents/search",
+            headers={"X-TYPESENSE-API-KEY": TYPESENSE_API_KEY},
+            params={
+                "q": "*",
+                "query_by": "name",
+                "filter_by": f"id:[{','.join(ids)}]",
+                "per_page": len(ids),
+            },
+        ) as res:
+            if res.status != 200:
+                return {}
+            data = await res.json()
+            return {h["document"]["id"]: h["document"] for h in data.get("hits", []) if h["document"].get("id")}
+    except Exception as e:
+        logger.error(f"_fetch_documents error: {e}")
+        return {}
+
+
+# ── Search cache ───────────────────────────────────────────────────────────────
+
+class _SearchCache:
+    """_search_products_raw() results by normalised search, shared by every session in the process.
+
+    Entries expire after SEARCH_CACHE_TTL_SECONDS, the least recently used go past
+    SEARCH_CACHE_SIZE, and everything is dropped when the catalog mirror's version
+    changes. Empty results aren't stored (they are also what a failed search returns).
+    """
+
+    def __init__(self):
+        self._entries: OrderedDict[tuple, tuple[float, tuple[str, list[str]]]] = OrderedDict()
+        self._version = catalog.version
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(q, category, colors, sizes, price_min, price_max, sort_order) -> tuple:
+        """Searches that differ only in case, spacing, list order or float noise share a key."""
+        q = " ".join(q.lower().split())
+        category = category.strip().lower()
+        return (
+            "" if q == "*" else q,
+            "" if category == "all" else category,
+            tuple(sorted({c.strip().lower() for c in colors})),
+            tuple(sorted({s.strip().upper() for s in sizes})),
+            None if price_min is None else round(price_min, 2),
+            None if price_max is None else round(price_max, 2),
+            sort_order,
+        )
 
-    if not hits:
-        return "", []
+    def get(self, key: tuple) -> tuple[str, list[str]] | None:
+        if self._version != catalog.version:
+            self._version = catalog.version
+            self._entries.clear()
+        entry = self._entries.get(key)
+        if entry and time.monotonic() - entry[0] < SEARCH_CACHE_TTL_SECONDS:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+        if entry:
+            del self._entries[key]
+        self.misses += 1
+        return None
 
-    ids = [h["document"].get("id", "") for h in hits if h["document"].get("id")]
-    lines = []
-    for h in hits:
-        d = h["document"]
-        name = d.get("name", "")
-        price = d.get("price", 0)
-        stock = d.get("stock", 0)
-        sizes_avail = ", ".join(d.get("sizes", [])) or "one size"
-        colors_avail = ", ".join(d.get("colors", [])) or ""
-        desc = d.get("description", "")
-        stock_label = f"in stock: {stock}" if stock > 0 else "OUT OF STOCK"
-        color_part = f" | colors: {colors_avail}" if colors_avail else ""
-        pid = d.get("id", "")
-        lines.append(f"- [id:{pid}] {name} €{price:.2f} | sizes: {sizes_avail}{color_part} | {stock_label} | {desc}")
+    def peek(self, key: tuple) -> bool:
+        """Whether get(key) would hit, without counting it or touching the LRU order."""
+        entry = self._entries.get(key) if self._version == catalog.version else None
+        return entry is not None and time.monotonic() - entry[0] < SEARCH_CACHE_TTL_SECONDS
 
-    return "Matching products from the shop:\n" + "\n".join(lines), ids
+    def put(self, key: tuple, result: tuple[str, list[str]], version: int) -> None:
+        if not result[1] or version != catalog.version:
+            return
+        self._entries[key] = (time.monotonic(), result)
+        while len(self._entries) > SEARCH_CACHE_SIZE:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+search_cache = _SearchCache()
+
+
+async def _search_products(
+    q: str,
+    category: str,
+    colors: list[str],
+    sizes: list[str],
+    price_min: float | None,
+    price_max: float | None,
+    sort_order: str = "relevance",
+) -> tuple[str, list[str]]:
+    """_search_products_raw() through search_cache."""
+    key = _SearchCache.key(q, category, colors, sizes, price_min, price_max, sort_order)
+    cached = search_cache.get(key)
+    if cached is not None:
+        logger.info(f"search cache hit: {key}")
+        return cached
+    version = catalog.version
+    result = await _search_products_raw(q, category, colors, sizes, price_min, price_max, sort_order)
+    search_cache.put(key, result, version)
+    return result
+
+
+class _Prefetch:
+    """Per-session results for the tool calls that usually follow search_products.
+
+    search_products starts a prefetch of the documents it found and of the
+    cross-sell search for the first product's complementary category, which runs
+    while the intro line is spoken. expand_product and add_to_cart take product
+    details from here; the cross-sell search lands in search_cache, and
+    search_products reports whether a search was the prefetched one. Hits and
+    misses (lookups made after a prefetch that it did not cover) are logged at
+    session end.
+    """
+
+    def __init__(self):
+        self._task: asyncio.Task | None = None
+        self.documents: dict[str, dict] = {}
+        self.cross_sell_key: tuple | None = None  # search_cache key of the prefetched cross-sell search
+        self.hits = {"documents": 0, "searches": 0}
+        self.misses = {"documents": 0, "searches": 0}
+
+    def start(self, ids: list[str]) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+        self.cross_sell_key = None
+        self._task = asyncio.create_task(self._run(ids))
+
+    def cancel(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+
+    async def _run(self, ids: list[str]) -> None:
+        try:
+            documents = await _fetch_documents(ids)
+            self.documents.update(documents)
+            first = documents.get(ids[0], {})
+            complement = COMPLEMENTARY_CATEGORIES.get(str(first.get("category", "")).lower())
+            if complement:
+                args = ("", complement, [], [], None, None, "relevance")
+                self.cross_sell_key = _SearchCache.key(*args)
+                await _search_products(*args)  # kept by search_cache
+            logger.info(f"prefetched {len(documents)} products, cross-sell category {complement!r}")
+        except Exception as e:
+            logger.warning(f"prefetch failed: {e}")
+
+    async def _settle(self) -> None:
+        if self._task is not None and not self._task.done():
+            await asyncio.wait({self._task}, timeout=PREFETCH_WAIT_SECONDS)
+
+    def _count(self, kind: str, hit: bool) -> None:
+        if self._task is not None:
+            (self.hits if hit else self.misses)[kind] += 1
+
+    async def document(self, product_id: str) -> dict | None:
+        """The prefetched document, waiting for a prefetch still in flight."""
+        await self._settle()
+        return self.cached_document(product_id)
+
+    def cached_document(self, product_id: str) -> dict | None:
+        """The prefetched document if it has already arrived; never waits."""
+        document = self.documents.get(product_id)
+        self._count("documents", document is not None)
+        return document
+
+    def cross_sell_search(self, key: tuple, cached: bool) -> None:
+        """Record a search with the prefetched cross-sell arguments; other searches aren't counted."""
+        if key == self.cross_sell_key:
+            self._count("searches", cached)
+
+    def stats(self) -> dict:
+        return {kind: {"hits": self.hits[kind], "misses": self.misses[kind]} for kind in self.hits}
 
 
 async def _search_faq_raw(query: str) -> str:
     """Search FAQ/knowledge base in Typesense."""
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(
-                f"{TYPESENSE_BASE}/collections/faq/documents/search",
-                headers={"X-TYPESENSE-API-KEY": TYPESENSE_API_KEY},
-                params={
-                    "q": query,
-                    "query_by": "text,category",
-                    "per_page": 4,
-                    "sort_by": "_text_match:desc",
-                },
-            ) as res:
-                if res.status != 200:
-                    return ""
-                data = await res.json()
-                hits = data.get("hits", [])
-                texts = [h["document"].get("text", "") for h in hits if h["document"].get("text")]
-                if not texts:
-                    return ""
-                return "\n".join(f"{i+1}. {t}" for i, t in enumerate(texts))
+        session = http_client.session()
+        async with session.get(
+            f"{TYPESENSE_BASE}/collections/faq/documents/search",
+            headers={"X-TYPESENSE-API-KEY": TYPESENSE_API_KEY},
+            params={
+                "q": query,
+                "query_by": "text,category",
+                "per_page": 4,
+                "sort_by": "_text_match:desc",
+            },
+        ) as res:
+            if res.status != 200:
+                return ""
+            data = await res.json()
+            hits = data.get("hits", [])
+            texts = [h["document"].get("text", "") for h in hits if h["document"].get("text")]
+            if not texts:
+                return ""
+            return "\n".join(f"{i+1}. {t}" for i, t in enumerate(texts))
     except Exception as e:
         logger.error(f"Typesense FAQ search error: {e}")
         return ""
 
 
+# ── Product lookup / Cart API ──────────────────────────────────────────────────
+
+async def _cart_api_batch(visitor_id: str, ops: list[dict]) -> dict | None:
+    """Apply ordered add/update/remove ops via one Cart API call. Returns the final cart or None on failure."""
+    try:
+        session = http_client.session()
+        async with session.post(
+            f"{CART_API_BASE}/cart/{visitor_id}/batch",
+            json={"ops": ops},
+            timeout=aiohttp.ClientTimeout(total=3),
+        ) as res:
+            logger.info(f"_cart_api_batch Cart API: {res.status} ({len(ops)} ops)")
+            if res.status == 200:
+                return await res.json()
+    except Exception as e:
+        logger.warning(f"_cart_api_batch Cart API failed: {e}")
+    return None
+
+
+def _apply_cart_delta(items: list[dict], delta: dict) -> None:
+    """Apply a Cart API stream delta ({"changes": [...]}) to a local list of cart items in place."""
+    for change in delta.get("changes", []):
+        kind = change.get("type")
+        if kind == "clear":
+            items.clear()
+        elif kind == "del":
+            items[:] = [i for i in items if (i["id"], i.get("size", "")) != (change["id"], change.get("size", ""))]
+        elif kind == "set":
+            item = change["item"]
+            for idx, existing in enumerate(items):
+                if (existing["id"], existing.get("size", "")) == (item["id"], item.get("size", "")):
+                    items[idx] = item
+                    break
+            else:
+                items.append(item)
+
+
 # ── Agent ──────────────────────────────────────────────────────────────────────
 
 class SalesManagerAgent(Agent):
@@ -371,6 +630,11 @@ class SalesManagerAgent(Agent):
         self._ending = False
         self._visitor_id: str | None = None  # cached from participant attributes
         self._session = session  # set after session.start()
+        self._cart_mirror: list[dict] | None = None  # live copy of the Cart API cart, None when not streaming
+        self._cart_stream_task: asyncio.Task | None = None
+        self._cart_etag: str | None = None  # ETag of the last Cart API GET, for If-None-Match
+        self._cart_cached: list[dict] = []
+        self.prefetch = _Prefetch()
 
     @llm.function_tool
     async def search_products(
@@ -387,15 +651,10 @@ class SalesManagerAgent(Agent):
         price_max_val = price_max if price_max > 0 else None  # -1 or 0 = no limit
         effective_sort = "newest" if new_arrivals_only else sort_order
         logger.info(f"search_products: category={repr(category)} colors={colors} sizes={sizes} price_max={price_max_val} keywords={repr(keywords)} sort={effective_sort}")
-        context, ids = await _search_products_raw(
-            q=keywords,
-            category=category,
-            colors=colors,
-            sizes=sizes,
-            price_min=None,
-            price_max=price_max_val,
-            sort_order=effective_sort,
-        )
+        args = (keywords, category, colors, sizes, None, price_max_val, effective_sort)
+        key = _SearchCache.key(*args)
+        self.prefetch.cross_sell_search(key, search_cache.peek(key))
+        context, ids = await _search_products(*args)
         logger.info(f"search_products result: {len(ids)} products, ids={ids}")
 
         # Send product IDs to frontend:
@@ -414,6 +673,9 @@ class SalesManagerAgent(Agent):
                 await self._session.say("Sorry, nothing matched that search.", allow_interruptions=True)
             return "No products found for that query."
 
+        # Fetch what the next turn will likely need while the intro is spoken
+        self.prefetch.start(ids)
+
         # Say a short intro immediately — eliminates second LLM round-trip
         if self._session:
             if len(ids) == 1:
@@ -444,6 +706,9 @@ class SalesManagerAgent(Agent):
             })
             if self._session:
                 await self._session.say("Here you go!", allow_interruptions=True)
+            document = await self.prefetch.document(product_id)
+            if document:
+                return f"done. product {product_id} expanded.\n{_format_product(document)}"
             return f"done. product {product_id} expanded."
         except Exception as e:
             logger.warning(f"expand_product set_attributes failed: {e}")
@@ -494,6 +759,7 @@ class SalesManagerAgent(Agent):
             if vid:
                 self._visitor_id = vid
                 logger.info(f"_get_visitor_id: found visitor_id={vid}")
+                self._start_cart_stream()
                 return vid
         logger.warning("_get_visitor_id: no visitor_id found in any participant")
         return None
@@ -504,14 +770,80 @@ class SalesManagerAgent(Agent):
         if vid and not self._visitor_id:
             self._visitor_id = vid
             logger.info(f"update_visitor_id: cached visitor_id={vid}")
+            self._start_cart_stream()
+
+    def _start_cart_stream(self) -> None:
+        if self._cart_stream_task is None and self._visitor_id:
+            self._cart_stream_task = asyncio.create_task(self._follow_cart_stream(self._visitor_id))
+
+    def stop_cart_stream(self) -> None:
+        if self._cart_stream_task is not None:
+            self._cart_stream_task.cancel()
+            self._cart_stream_task = None
+        self._cart_mirror = None
+
+    async def _follow_cart_stream(self, visitor_id: str) -> None:
+        """Keep self._cart_mirror in sync with the Cart API SSE stream (snapshot, then deltas)."""
+        import json
+        while not self._ending:
+            try:
+                session = http_client.session()
+                async with session.get(
+                    f"{CART_API_BASE}/cart/{visitor_id}/stream",
+                    timeout=aiohttp.ClientTimeout(total=None, sock_connect=3),
+                ) as res:
+                    if res.status != 200:
+                        raise RuntimeError(f"status {res.status}")
+                    event, data = "", ""
+                    version = 0  # of the last snapshot or applied delta
+                    async for raw in res.content:
+                        line = raw.decode().rstrip("\r\n")
+                        if line.startswith("event:"):
+                            event = line[6:].strip()
+                        elif line.startswith("data:"):
+                            data = line[5:].strip()
+                        elif not line and data:
+                            payload = json.loads(data)
+                            if event == "snapshot":
+                                self._cart_mirror = payload.get("items", [])
+                                version = payload.get("version", 0)
+                            elif event == "delta" and self._cart_mirror is not None:
+                                if payload.get("version", 0) <= version:
+                                    pass  # queued before the snapshot was read, already in it
+                                elif payload.get("prev") == version:
+                                    _apply_cart_delta(self._cart_mirror, payload)
+                                    version = payload["version"]
+                                else:
+                                    # a delta went missing: stop serving the mirror until it is re-read
+                                    self._cart_mirror = None
+                                    self._cart_mirror, version = await self._read_cart_state(visitor_id)
+                            event, data = "", ""
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"_follow_cart_stream: stream dropped: {e}")
+            self._cart_mirror = None
+            await asyncio.sleep(2)
+
+    async def _read_cart_state(self, visitor_id: str) -> tuple[list[dict], int]:
+        """Items and version of the Cart API cart, for resyncing the mirror. Raises on failure."""
+        session = http_client.session()
+        async with session.get(f"{CART_API_BASE}/cart/{visitor_id}", timeout=aiohttp.ClientTimeout(total=3)) as res:
+            if res.status != 200:
+                raise RuntimeError(f"cart resync status {res.status}")
+            cart = await res.json()
+        return cart.get("items", []), cart.get("version", 0)
 
     async def _get_visitor_cart(self, force_api: bool = False) -> list[dict]:
         """Dual-path cart read.
         Default: cart_json LiveKit attribute (set by frontend syncCart — instant).
-        force_api=True: always read from Cart API (used after remove, so we bypass stale cart_json).
+        force_api=True: read the Cart API state (used after remove, so we bypass stale cart_json) —
+        served from the SSE-fed mirror when the stream is live, otherwise a GET.
         Fallback to Cart API when cart_json is empty (reconnect scenario).
         """
         import json
+        if force_api and self._cart_mirror is not None:
+            return list(self._cart_mirror)
         if not force_api:
             # Fast path: read from LiveKit attribute
             try:
@@ -525,11 +857,16 @@ class SalesManagerAgent(Agent):
         visitor_id = self._get_visitor_id()
         if visitor_id:
             try:
-                async with aiohttp.ClientSession() as session:
-                    async with session.get(f"{CART_API_BASE}/cart/{visitor_id}", timeout=aiohttp.ClientTimeout(total=3)) as res:
-                        if res.status == 200:
-                            data = await res.json()
-                            return data.get("items", [])
+                headers = {"If-None-Match": self._cart_etag} if self._cart_etag else {}
+                session = http_client.session()
+                async with session.get(f"{CART_API_BASE}/cart/{visitor_id}", headers=headers, timeout=aiohttp.ClientTimeout(total=3)) as res:
+                    if res.status == 304:
+                        return list(self._cart_cached)
+                    if res.status == 200:
+                        data = await res.json()
+                        self._cart_etag = res.headers.get("ETag")
+                        self._cart_cached = data.get("items", [])
+                        return list(self._cart_cached)
             except Exception as e:
                 logger.warning(f"_get_visitor_cart Cart API failed: {e}")
         return []
@@ -556,43 +893,28 @@ class SalesManagerAgent(Agent):
         except Exception as e:
             logger.warning(f"add_to_cart set_attributes failed: {e}")
         # Persist to Cart API so cart survives reconnects
+        document = self.prefetch.cached_document(product_id)
+        product_name = document.get("name", product_id) if document else product_id
+        cart_total_items = None
         visitor_id = self._get_visitor_id()
         if visitor_id:
-            # Look up product name/price from catalog for server-side storage
-            product_info = {"id": product_id, "name": product_id, "price": 0.0, "qty": qty_int}
-            try:
-                async with aiohttp.ClientSession() as session:
-                    async with session.get(
-                        f"http://{TYPESENSE_HOST}:{TYPESENSE_PORT}/collections/products/documents/search",
-                        headers={"X-TYPESENSE-API-KEY": TYPESENSE_API_KEY},
-                        params={"q": "*", "query_by": "name", "filter_by": f"id:={product_id}", "per_page": 1},
-                        timeout=aiohttp.ClientTimeout(total=3),
-                    ) as res:
-                        if res.status == 200:
-                            data = await res.json()
-                            hits = data.get("hits", [])
-                            if hits:
-                                d = hits[0]["document"]
-                                product_info = {"id": product_id, "name": d.get("name", product_id), "price": float(d.get("price", 0)), "qty": qty_int, "size": size}
-            except Exception as e:
-                logger.warning(f"add_to_cart: product lookup failed: {e}")
-            cart_total_items = None
+            # Cart API resolves name/price from its catalog cache
+            product_info = {"id": product_id, "qty": qty_int, "size": size}
             try:
-                async with aiohttp.ClientSession() as session:
-                    async with session.post(
-                        f"{CART_API_BASE}/cart/{visitor_id}/add",
-                        json=product_info,
-                        timeout=aiohttp.ClientTimeout(total=3),
-                    ) as res:
-                        logger.info(f"add_to_cart Cart API: {res.status}")
-                        if res.status == 200:
-                            cart_data = await res.json()
-                            cart_total_items = sum(i.get("qty", 1) for i in cart_data.get("items", []))
+                session = http_client.session()
+                async with session.post(
+                    f"{CART_API_BASE}/cart/{visitor_id}/add",
+                    json=product_info,
+                    timeout=aiohttp.ClientTimeout(total=3),
+                ) as res:
+                    logger.info(f"add_to_cart Cart API: {res.status}")
+                    if res.status == 200:
+                        cart_data = await res.json()
+                        cart_total_items = sum(i.get("qty", 1) for i in cart_data.get("items", []))
+                        product_name = next((i["name"] for i in cart_data.get("items", []) if i.get("id") == product_id), product_name)
             except Exception as e:
                 logger.warning(f"add_to_cart Cart API failed: {e}")
         logger.info(f"add_to_cart: signalled frontend and Cart API for product_id={product_id}")
-        # Build confirmation phrase from product_info (already resolved above)
-        product_name = product_info.get("name", product_id)
         size_str = f", size {size}" if size and size != "one size" else ""
         qty_str = f"{qty_int} × " if qty_int > 1 else ""
         items_str = f" You now have {cart_total_items} item{'s' if cart_total_items != 1 else ''} in your cart." if cart_total_items is not None else ""
@@ -601,6 +923,43 @@ class SalesManagerAgent(Agent):
             await self._session.say(phrase, allow_interruptions=True)
         return f"done. id:{product_id} name:{product_name} qty:{qty_int} size:{size or 'one size'} cart_items:{cart_total_items}"
 
+    @llm.function_tool
+    async def add_several_to_cart(
+        self,
+        product_ids: Annotated[list[str], "Product IDs to add, e.g. ['p002', 'p011']. Use the ids from the most recent search result."],
+        qtys: Annotated[list[int], "Quantity for each product, in the same order as product_ids, e.g. [2, 1]."],
+        sizes: Annotated[list[str], "Size for each product, in the same order as product_ids. Use 'one size' for accessories."],
+    ) -> str:
+        """Add two or more different products to the cart in one go. Call when the user asks for several items at once, e.g. 'add two of these and one of those'. For a single product use add_to_cart."""
+        import json
+        logger.info(f"add_several_to_cart: product_ids={product_ids} qtys={qtys} sizes={sizes}")
+        qtys = [max(1, int(q)) for q in qtys] + [1] * (len(product_ids) - len(qtys))
+        sizes = list(sizes) + [""] * (len(product_ids) - len(sizes))
+        ops = [{"op": "add", "id": pid, "qty": qty_int, "size": size} for pid, qty_int, size in zip(product_ids, qtys, sizes)]
+        try:
+            await self._room.local_participant.set_attributes({
+                "cart_action": json.dumps({"action": "batch", "ops": ops}),
+                "expanded_id": "",
+                "cart_ui": "closed",
+            })
+        except Exception as e:
+            logger.warning(f"add_several_to_cart set_attributes failed: {e}")
+        cart_total_items = None
+        names_by_id: dict[str, str] = {}
+        visitor_id = self._get_visitor_id()
+        if visitor_id and ops:
+            cart_data = await _cart_api_batch(visitor_id, ops)
+            if cart_data is not None:
+                cart_total_items = sum(i.get("qty", 1) for i in cart_data.get("items", []))
+                names_by_id = {i["id"]: i["name"] for i in cart_data.get("items", [])}
+        names = ", ".join(
+            f"{op['qty']} × {names_by_id.get(op['id'], op['id'])}" if op["qty"] > 1 else names_by_id.get(op["id"], op["id"]) for op in ops
+        )
+        items_str = f" You now have {cart_total_items} item{'s' if cart_total_items != 1 else ''} in your cart." if cart_total_items is not None else ""
+        if self._session:
+            await self._session.say(f"Added! {names} are in your cart.{items_str}", allow_interruptions=True)
+        return f"done. added {len(ops)} products: {names} cart_items:{cart_total_items}"
+
     @llm.function_tool
     async def update_cart_qty(
         self,
@@ -619,13 +978,13 @@ class SalesManagerAgent(Agent):
         visitor_id = self._get_visitor_id()
         if visitor_id:
             try:
-                async with aiohttp.ClientSession() as session:
-                    async with session.post(
-                        f"{CART_API_BASE}/cart/{visitor_id}/update",
-                        json={"id": product_id, "qty": qty_int},
-                        timeout=aiohttp.ClientTimeout(total=3),
-                    ) as res:
-                        logger.info(f"update_cart_qty Cart API: {res.status}")
+                session = http_client.session()
+                async with session.post(
+                    f"{CART_API_BASE}/cart/{visitor_id}/update",
+                    json={"id": product_id, "qty": qty_int},
+                    timeout=aiohttp.ClientTimeout(total=3),
+                ) as res:
+                    logger.info(f"update_cart_qty Cart API: {res.status}")
             except Exception as e:
                 logger.warning(f"update_cart_qty Cart API failed: {e}")
         if self._session:
@@ -649,13 +1008,13 @@ class SalesManagerAgent(Agent):
         visitor_id = self._get_visitor_id()
         if visitor_id:
             try:
-                async with aiohttp.ClientSession() as session:
-                    async with session.post(
-                        f"{CART_API_BASE}/cart/{visitor_id}/remove",
-                        json={"id": product_id},
-                        timeout=aiohttp.ClientTimeout(total=3),
-                    ) as res:
-                        logger.info(f"remove_from_cart Cart API: {res.status}")
+                session = http_client.session()
+                async with session.post(
+                    f"{CART_API_BASE}/cart/{visitor_id}/remove",
+                    json={"id": product_id},
+                    timeout=aiohttp.ClientTimeout(total=3),
+                ) as res:
+                    logger.info(f"remove_from_cart Cart API: {res.status}")
             except Exception as e:
                 logger.warning(f"remove_from_cart Cart API failed: {e}")
         if self._session:
@@ -725,14 +1084,30 @@ class SalesManagerAgent(Agent):
             asyncio.ensure_future(delayed_end())
 
 
+def prewarm(proc: JobProcess):
+    http_client.prewarm([TYPESENSE_BASE, CART_API_BASE])
+    catalog.load()
+
+
 async def entrypoint(ctx: JobContext):
     session_log = SessionLogger()
 
+    agent: SalesManagerAgent | None = None
+
     async def send_report():
         logger.info("Sales manager session ended, sending report...")
+        if agent is not None:
+            agent.stop_cart_stream()
+            agent.prefetch.cancel()
+            logger.info(f"prefetch: {agent.prefetch.stats()}")
+        catalog.stop()
+        logger.info(f"search cache: {search_cache.stats()}")
         await session_log.send_email()
 
     ctx.add_shutdown_callback(send_report)
+    http_client.start()
+    ctx.add_shutdown_callback(http_client.close)
+    catalog.start()
     await ctx.connect()
     logger.info("Sales manager agent connected to LiveKit room")
 
@@ -838,5 +1213,6 @@ async def entrypoint(ctx: JobContext):
 if __name__ == "__main__":
     cli.run_app(WorkerOptions(
         entrypoint_fnc=entrypoint,
+        prewarm_fnc=prewarm,
         agent_name="aimediaflow-salesmanager"
     ))
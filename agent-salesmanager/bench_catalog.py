@@ -0,0 +1,133 @@
+"""
+Structured product filters: CatalogMirror masks vs Typesense multi_search.
+
+Times the relaxation tiers _search_products_raw() builds for a handful of
+typical filter combinations, evaluated on the local NumPy mirror (synthetic
+catalogues of --sizes products) and, with --typesense, as one multi_search
+against a real server (whose catalogue is what it is).
+
+    python bench_catalog.py
+    python bench_catalog.py --typesense http://localhost:8108 --api-key xyz
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+import aiohttp
+
+from catalog_mirror import CatalogMirror
+
+CATEGORIES = ["Hoodies", "T-Shirts", "Jackets", "Jeans", "Sneakers", "Hats", "Dresses", "Skirts"]
+COLORS = ["black", "white", "red", "blue", "green", "grey", "navy", "beige", "pink", "yellow"]
+SIZES = ["XS", "S", "M", "L", "XL", "XXL"]
+
+# (category, colors, sizes, price_min, price_max) as the LLM typically passes them
+QUERIES = [
+    ("Hoodies", [], [], None, None),
+    ("all", ["black"], ["M"], None, None),
+    ("Jackets", ["red", "navy"], ["L", "XL"], None, 120),
+    ("Sneakers", [], ["XS"], 50, 90),
+    ("all", [], [], None, 30),
+]
+
+
+def make_catalog(count: int, rng: random.Random) -> list[dict]:
+    now = int(time.time())
+    return [
+        {
+            "id": f"p{n}",
+            "name": f"Product {n}",
+            "description": "",
+            "category": rng.choice(CATEGORIES),
+            "price": round(rng.uniform(10, 200), 2),
+            "currency": "EUR",
+            "stock": rng.choice([0, 0, 1, 3, 10, 25]),
+            "sizes": rng.sample(SIZES, rng.randint(1, 4)),
+            "colors": rng.sample(COLORS, rng.randint(1, 3)),
+            "sku": f"SKU{n:05d}",
+            "created_at": now - rng.randrange(365 * 24 * 3600),
+        }
+        for n in range(count)
+    ]
+
+
+def tiers(category, colors, sizes, price_min, price_max) -> list[dict]:
+    strict = {"category": category, "colors": colors, "sizes": sizes, "price_min": price_min, "price_max": price_max}
+    out = [{**strict, "stock_only": True}, {**strict, "stock_only": False}]
+    if colors or sizes:
+        out.append({**strict, "colors": [], "sizes": [], "stock_only": True})
+    return out
+
+
+def filter_by(category, colors, sizes, price_min, price_max, stock_only) -> str:
+    """Same expression as agent._build_filter (kept here so the benchmark doesn't import livekit)."""
+    parts = ["stock:>0"] if stock_only else []
+    if category and category != "all":
+        parts.append(f"category:={category}")
+    if colors:
+        parts.append("(" + " || ".join(f"colors:={c.lower()}" for c in colors) + ")")
+    if sizes:
+        parts.append("(" + " || ".join(f"sizes:={s.upper()}" for s in sizes) + ")")
+    if price_min is not None and price_max is not None:
+        parts.append(f"price:[{price_min}..{price_max}]")
+    elif price_max is not None:
+        parts.append(f"price:<{price_max}")
+    elif price_min is not None:
+        parts.append(f"price:>={price_min}")
+    return " && ".join(parts)
+
+
+def p50_us(samples: list[float]) -> float:
+    return statistics.median(samples) * 1e6
+
+
+def bench_mirror(count: int, rounds: int, rng: random.Random) -> None:
+    mirror = CatalogMirror("http://unused", "")
+    mirror._replace_all(make_catalog(count, rng))
+    for query in QUERIES:
+        samples = []
+        for _ in range(rounds):
+            started = time.perf_counter()
+            for tier in tiers(*query):
+                mask = mirror.mask(**tier)
+                if mask.any():
+                    mirror.top(mask, "price:asc")
+                    break
+            samples.append(time.perf_counter() - started)
+        print(f"  mirror    {count:>6} products  {query!s:<55} p50 {p50_us(samples):8.1f} µs")
+
+
+async def bench_typesense(base: str, api_key: str, rounds: int) -> None:
+    params = {"q": "*", "query_by": "name,description", "per_page": "5", "sort_by": "price:asc"}
+    async with aiohttp.ClientSession(headers={"X-TYPESENSE-API-KEY": api_key}) as session:
+        for query in QUERIES:
+            body = {"searches": [{"collection": "products", "filter_by": filter_by(**t)} for t in tiers(*query)]}
+            samples = []
+            for _ in range(rounds):
+                started = time.perf_counter()
+                async with session.post(f"{base}/multi_search", params=params, json=body) as res:
+                    res.raise_for_status()
+                    await res.read()
+                samples.append(time.perf_counter() - started)
+            print(f"  typesense                  {query!s:<55} p50 {p50_us(samples):8.1f} µs")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare local catalog mirror filtering with Typesense multi_search")
+    parser.add_argument("--sizes", default="100,1000,5000", help="Synthetic catalogue sizes for the mirror")
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--typesense", help="Typesense base URL, e.g. http://localhost:8108")
+    parser.add_argument("--api-key", default="xyz")
+    args = parser.parse_args()
+    rng = random.Random(1)
+    for count in (int(s) for s in args.sizes.split(",")):
+        bench_mirror(count, args.rounds, rng)
+    if args.typesense:
+        asyncio.run(bench_typesense(args.typesense.rstrip("/"), args.api_key, args.rounds))
+
+
+if __name__ == "__main__":
+    main()
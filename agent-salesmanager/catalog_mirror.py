@@ -0,0 +1,201 @@
+"""
+In-process, column-per-field copy of the Typesense `products` collection.
+
+The demo catalogue is tens to a few thousand products, small enough to keep in
+NumPy arrays and filter locally in microseconds instead of a Typesense round
+trip. mask() evaluates the same structured filters as _build_filter() in agent.py
+(category, colors, sizes, price, stock, created_at). The agent answers
+filter-only searches, new arrivals and categories from it, and sends only
+free-text queries to Typesense.
+
+Loaded with a blocking export at worker prewarm (load()), then refreshed by
+start()'s background task (at once if the prewarmed copy is already a refresh
+interval old): new products every CATALOG_REFRESH_SECONDS via
+filter_by=created_at:>cursor, and a full export every CATALOG_FULL_RELOAD_SECONDS
+to pick up stock, price and deleted products (nothing records update times).
+Until loaded, `ready` is False and callers use Typesense. `version` goes up
+whenever the mirrored products change, for caches built on top of it.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+import urllib.request
+from urllib.parse import urlencode
+
+import numpy as np
+
+import http_client
+
+logger = logging.getLogger("catalog-mirror")
+
+CATALOG_REFRESH_SECONDS = int(os.getenv("CATALOG_REFRESH_SECONDS", "60"))
+CATALOG_FULL_RELOAD_SECONDS = int(os.getenv("CATALOG_FULL_RELOAD_SECONDS", "600"))
+
+
+class CatalogMirror:
+    def __init__(self, typesense_base: str, api_key: str):
+        self._export_url = f"{typesense_base}/collections/products/documents/export"
+        self._headers = {"X-TYPESENSE-API-KEY": api_key}
+        self._by_id: dict[str, dict] = {}
+        self._task: asyncio.Task | None = None
+        self.ready = False
+        self.version = 0  # bumped by every change to the mirrored products
+        self.cursor = 0  # highest created_at seen
+        self.loaded_at = 0.0  # monotonic time of the last full export
+        self.refreshed_at = 0.0  # monotonic time of the last export of any kind
+        self._set_columns([])
+
+    # ---------- loading ----------
+
+    def _set_columns(self, docs: list[dict]) -> None:
+        """Rebuild every column from docs (cheap at catalogue sizes; runs only when something changed)."""
+        self.docs = docs
+        self.price = np.array([float(d.get("price", 0)) for d in docs], dtype=np.float64)
+        self.stock = np.array([int(d.get("stock", 0)) for d in docs], dtype=np.int64)
+        self.created_at = np.array([int(d.get("created_at", 0)) for d in docs], dtype=np.int64)
+
+        self.categories = sorted({str(d.get("category", "")).lower() for d in docs})
+        code = {c: n for n, c in enumerate(self.categories)}
+        self.category = np.array([code[str(d.get("category", "")).lower()] for d in docs], dtype=np.int32)
+        self.color_index, self.colors = self._tags(docs, "colors")
+        self.size_index, self.sizes = self._tags(docs, "sizes")
+        self.cursor = int(self.created_at.max()) if docs else 0
+        self.version += 1
+
+    @staticmethod
+    def _tags(docs: list[dict], field: str) -> tuple[dict[str, int], np.ndarray]:
+        """Vocabulary and a products x values bool matrix for a string[] field."""
+        index: dict[str, int] = {}
+        for d in docs:
+            for value in d.get(field) or []:
+                index.setdefault(str(value).lower(), len(index))
+        matrix = np.zeros((len(docs), len(index)), dtype=bool)
+        for row, d in enumerate(docs):
+            for value in d.get(field) or []:
+                matrix[row, index[str(value).lower()]] = True
+        return index, matrix
+
+    def _replace_all(self, docs: list[dict]) -> None:
+        by_id = {d["id"]: d for d in docs if d.get("id")}
+        if by_id != self._by_id or not self.ready:
+            self._by_id = by_id
+            self._set_columns(list(by_id.values()))
+        self.loaded_at = self.refreshed_at = time.monotonic()
+        self.ready = True
+
+    def _merge(self, docs: list[dict]) -> None:
+        changed = [d for d in docs if d.get("id") and self._by_id.get(d["id"]) != d]
+        if not changed:
+            return
+        for d in changed:
+            self._by_id[d["id"]] = d
+        self._set_columns(list(self._by_id.values()))
+
+    @staticmethod
+    def _parse_export(body: str) -> list[dict]:
+        return [json.loads(line) for line in body.splitlines() if line.strip()]
+
+    def load(self, timeout: float = 10) -> None:
+        """Blocking full export, for the worker's prewarm (no event loop yet)."""
+        try:
+            request = urllib.request.Request(self._export_url, headers=self._headers)
+            with urllib.request.urlopen(request, timeout=timeout) as res:
+                self._replace_all(self._parse_export(res.read().decode()))
+            logger.info(f"catalog mirror loaded: {len(self.docs)} products")
+        except Exception as e:
+            logger.warning(f"catalog mirror load failed, searching Typesense until the next refresh: {e}")
+
+    async def _export(self, filter_by: str = "") -> list[dict]:
+        url = self._export_url + (f"?{urlencode({'filter_by': filter_by})}" if filter_by else "")
+        async with http_client.session().get(url, headers=self._headers) as res:
+            res.raise_for_status()
+            return self._parse_export(await res.text())
+
+    async def refresh(self) -> None:
+        if not self.ready or time.monotonic() - self.loaded_at >= CATALOG_FULL_RELOAD_SECONDS:
+            self._replace_all(await self._export())
+        else:
+            self._merge(await self._export(f"created_at:>{self.cursor}"))
+        self.refreshed_at = time.monotonic()
+
+    def start(self) -> None:
+        """Start the refresh task; its first refresh runs now if prewarm's load is a refresh interval old."""
+        self._task = asyncio.ensure_future(self._run())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            if self.ready:
+                await asyncio.sleep(max(0.0, CATALOG_REFRESH_SECONDS - (time.monotonic() - self.refreshed_at)))
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.warning(f"catalog mirror refresh failed: {e}")
+                self.refreshed_at = time.monotonic()  # retry after a full interval
+                if not self.ready:
+                    await asyncio.sleep(CATALOG_REFRESH_SECONDS)
+
+    # ---------- queries ----------
+
+    def mask(
+        self,
+        category: str,
+        colors: list[str],
+        sizes: list[str],
+        price_min: float | None,
+        price_max: float | None,
+        stock_only: bool,
+        created_after: int | None = None,
+    ) -> np.ndarray:
+        """Bool mask of the products _build_filter() with the same arguments would match."""
+        mask = np.ones(len(self.docs), dtype=bool)
+        if stock_only:
+            mask &= self.stock > 0
+        if category and category != "all":
+            if category.lower() not in self.categories:
+                return np.zeros_like(mask)
+            mask &= self.category == self.categories.index(category.lower())
+        for wanted, index, matrix in ((colors, self.color_index, self.colors), (sizes, self.size_index, self.sizes)):
+            if wanted:
+                columns = [index[v.lower()] for v in wanted if v.lower() in index]
+                if not columns:
+                    return np.zeros_like(mask)
+                mask &= matrix[:, columns].any(axis=1)
+        if price_min is not None and price_max is not None:
+            mask &= (self.price >= price_min) & (self.price <= price_max)
+        elif price_max is not None:
+            mask &= self.price < price_max
+        elif price_min is not None:
+            mask &= self.price >= price_min
+        if created_after is not None:
+            mask &= self.created_at > created_after
+        return mask
+
+    def top(self, mask: np.ndarray, sort_by: str, limit: int = 5) -> list[dict]:
+        """The first `limit` matches as Typesense-style hits ({"document": ...}), ordered by sort_by."""
+        rows = np.flatnonzero(mask)
+        if sort_by == "price:asc":
+            rows = rows[np.argsort(self.price[rows], kind="stable")]
+        elif sort_by == "price:desc":
+            rows = rows[np.argsort(-self.price[rows], kind="stable")]
+        elif sort_by == "created_at:desc":
+            rows = rows[np.argsort(-self.created_at[rows], kind="stable")]
+        return [{"document": self.docs[row]} for row in rows[:limit]]
+
+    def documents(self, ids: list[str]) -> dict[str, dict]:
+        """The mirrored documents for ids, by id (unknown ids left out)."""
+        return {pid: self._by_id[pid] for pid in ids if pid in self._by_id}
+
+    def categories_by_count(self) -> list[str]:
+        """Category values, most products first (what the Typesense category facet returns)."""
+        counts = np.bincount(self.category, minlength=len(self.categories))
+        order = sorted(range(len(self.categories)), key=lambda n: -counts[n])
+        names = {str(d.get("category", "")).lower(): d.get("category", "") for d in self.docs}
+        return [names[self.categories[n]] for n in order if counts[n]]
@@ -1,6 +1,5 @@
 import logging
 import os
-import aiohttp
 
 from dotenv import load_dotenv
 
@@ -10,6 +9,7 @@ from livekit.agents import (
     Agent,
     AgentSession,
     JobContext,
+    JobProcess,
     WorkerOptions,
     WorkerType,
     cli,
@@ -18,6 +18,7 @@ from livekit import api as lk_api
 from livekit.plugins import openai as lk_openai, deepgram, silero
 from livekit.plugins import groq as lk_groq
 from livekit.plugins import simli
+import http_client
 from session_logger import SessionLogger
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
@@ -86,7 +87,7 @@ async def delete_room(room_name: str):
         logger.warning("LiveKit credentials not set, cannot delete room")
         return
     try:
-        async with lk_api.LiveKitAPI(LIVEKIT_URL, LIVEKIT_API_KEY, LIVEKIT_API_SECRET) as lkapi:
+        async with lk_api.LiveKitAPI(LIVEKIT_URL, LIVEKIT_API_KEY, LIVEKIT_API_SECRET, session=http_client.session()) as lkapi:
             await lkapi.room.delete_room(lk_api.DeleteRoomRequest(room=room_name))
             logger.info(f"Room {room_name} deleted")
     except Exception as e:
@@ -97,32 +98,32 @@ async def search_knowledge(query: str) -> str:
     if not PINECONE_API_KEY or not PINECONE_INDEX_HOST:
         return ""
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                f"{PINECONE_INDEX_HOST}/records/namespaces/__default__/search",
-                headers={
-                    "Api-Key": PINECONE_API_KEY,
-                    "Content-Type": "application/json",
-                    "X-Pinecone-Api-Version": "2025-10",
-                },
-                json={
-                    "query": {"inputs": {"text": query}, "top_k": 4},
-                    "fields": ["text", "category"],
-                },
-            ) as res:
-                if res.status != 200:
-                    return ""
-                data = await res.json()
-                hits = data.get("result", {}).get("hits", [])
-                relevant = [
-                    h["fields"]["text"]
-                    for h in hits
-                    if (h.get("_score", 0) >= 0.2 and h.get("fields", {}).get("text"))
-                ]
-                if relevant:
-                    context = "\n".join(f"{i+1}. {t}" for i, t in enumerate(relevant))
-                    return f"Relevant knowledge from our knowledge base:\n{context}"
+        session = http_client.session()
+        async with session.post(
+            f"{PINECONE_INDEX_HOST}/records/namespaces/__default__/search",
+            headers={
+                "Api-Key": PINECONE_API_KEY,
+                "Content-Type": "application/json",
+                "X-Pinecone-Api-Version": "2025-10",
+            },
+            json={
+                "query": {"inputs": {"text": query}, "top_k": 4},
+                "fields": ["text", "category"],
+            },
+        ) as res:
+            if res.status != 200:
                 return ""
+            data = await res.json()
+            hits = data.get("result", {}).get("hits", [])
+            relevant = [
+                h["fields"]["text"]
+                for h in hits
+                if (h.get("_score", 0) >= 0.2 and h.get("fields", {}).get("text"))
+            ]
+            if relevant:
+                context = "\n".join(f"{i+1}. {t}" for i, t in enumerate(relevant))
+                return f"Relevant knowledge from our knowledge base:\n{context}"
+            return ""
     except Exception as e:
         logger.error(f"Pinecone search error: {e}")
         return ""
@@ -199,6 +200,10 @@ class SecretaryAgent(Agent):
             asyncio.ensure_future(delayed_end())
 
 
+def prewarm(proc: JobProcess):
+    http_client.prewarm([PINECONE_INDEX_HOST])
+
+
 async def entrypoint(ctx: JobContext):
     session_log = SessionLogger()
 
@@ -207,6 +212,8 @@ async def entrypoint(ctx: JobContext):
         await session_log.send_email()
 
     ctx.add_shutdown_callback(send_report)
+    http_client.start()
+    ctx.add_shutdown_callback(http_client.close)
     await ctx.connect()
     logger.info("Secretary agent connected to LiveKit room")
 
@@ -253,6 +260,7 @@ async def entrypoint(ctx: JobContext):
 if __name__ == "__main__":
     cli.run_app(WorkerOptions(
         entrypoint_fnc=entrypoint,
+        prewarm_fnc=prewarm,
         agent_name="aimediaflow-secretary",
         worker_type=WorkerType.ROOM,
     ))
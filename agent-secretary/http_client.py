@@ -0,0 +1,141 @@
+"""
+Process-wide aiohttp session for agent tool calls.
+
+Creating a ClientSession per call means a new connector, DNS lookup and TCP
+handshake inside every voice turn. Tools call session() instead and reuse one
+session per job process: keep-alive connections pooled per host, DNS answers
+cached, and a default timeout short enough for a live conversation (pass
+timeout= per request to override).
+
+Lifecycle, wired up in each agent's agent.py:
+
+    def prewarm(proc: JobProcess):            # WorkerOptions(prewarm_fnc=prewarm)
+        http_client.prewarm([API_URL, ...])   # resolve DNS before a job arrives
+
+    async def entrypoint(ctx: JobContext):
+        http_client.start()                   # open keep-alive connections in the background
+        ctx.add_shutdown_callback(http_client.close)
+
+Every agent directory carries an identical copy of this file (like
+session_logger.py, each agent is built from its own directory).
+"""
+
+import asyncio
+import logging
+import socket
+import time
+from urllib.parse import urlsplit
+
+import aiohttp
+from aiohttp.abc import AbstractResolver
+
+logger = logging.getLogger("http-client")
+
+DEFAULT_TIMEOUT = aiohttp.ClientTimeout(total=15, sock_connect=3)
+LIMIT = 50
+LIMIT_PER_HOST = 10
+KEEPALIVE_SECONDS = 60
+DNS_TTL_SECONDS = 300
+
+_session: aiohttp.ClientSession | None = None
+_session_loop: asyncio.AbstractEventLoop | None = None
+_warm_urls: list[str] = []
+_warm_tasks: set[asyncio.Task] = set()  # start()'s connection warm-ups still running
+_dns: dict[tuple[str, int, int], tuple[float, list[dict]]] = {}  # (host, port, family) -> (resolved at, addresses)
+
+
+class _PrewarmedResolver(AbstractResolver):
+    """Serves addresses resolved in prewarm() (and later lookups) for DNS_TTL_SECONDS."""
+
+    def __init__(self):
+        self._fallback = aiohttp.ThreadedResolver()
+
+    async def resolve(self, host: str, port: int = 0, family: int = socket.AF_INET) -> list[dict]:
+        cached = _dns.get((host, port, family))
+        if cached and time.monotonic() - cached[0] < DNS_TTL_SECONDS:
+            return cached[1]
+        addresses = await self._fallback.resolve(host, port, family)
+        _dns[(host, port, family)] = (time.monotonic(), addresses)
+        return addresses
+
+    async def close(self) -> None:
+        await self._fallback.close()
+
+
+def _host_port(url: str) -> tuple[str, int] | None:
+    parts = urlsplit(url)
+    if not parts.hostname:
+        return None
+    return parts.hostname, parts.port or (443 if parts.scheme in ("https", "wss") else 80)
+
+
+def prewarm(urls: list[str]) -> None:
+    """Resolve the hosts of urls now, off the call path, and remember them for start()."""
+    _warm_urls[:] = [url for url in urls if url]
+    for url in _warm_urls:
+        target = _host_port(url)
+        if not target:
+            continue
+        host, port = target
+        try:
+            infos = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        except OSError as e:
+            logger.warning(f"prewarm: cannot resolve {host}: {e}")
+            continue
+        addresses = [
+            {
+                "hostname": host, "host": sockaddr[0], "port": port,
+                "family": family, "proto": proto, "flags": socket.AI_NUMERICHOST | socket.AI_NUMERICSERV,
+            }
+            for family, _, proto, _, sockaddr in infos
+        ]
+        # the connector asks for its own family (AF_UNSPEC unless configured), so cache every view
+        resolved_at = time.monotonic()
+        _dns[(host, port, socket.AF_UNSPEC)] = (resolved_at, addresses)
+        for family in {address["family"] for address in addresses}:
+            _dns[(host, port, family)] = (resolved_at, [a for a in addresses if a["family"] == family])
+
+
+def session() -> aiohttp.ClientSession:
+    """The shared session for the running event loop, created on first use. Don't close it."""
+    global _session, _session_loop
+    loop = asyncio.get_running_loop()
+    if _session is None or _session.closed or _session_loop is not loop:
+        connector = aiohttp.TCPConnector(
+            limit=LIMIT,
+            limit_per_host=LIMIT_PER_HOST,
+            keepalive_timeout=KEEPALIVE_SECONDS,
+            resolver=_PrewarmedResolver(),
+            use_dns_cache=False,  # _PrewarmedResolver caches
+        )
+        _session = aiohttp.ClientSession(connector=connector, timeout=DEFAULT_TIMEOUT)
+        _session_loop = loop
+    return _session
+
+
+async def _open_connection(url: str) -> None:
+    try:
+        async with session().head(url, timeout=aiohttp.ClientTimeout(total=3)):
+            pass
+    except Exception as e:
+        logger.info(f"warm-up of {url} failed: {e}")
+
+
+def start() -> None:
+    """Create the session and open one keep-alive connection per prewarmed URL, without waiting."""
+    session()
+    for url in _warm_urls:
+        task = asyncio.ensure_future(_open_connection(url))
+        _warm_tasks.add(task)
+        task.add_done_callback(_warm_tasks.discard)
+
+
+async def close() -> None:
+    global _session
+    tasks = list(_warm_tasks)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
@@ -0,0 +1,83 @@
+"""
+Per-endpoint micro-benchmarks for the Cart API (pytest-benchmark), in-process on fakeredis.
+
+Not collected by a plain `pytest` run — invoke explicitly:
+    pip install -r requirements-bench.txt
+    pytest bench_cart_api.py --benchmark-only
+    pytest bench_cart_api.py --benchmark-only --benchmark-save=baseline   # then --benchmark-compare
+"""
+
+import asyncio
+from contextlib import AsyncExitStack
+
+import pytest
+
+from loadtest import PRODUCTS, check_lost_updates, open_client, run_mixed
+
+CART_LINES = 8  # items in the cart the read benchmarks run against
+
+
+@pytest.fixture(scope="module")
+def loop():
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+@pytest.fixture(scope="module")
+def client(loop):
+    stack = AsyncExitStack()
+    client = loop.run_until_complete(open_client(stack, None, "fake"))
+    for pid, name, price in PRODUCTS[:CART_LINES]:
+        loop.run_until_complete(
+            client.post("/cart/bench/add", json={"id": pid, "name": name, "price": price, "qty": 1, "size": "M"})
+        )
+    yield client
+    loop.run_until_complete(stack.aclose())
+
+
+def _call(loop, client, method, path, json=None, headers=None):
+    def run():
+        res = loop.run_until_complete(client.request(method, path, json=json, headers=headers))
+        assert res.status_code in (200, 304)
+    return run
+
+
+def test_get_cart(benchmark, loop, client):
+    benchmark(_call(loop, client, "GET", "/cart/bench"))
+
+
+def test_get_cart_not_modified(benchmark, loop, client):
+    etag = loop.run_until_complete(client.get("/cart/bench")).headers["etag"]
+    benchmark(_call(loop, client, "GET", "/cart/bench", headers={"If-None-Match": etag}))
+
+
+def test_add(benchmark, loop, client):
+    pid, name, price = PRODUCTS[0]
+    benchmark(_call(loop, client, "POST", "/cart/bench/add", {"id": pid, "name": name, "price": price, "qty": 1, "size": "M"}))
+
+
+def test_update(benchmark, loop, client):
+    benchmark(_call(loop, client, "POST", "/cart/bench/update", {"id": PRODUCTS[1][0], "qty": 2}))
+
+
+def test_remove_missing(benchmark, loop, client):
+    benchmark(_call(loop, client, "POST", "/cart/bench/remove", {"id": "not-in-cart"}))
+
+
+def test_batch(benchmark, loop, client):
+    ops = [{"op": "update", "id": pid, "qty": 1} for pid, _, _ in PRODUCTS[:4]]
+    benchmark(_call(loop, client, "POST", "/cart/bench/batch", {"ops": ops}))
+
+
+def test_mixed_workload(benchmark, loop, client):
+    result = benchmark.pedantic(
+        lambda: loop.run_until_complete(run_mixed(client, visitors=1000, requests=2000, concurrency=50)),
+        rounds=3,
+    )
+    assert not result["errors"]
+
+
+def test_no_lost_updates(loop, client):
+    race = loop.run_until_complete(check_lost_updates(client, carts=10, writers=20))
+    assert race["lost_updates"] == 0
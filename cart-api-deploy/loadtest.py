@@ -0,0 +1,173 @@
+"""
+Cart API load generator.
+
+Drives a mixed add/update/remove/batch/get workload across many visitor ids and
+reports req/s and p50/p95/p99 latency per endpoint, then runs a contention
+phase that fires concurrent adds at the same cart lines and counts lost updates.
+
+Targets:
+    --redis fake   in-process app on fakeredis (needs fakeredis + lupa for Lua), default
+    --redis real   in-process app on REDIS_HOST/REDIS_PORT (e.g. a local redis-server)
+    --url URL      a running cart-api over HTTP (the --redis option is ignored)
+
+Usage:
+    python loadtest.py
+    python loadtest.py --visitors 5000 --requests 50000 --concurrency 200
+    python loadtest.py --redis real
+    python loadtest.py --url http://localhost:8000
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from collections import defaultdict
+from contextlib import AsyncExitStack
+
+import httpx
+
+PRODUCTS = [(f"p{n:03d}", f"Product {n}", round(9.99 + n, 2)) for n in range(1, 41)]
+SIZES = ["", "S", "M", "L", "XL"]
+WORKLOAD = {"get": 40, "add": 30, "update": 15, "remove": 10, "batch": 5}
+
+
+def _use_fakeredis(main) -> None:
+    """Point the app's connection pool at an in-memory fakeredis server."""
+    import fakeredis
+    import fakeredis.aioredis
+
+    main.pool.connection_class = fakeredis.aioredis.FakeConnection
+    main.pool.connection_kwargs["server"] = fakeredis.FakeServer()
+
+
+def _seed_catalog(main) -> None:
+    """Preload the in-process catalog with PRODUCTS so adds don't go to Typesense."""
+    for n, (pid, name, price) in enumerate(PRODUCTS):
+        main.catalog._put({"id": pid, "name": name, "price": price, "created_at": n})
+
+
+async def open_client(stack: AsyncExitStack, url: str | None, redis_mode: str) -> httpx.AsyncClient:
+    """HTTP client for a remote cart-api, or for the in-process app when url is None."""
+    if url:
+        return await stack.enter_async_context(httpx.AsyncClient(base_url=url, timeout=10))
+    import main
+
+    if redis_mode == "fake":
+        _use_fakeredis(main)
+    await stack.enter_async_context(main.lifespan(main.app))
+    _seed_catalog(main)
+    transport = httpx.ASGITransport(app=main.app)
+    return await stack.enter_async_context(httpx.AsyncClient(transport=transport, base_url="http://cart-api"))
+
+
+def _request(rng: random.Random, visitors: int) -> tuple[str, str, str, dict | None]:
+    """Pick (endpoint, method, path, json) for one request of the mixed workload."""
+    endpoint = rng.choices(list(WORKLOAD), weights=list(WORKLOAD.values()))[0]
+    visitor = f"load-{rng.randrange(visitors)}"
+    pid, name, price = rng.choice(PRODUCTS)
+    size = rng.choice(SIZES)
+    if endpoint == "get":
+        return endpoint, "GET", f"/cart/{visitor}", None
+    if endpoint == "add":
+        return endpoint, "POST", f"/cart/{visitor}/add", {"id": pid, "name": name, "price": price, "qty": rng.randint(1, 3), "size": size}
+    if endpoint == "update":
+        return endpoint, "POST", f"/cart/{visitor}/update", {"id": pid, "qty": rng.randint(0, 5)}
+    if endpoint == "remove":
+        return endpoint, "POST", f"/cart/{visitor}/remove", {"id": pid}
+    ops = []
+    for _ in range(rng.randint(2, 5)):
+        pid, name, price = rng.choice(PRODUCTS)
+        ops.append({"op": "add", "id": pid, "name": name, "price": price, "qty": 1, "size": rng.choice(SIZES)})
+    return endpoint, "POST", f"/cart/{visitor}/batch", {"ops": ops}
+
+
+async def run_mixed(client: httpx.AsyncClient, visitors: int, requests: int, concurrency: int, seed: int = 1) -> dict:
+    """Run the mixed workload. Returns {"elapsed", "latencies": {endpoint: [s]}, "errors": {endpoint: n}}."""
+    rng = random.Random(seed)
+    plan = [_request(rng, visitors) for _ in range(requests)]
+    latencies: dict[str, list[float]] = defaultdict(list)
+    errors: dict[str, int] = defaultdict(int)
+    cursor = iter(plan)
+
+    async def worker():
+        for endpoint, method, path, body in cursor:
+            start = time.perf_counter()
+            try:
+                res = await client.request(method, path, json=body)
+                ok = res.status_code == 200
+            except httpx.HTTPError:
+                ok = False
+            latencies[endpoint].append(time.perf_counter() - start)
+            if not ok:
+                errors[endpoint] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return {"elapsed": time.perf_counter() - start, "latencies": dict(latencies), "errors": dict(errors)}
+
+
+async def check_lost_updates(client: httpx.AsyncClient, carts: int, writers: int) -> dict:
+    """Fire `writers` concurrent qty=1 adds at one line of each of `carts` carts; count lines that came up short."""
+    pid, name, price = PRODUCTS[0]
+    visitors = [f"race-{n}-{time.time_ns()}" for n in range(carts)]
+    item = {"id": pid, "name": name, "price": price, "qty": 1, "size": "M"}
+    await asyncio.gather(*(
+        client.post(f"/cart/{v}/add", json=item) for v in visitors for _ in range(writers)
+    ))
+    lost = 0
+    for v in visitors:
+        items = (await client.get(f"/cart/{v}")).json()["items"]
+        qty = sum(i["qty"] for i in items if i["id"] == pid and i["size"] == "M")
+        lost += writers - qty
+        await client.delete(f"/cart/{v}")
+    return {"carts": carts, "writes": carts * writers, "lost_updates": lost}
+
+
+def percentile(values: list[float], pct: float) -> float:
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100, method="inclusive")[int(pct) - 1]
+
+
+def print_report(result: dict) -> None:
+    elapsed = result["elapsed"]
+    total = sum(len(v) for v in result["latencies"].values())
+    print(f"\n{total} requests in {elapsed:.2f}s — {total / elapsed:.0f} req/s overall\n")
+    print(f"{'endpoint':<10}{'n':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for endpoint in WORKLOAD:
+        lat = result["latencies"].get(endpoint, [])
+        if not lat:
+            continue
+        print(
+            f"{endpoint:<10}{len(lat):>8}{len(lat) / elapsed:>10.0f}"
+            f"{percentile(lat, 50) * 1000:>10.2f}{percentile(lat, 95) * 1000:>10.2f}{percentile(lat, 99) * 1000:>10.2f}"
+            f"{result['errors'].get(endpoint, 0):>8}"
+        )
+
+
+async def main_async(args) -> int:
+    async with AsyncExitStack() as stack:
+        client = await open_client(stack, args.url, args.redis)
+        result = await run_mixed(client, args.visitors, args.requests, args.concurrency, args.seed)
+        print_report(result)
+        race = await check_lost_updates(client, args.race_carts, args.race_writers)
+        print(f"\nContention: {race['writes']} concurrent adds over {race['carts']} carts — lost updates: {race['lost_updates']}")
+        return 1 if race["lost_updates"] else 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Cart API load generator")
+    parser.add_argument("--url", help="Base URL of a running cart-api; default runs the app in-process")
+    parser.add_argument("--redis", choices=["fake", "real"], default="fake", help="In-process Redis backend")
+    parser.add_argument("--visitors", type=int, default=2000)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--race-carts", type=int, default=20)
+    parser.add_argument("--race-writers", type=int, default=25)
+    parser.add_argument("--seed", type=int, default=1)
+    raise SystemExit(asyncio.run(main_async(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
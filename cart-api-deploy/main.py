@@ -1,28 +1,134 @@
+import asyncio
+import hashlib
 import json
+import logging
 import os
+import time
 import uuid
-from typing import Optional
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from email.utils import formatdate
+from typing import Annotated, BinaryIO, Literal, Optional, Union
 
-import redis
+import httpx
+import redis.asyncio as aioredis
 from dotenv import load_dotenv
-from fastapi import FastAPI, File, HTTPException, Request, UploadFile
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import Response
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel
+from PIL import Image
+from pydantic import BaseModel, Field
+from python_multipart.multipart import MultipartParser, parse_options_header
+from redis.exceptions import ConnectionError as RedisConnectionError
+from starlette.concurrency import run_in_threadpool
 
 load_dotenv()
 
+logger = logging.getLogger("cart-api")
+
 REDIS_HOST = os.getenv("REDIS_HOST", "127.0.0.1")
 REDIS_PORT = int(os.getenv("REDIS_PORT", "6379"))
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+REDIS_POOL_TIMEOUT = float(os.getenv("REDIS_POOL_TIMEOUT", "5"))  # seconds to wait for a free connection
 CART_TTL = 7 * 24 * 3600  # 7 days in seconds
+STREAM_KEEPALIVE = 15  # seconds between SSE keepalive comments
+STREAM_QUEUE_SIZE = 100  # pending deltas per listener before it is resynced
 
 UPLOADS_DIR = "/app/uploads"
 os.makedirs(UPLOADS_DIR, exist_ok=True)
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(15 * 1024 * 1024)))
+UPLOAD_CHUNK = 1024 * 1024
+UPLOAD_FORM_OVERHEAD = 64 * 1024  # boundaries, part headers and other fields allowed on top of UPLOAD_MAX_BYTES
+THUMB_MAX = (400, 400)
+THUMB_SUFFIX = "_thumb.webp"
+UPLOAD_FORMATS = {"JPEG": ".jpg", "PNG": ".png", "GIF": ".gif", "WEBP": ".webp"}  # sniffed format -> stored extension
 
 PUBLIC_BASE = os.getenv("PUBLIC_BASE", "https://aimediaflow.net")
 
-app = FastAPI(title="Cart API")
+TYPESENSE_BASE = f"http://{os.getenv('TYPESENSE_HOST', 'typesense')}:{os.getenv('TYPESENSE_PORT', '8108')}"
+TYPESENSE_API_KEY = os.getenv("TYPESENSE_API_KEY", "typesense-local-key-2025")
+CATALOG_MAX_ITEMS = int(os.getenv("CATALOG_MAX_ITEMS", "5000"))
+CATALOG_REFRESH_SECONDS = int(os.getenv("CATALOG_REFRESH_SECONDS", "60"))  # new-product poll interval
+CATALOG_ENTRY_TTL = int(os.getenv("CATALOG_ENTRY_TTL", "600"))  # refetch price/name after this many seconds
+
+SWEEP_INTERVAL = int(os.getenv("SWEEP_INTERVAL", "900"))  # seconds between full passes over cart:*
+SWEEP_BATCH = int(os.getenv("SWEEP_BATCH", "500"))  # SCAN COUNT hint / keys per pipeline
+SWEEP_PAUSE = float(os.getenv("SWEEP_PAUSE", "0.05"))  # seconds between batches
+ABANDONED_AFTER = int(os.getenv("ABANDONED_AFTER", str(24 * 3600)))  # idle seconds before a non-empty cart counts as abandoned
+
+
+
+class RedisPoolTimeout(RedisConnectionError):
+    """No pooled Redis connection freed up within REDIS_POOL_TIMEOUT (answered with 503)."""
+
+
+class _CartRedisPool(aioredis.BlockingConnectionPool):
+    """Blocking pool that also counts connections created and callers waiting, for /health."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.created = 0
+        self.waiting = 0
+
+    def make_connection(self):
+        self.created += 1
+        return super().make_connection()
+
+    async def get_connection(self, *args, **kwargs):
+        if self.can_get_connection():
+            return await self._get_connection(*args, **kwargs)
+        self.waiting += 1
+        try:
+            return await self._get_connection(*args, **kwargs)
+        finally:
+            self.waiting -= 1
+
+    async def _get_connection(self, *args, **kwargs):
+        try:
+            return await super().get_connection(*args, **kwargs)
+        except RedisConnectionError as e:
+            # the base class reports a wait that timed out as a plain ConnectionError
+            if isinstance(e.__cause__, asyncio.TimeoutError):
+                raise RedisPoolTimeout(str(e)) from e
+            raise
+
+    def stats(self) -> dict:
+        return {
+            "max": self.max_connections,
+            "created": self.created,
+            "in_use": len(self._in_use_connections),
+            "idle": len(self._available_connections),
+            "waiting": self.waiting,
+        }
+
+
+pool = _CartRedisPool(
+    host=REDIS_HOST,
+    port=REDIS_PORT,
+    decode_responses=True,
+    max_connections=REDIS_MAX_CONNECTIONS,
+    timeout=REDIS_POOL_TIMEOUT,
+)
+r = aioredis.Redis(connection_pool=pool)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    events.start()
+    variants.start()
+    catalog.start()
+    sweeper.start()
+    yield
+    await sweeper.stop()
+    await catalog.stop()
+    await variants.stop()
+    await events.stop()
+    await r.aclose()
+    await pool.disconnect()
+
+
+app = FastAPI(title="Cart API", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -35,123 +141,1113 @@ app.add_middleware(
     ],
     allow_credentials=False,
     allow_methods=["GET", "POST", "DELETE", "OPTIONS"],
-    allow_headers=["Content-Type"],
+    allow_headers=["Content-Type", "If-None-Match"],
+    expose_headers=["ETag", "Last-Modified"],
 )
 
 app.mount("/uploads", StaticFiles(directory=UPLOADS_DIR), name="uploads")
 
-r = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, decode_responses=True)
+
+@app.exception_handler(RedisPoolTimeout)
+async def redis_pool_timeout(request: Request, exc: RedisPoolTimeout):
+    return JSONResponse(status_code=503, content={"detail": "Cart storage busy, try again"}, headers={"Retry-After": "1"})
 
 
 def _cart_key(visitor_id: str) -> str:
     return f"cart:{visitor_id}"
 
 
-def _load_items(visitor_id: str) -> list[dict]:
-    raw = r.get(_cart_key(visitor_id))
-    if not raw:
-        return []
-    try:
-        return json.loads(raw)
-    except Exception:
+# ---------- cart storage ----------
+#
+# A cart is a Redis hash: one field per product+size ("{id}|{size}") holding the
+# item, plus meta fields prefixed with "_": "_seq" keeps insertion order,
+# "_ver"/"_mtime"/"_total" describe the last mutation. Versions come from one
+# global counter, so they only ever increase, even across expired carts.
+# Every read/mutation runs as a single Lua script, so concurrent writers from the
+# voice agent and the frontend cannot lose each other's updates. Carts written by
+# older versions (a JSON list under the same key) are converted on first touch.
+# Each mutation is appended to a capped "cart-log:{id}" list (for ?since_version=)
+# and PUBLISHed on "events:cart:{id}" (for /cart/{id}/stream) as
+# {"version", "prev", "changes", "total"}.
+#
+# Item values are written packed — a format byte (0x01) followed by
+# id, name, price, qty, size, seq joined by 0x1f — instead of JSON with the
+# same five key names repeated in every line. JSON values (first byte "{")
+# written by earlier versions are still read, and are repacked when the line
+# next changes. CART_ENCODING=json keeps writing JSON.
+
+CART_LOG_MAX = 50  # mutations kept per cart for ?since_version=
+CART_VERSION_KEY = "cart-version"
+CART_ENCODING = os.getenv("CART_ENCODING", "packed")  # "packed" | "json"
+
+_LUA_PRELUDE = (
+    f"local LOG_MAX = {CART_LOG_MAX}\n"
+    f"local PACKED = {'true' if CART_ENCODING == 'packed' else 'false'}\n"
+) + """
+local key, log_key, version_key = KEYS[1], KEYS[2], KEYS[3]
+local changes = {}
+local FORMAT_PACKED = string.char(1)
+local SEP = string.char(31)
+
+local function split(s)
+    local parts, start = {}, 1
+    while true do
+        local i = string.find(s, SEP, start, true)
+        if not i then
+            table.insert(parts, string.sub(s, start))
+            return parts
+        end
+        table.insert(parts, string.sub(s, start, i - 1))
+        start = i + 1
+    end
+end
+
+local function clean(s)
+    return (string.gsub(s, SEP, ''))
+end
+
+local function encode_item(it)
+    if not PACKED then
+        return cjson.encode(it)
+    end
+    return FORMAT_PACKED .. table.concat({clean(it.id), clean(it.name), tostring(it.price),
+                                          tostring(it.qty), clean(it.size), tostring(it.seq)}, SEP)
+end
+
+local function decode_item(raw)
+    if string.sub(raw, 1, 1) ~= FORMAT_PACKED then
+        return cjson.decode(raw)
+    end
+    local p = split(string.sub(raw, 2))
+    return {id = p[1], name = p[2], price = tonumber(p[3]), qty = tonumber(p[4]),
+            size = p[5], seq = tonumber(p[6])}
+end
+
+local function is_meta(field)
+    return string.sub(field, 1, 1) == '_'
+end
+
+local function public_item(it)
+    return {id = it.id, name = it.name, price = it.price, qty = it.qty, size = it.size}
+end
+
+local function field_for(id, size)
+    return id .. '|' .. size
+end
+
+local function migrate()
+    if redis.call('TYPE', key).ok ~= 'string' then
+        return
+    end
+    local raw = redis.call('GET', key)
+    local ttl = redis.call('TTL', key)
+    redis.call('DEL', key)
+    local ok, items = pcall(cjson.decode, raw)
+    if not ok or type(items) ~= 'table' then
+        return
+    end
+    local seq = 0
+    for _, it in ipairs(items) do
+        if type(it) == 'table' and type(it.id) == 'string' then
+            if type(it.size) ~= 'string' then it.size = '' end
+            seq = seq + 1
+            it.seq = seq
+            redis.call('HSET', key, field_for(it.id, it.size), encode_item(it))
+        end
+    end
+    if seq > 0 then
+        redis.call('HSET', key, '_seq', seq)
+        if ttl > 0 then redis.call('EXPIRE', key, ttl) end
+    end
+end
+
+local function lines_for(id)
+    local found = {}
+    local flat = redis.call('HGETALL', key)
+    for i = 1, #flat, 2 do
+        if not is_meta(flat[i]) then
+            local it = decode_item(flat[i + 1])
+            if id == nil or it.id == id then
+                table.insert(found, {flat[i], it})
+            end
+        end
+    end
+    table.sort(found, function(a, b) return a[2].seq < b[2].seq end)
+    return found
+end
+
+local function add_line(id, name, price, qty, size)
+    local field = field_for(id, size)
+    local raw = redis.call('HGET', key, field)
+    local it
+    if raw then
+        it = decode_item(raw)
+        it.qty = it.qty + qty
+        it.name = name
+        it.price = price
+    else
+        it = {id = id, name = name, price = price, qty = qty, size = size,
+              seq = redis.call('HINCRBY', key, '_seq', 1)}
+    end
+    redis.call('HSET', key, field, encode_item(it))
+    table.insert(changes, {type = 'set', item = public_item(it)})
+end
+
+-- size == nil removes every size of the product
+local function remove_lines(id, size)
+    for _, line in ipairs(lines_for(id)) do
+        if size == nil or line[2].size == size then
+            redis.call('HDEL', key, line[1])
+            table.insert(changes, {type = 'del', id = id, size = line[2].size})
+        end
+    end
+end
+
+-- size == nil updates the earliest line of the product; qty <= 0 removes it
+local function update_line(id, qty, size)
+    for _, line in ipairs(lines_for(id)) do
+        if size == nil or line[2].size == size then
+            if qty <= 0 then
+                redis.call('HDEL', key, line[1])
+                table.insert(changes, {type = 'del', id = id, size = line[2].size})
+            else
+                line[2].qty = qty
+                redis.call('HSET', key, line[1], encode_item(line[2]))
+                table.insert(changes, {type = 'set', item = public_item(line[2])})
+            end
+            return
+        end
+    end
+end
+
+local function clear_lines()
+    for _, line in ipairs(lines_for(nil)) do
+        redis.call('HDEL', key, line[1])
+    end
+    table.insert(changes, {type = 'clear'})
+end
+
+local function meta()
+    local m = redis.call('HMGET', key, '_ver', '_mtime', '_total')
+    return m[1] or '0', m[2] or '0', m[3] or '0.00'
+end
+
+-- records the mutation (version bump, log, publish) if anything changed
+local function commit(total, ttl)
+    if #changes == 0 then
+        return
+    end
+    local prev = meta()
+    local version = redis.call('INCR', version_key)
+    local now = redis.call('TIME')[1]
+    redis.call('HSET', key, '_ver', version, '_mtime', now, '_total', total)
+    local entry = cjson.encode({version = version, prev = tonumber(prev),
+                                changes = changes, total = tonumber(total)})
+    redis.call('LPUSH', log_key, entry)
+    redis.call('LTRIM', log_key, 0, LOG_MAX - 1)
+    redis.call('EXPIRE', log_key, ttl)
+    redis.call('PUBLISH', 'events:' .. key, entry)
+end
+
+-- reply: {total, version, mtime, then id, name, price, qty, size per item in cart order}
+local function result(ttl)
+    local items = {}
+    local total = 0
+    local flat = redis.call('HGETALL', key)
+    for i = 1, #flat, 2 do
+        if not is_meta(flat[i]) then
+            local it = decode_item(flat[i + 1])
+            total = total + it.price * it.qty
+            table.insert(items, it)
+        end
+    end
+    table.sort(items, function(a, b) return a.seq < b.seq end)
+    total = string.format('%.2f', total)
+    if ttl then
+        commit(total, ttl)
+        if redis.call('EXISTS', key) == 1 then
+            redis.call('EXPIRE', key, ttl)
+        end
+    end
+    local version, mtime = meta()
+    local out = {total, version, mtime}
+    for _, it in ipairs(items) do
+        table.insert(out, it.id)
+        table.insert(out, it.name)
+        table.insert(out, tostring(it.price))
+        table.insert(out, tostring(it.qty))
+        table.insert(out, it.size)
+    end
+    return out
+end
+
+local function optional_size(has_size, size)
+    if has_size == '1' then return size end
+    return nil
+end
+
+migrate()
+"""
+
+# ARGV: id, name, price, qty, size, ttl
+_LUA_ADD = _LUA_PRELUDE + """
+add_line(ARGV[1], ARGV[2], tonumber(ARGV[3]), tonumber(ARGV[4]), ARGV[5])
+return result(ARGV[6])
+"""
+
+# ARGV: id, size, has_size, ttl
+_LUA_REMOVE = _LUA_PRELUDE + """
+remove_lines(ARGV[1], optional_size(ARGV[3], ARGV[2]))
+return result(ARGV[4])
+"""
+
+# ARGV: id, qty, size, has_size, ttl
+_LUA_UPDATE = _LUA_PRELUDE + """
+update_line(ARGV[1], tonumber(ARGV[2]), optional_size(ARGV[4], ARGV[3]))
+return result(ARGV[5])
+"""
+
+# ARGV: ops as a JSON list of {op, id, ...}, ttl — applied in order within one script call
+_LUA_BATCH = _LUA_PRELUDE + """
+for _, op in ipairs(cjson.decode(ARGV[1])) do
+    if op.op == 'add' then
+        add_line(op.id, op.name, op.price, op.qty, op.size)
+    elseif op.op == 'remove' then
+        remove_lines(op.id, op.size)
+    elseif op.op == 'update' then
+        update_line(op.id, op.qty, op.size)
+    end
+end
+return result(ARGV[2])
+"""
+
+# ARGV: ttl
+_LUA_CLEAR = _LUA_PRELUDE + """
+clear_lines()
+return result(ARGV[1])
+"""
+
+# ARGV: versions the client already has (If-None-Match) — a match returns {'', version, mtime}
+_LUA_GET = _LUA_PRELUDE + """
+local version, mtime = meta()
+for i = 1, #ARGV do
+    if ARGV[i] == version then
+        return {'', version, mtime}
+    end
+end
+return result()
+"""
+
+# ARGV: since_version — {'delta', version, mtime, total, entry_json...} (oldest first) when the
+# log still reaches back to since_version, otherwise {'full', <result()>...}
+_LUA_CHANGES = _LUA_PRELUDE + """
+local since = tonumber(ARGV[1])
+local version, mtime, total = meta()
+local out = {'delta', version, mtime, total}
+if tonumber(version) ~= since then
+    local found = false
+    local entries = redis.call('LRANGE', log_key, 0, -1)
+    for i = 1, #entries do
+        local entry = cjson.decode(entries[i])
+        if entry.version <= since then
+            break
+        end
+        table.insert(out, 5, entries[i])
+        if entry.prev == since then
+            found = true
+            break
+        end
+    end
+    if not found then
+        out = {'full'}
+        for _, v in ipairs(result()) do
+            table.insert(out, v)
+        end
+    end
+end
+return out
+"""
+
+_add_script = r.register_script(_LUA_ADD)
+_remove_script = r.register_script(_LUA_REMOVE)
+_update_script = r.register_script(_LUA_UPDATE)
+_batch_script = r.register_script(_LUA_BATCH)
+_clear_script = r.register_script(_LUA_CLEAR)
+_get_script = r.register_script(_LUA_GET)
+_changes_script = r.register_script(_LUA_CHANGES)
+
+
+def _cart_keys(visitor_id: str) -> list[str]:
+    return [_cart_key(visitor_id), f"cart-log:{visitor_id}", CART_VERSION_KEY]
+
+
+def _cart_response(reply: list) -> dict:
+    """Turn a script reply ([total, version, mtime, id, name, price, qty, size, ...]) into the public cart shape."""
+    fields = reply[3:]
+    items = [
+        {"id": fields[i], "name": fields[i + 1], "price": float(fields[i + 2]), "qty": int(fields[i + 3]), "size": fields[i + 4]}
+        for i in range(0, len(fields), 5)
+    ]
+    return {"items": items, "total": round(float(reply[0]), 2), "version": int(reply[1])}
+
+
+def _cache_headers(version: str, mtime: str) -> dict:
+    headers = {"ETag": f'"{version}"', "Cache-Control": "no-cache"}
+    if int(mtime):
+        headers["Last-Modified"] = formatdate(int(mtime), usegmt=True)
+    return headers
+
+
+def _etag_versions(if_none_match: Optional[str]) -> list[str]:
+    """Versions listed in an If-None-Match header ('"12", W/"13"' → ['12', '13'])."""
+    if not if_none_match:
         return []
+    return [tag.strip().removeprefix("W/").strip('"') for tag in if_none_match.split(",")]
+
+
+def _events_channel(visitor_id: str) -> str:
+    return f"events:{_cart_key(visitor_id)}"
+
+
+class _CartEventHub:
+    """Fans cart events out to this process's stream listeners over one pattern subscription."""
+
+    def __init__(self):
+        self._listeners: dict[str, set[asyncio.Queue]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def listen(self, visitor_id: str) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=STREAM_QUEUE_SIZE)
+        self._listeners.setdefault(visitor_id, set()).add(queue)
+        return queue
+
+    def unlisten(self, visitor_id: str, queue: asyncio.Queue) -> None:
+        queues = self._listeners.get(visitor_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self._listeners[visitor_id]
+
+    @staticmethod
+    def _resync(queue: asyncio.Queue) -> None:
+        """Drop the queue's backlog and make its stream resend a snapshot."""
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(None)
+
+    def _dispatch(self, channel: str, data: str) -> None:
+        visitor_id = channel[len(_events_channel("")):]
+        for queue in self._listeners.get(visitor_id, ()):
+            try:
+                queue.put_nowait(data)
+            except asyncio.QueueFull:  # slow consumer
+                self._resync(queue)
+
+    async def _run(self) -> None:
+        while True:
+            pubsub = r.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.psubscribe(_events_channel("*"))
+                # events published while (re)subscribing were missed: every listener starts over
+                for queues in self._listeners.values():
+                    for queue in queues:
+                        self._resync(queue)
+                async for message in pubsub.listen():
+                    if message and message["type"] == "pmessage":
+                        self._dispatch(message["channel"], message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"cart event subscription lost: {e}")
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
+
+events = _CartEventHub()
+
+
+# ---------- image variants ----------
+
+def _make_variants(path: str) -> None:
+    """Write {sha}.webp (if the original is not WebP) and {sha}_thumb.webp next to an upload."""
+    base, ext = os.path.splitext(path)
+    with Image.open(path) as img:
+        img = img.convert("RGBA" if img.mode in ("RGBA", "LA", "P") else "RGB")
+        if ext != ".webp":
+            img.save(f"{base}.webp", "WEBP", quality=85)
+        img.thumbnail(THUMB_MAX)
+        img.save(f"{base}{THUMB_SUFFIX}", "WEBP", quality=80)
+
+
+class _VariantWorker:
+    """Background task that renders image variants off the event loop, one upload at a time."""
+
+    def __init__(self):
+        self._queue: asyncio.Queue[str] = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def submit(self, path: str) -> None:
+        self._queue.put_nowait(path)
+
+    async def _run(self) -> None:
+        while True:
+            path = await self._queue.get()
+            try:
+                await asyncio.to_thread(_make_variants, path)
+            except Exception as e:
+                logger.warning(f"image variants failed for {path}: {e}")
+
 
+variants = _VariantWorker()
 
-def _save_items(visitor_id: str, items: list[dict]) -> None:
-    r.setex(_cart_key(visitor_id), CART_TTL, json.dumps(items))
 
+# ---------- product catalog ----------
 
-def _calc_total(items: list[dict]) -> float:
-    return round(sum(item["price"] * item.get("qty", 1) for item in items), 2)
+class _CatalogCache:
+    """id → {name, price, sizes, stock} from Typesense, so adds only need id/qty/size.
+
+    Warmed with a full export at startup, then every CATALOG_REFRESH_SECONDS only
+    products created after the newest created_at seen are exported. Entries older
+    than CATALOG_ENTRY_TTL are refetched on lookup (picks up price/stock edits).
+    Bounded to CATALOG_MAX_ITEMS, least recently used evicted first.
+    """
+
+    _FIELDS = "id,name,price,sizes,stock,created_at"
+
+    def __init__(self):
+        self._items: OrderedDict[str, dict] = OrderedDict()
+        self._cursor = 0
+        self._task: Optional[asyncio.Task] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self.hits = 0
+        self.misses = 0
+
+    def start(self) -> None:
+        self._client = httpx.AsyncClient(
+            base_url=TYPESENSE_BASE,
+            headers={"X-TYPESENSE-API-KEY": TYPESENSE_API_KEY},
+            timeout=5,
+        )
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self._client:
+            await self._client.aclose()
+
+    def _put(self, doc: dict) -> None:
+        pid = doc.get("id")
+        if not pid:
+            return
+        self._items[pid] = {
+            "name": doc.get("name", pid),
+            "price": float(doc.get("price", 0)),
+            "sizes": doc.get("sizes", []),
+            "stock": doc.get("stock", 0),
+            "fetched": time.monotonic(),
+        }
+        self._items.move_to_end(pid)
+        self._cursor = max(self._cursor, int(doc.get("created_at", 0)))
+        while len(self._items) > CATALOG_MAX_ITEMS:
+            self._items.popitem(last=False)
+
+    async def _export(self, filter_by: str = "") -> int:
+        params = {"include_fields": self._FIELDS}
+        if filter_by:
+            params["filter_by"] = filter_by
+        count = 0
+        async with self._client.stream("GET", "/collections/products/documents/export", params=params) as res:
+            res.raise_for_status()
+            async for line in res.aiter_lines():
+                if line:
+                    self._put(json.loads(line))
+                    count += 1
+        return count
+
+    async def _run(self) -> None:
+        warmed = False
+        while True:
+            try:
+                if not warmed:
+                    logger.info(f"catalog warmed with {await self._export()} products")
+                    warmed = True
+                else:
+                    added = await self._export(f"created_at:>{self._cursor}")
+                    if added:
+                        logger.info(f"catalog refresh: {added} new products")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"catalog refresh failed: {e}")
+            await asyncio.sleep(CATALOG_REFRESH_SECONDS)
+
+    async def get_many(self, product_ids: list[str]) -> dict[str, dict]:
+        """Catalog entries for the given ids; misses and stale entries are fetched in one Typesense request."""
+        found: dict[str, dict] = {}
+        missing = []
+        now = time.monotonic()
+        for pid in dict.fromkeys(product_ids):
+            entry = self._items.get(pid)
+            if entry and now - entry["fetched"] < CATALOG_ENTRY_TTL:
+                self._items.move_to_end(pid)
+                found[pid] = entry
+                self.hits += 1
+            else:
+                missing.append(pid)
+                self.misses += 1
+        if missing and self._client:
+            try:
+                res = await self._client.get(
+                    "/collections/products/documents/search",
+                    params={
+                        "q": "*",
+                        "query_by": "name",
+                        "filter_by": f"id:[{','.join(missing)}]",
+                        "include_fields": self._FIELDS,
+                        "per_page": len(missing),
+                    },
+                )
+                res.raise_for_status()
+                for hit in res.json().get("hits", []):
+                    self._put(hit["document"])
+            except Exception as e:
+                logger.warning(f"catalog lookup failed for {missing}: {e}")
+            for pid in missing:
+                if pid in self._items:
+                    found[pid] = self._items[pid]
+        return found
+
+    def stats(self) -> dict:
+        return {"products": len(self._items), "cursor": self._cursor, "hits": self.hits, "misses": self.misses}
+
+
+catalog = _CatalogCache()
+
+
+# ---------- cart stats sweeper ----------
+#
+# A pass walks cart:* with SCAN, SWEEP_BATCH keys at a time, reading each batch
+# with one pipelined round of HGETALL. Counts for the pass accumulate in
+# "cart-stats:partial" together with the SCAN cursor, written in one MULTI so
+# a restarted process resumes from the last completed batch without counting
+# anything twice. When the cursor comes back to 0 the partial hash is RENAMEd
+# over "cart-stats", which /stats/carts serves. "cart-stats:lock" keeps
+# replicas from sweeping at the same time.
+
+STATS_KEY = "cart-stats"
+STATS_PARTIAL_KEY = "cart-stats:partial"
+STATS_LOCK_KEY = "cart-stats:lock"
+AGE_BUCKETS = [("1h", 3600), ("1d", 24 * 3600), ("3d", 3 * 24 * 3600), ("7d", None)]
+
+
+def _item_qty(raw: str) -> int:
+    """qty of a stored item value, packed or JSON (see decode_item in the Lua prelude)."""
+    if raw.startswith("\x01"):
+        return int(raw[1:].split("\x1f")[3])
+    return int(json.loads(raw).get("qty", 0))
+
+
+def _age_bucket(age: float) -> str:
+    for name, limit in AGE_BUCKETS:
+        if limit is None or age < limit:
+            return name
+    return AGE_BUCKETS[-1][0]
+
+
+class _CartSweeper:
+    """Background task that keeps the cart-stats rollup up to date; see the comment above."""
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self._token = uuid.uuid4().hex
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if await r.get(STATS_LOCK_KEY) == self._token:
+            await r.delete(STATS_LOCK_KEY)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                if await self._hold_lock():
+                    await self._sweep()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"cart sweep failed: {e}")
+            await asyncio.sleep(SWEEP_INTERVAL)
+
+    async def _hold_lock(self) -> bool:
+        """Take or extend the sweep lock for this process."""
+        ttl = SWEEP_INTERVAL + 60
+        if await r.set(STATS_LOCK_KEY, self._token, nx=True, ex=ttl):
+            return True
+        if await r.get(STATS_LOCK_KEY) == self._token:
+            await r.expire(STATS_LOCK_KEY, ttl)
+            return True
+        return False
+
+    async def _sweep(self) -> None:
+        partial = await r.hmget(STATS_PARTIAL_KEY, "cursor", "started_at")
+        cursor = int(partial[0] or 0)
+        started = float(partial[1] or time.time())
+        if partial[0] is None:
+            await r.hset(STATS_PARTIAL_KEY, mapping={"cursor": 0, "started_at": started})
+        while True:
+            cursor, keys = await r.scan(cursor, match="cart:*", count=SWEEP_BATCH)
+            await self._tally(keys, cursor)
+            if cursor == 0:
+                break
+            if not await self._hold_lock():
+                return
+            await asyncio.sleep(SWEEP_PAUSE)
+        now = time.time()
+        async with r.pipeline(transaction=True) as pipe:
+            pipe.hset(STATS_PARTIAL_KEY, mapping={"finished_at": now, "duration": round(now - started, 3)})
+            pipe.hdel(STATS_PARTIAL_KEY, "cursor")
+            pipe.rename(STATS_PARTIAL_KEY, STATS_KEY)
+            await pipe.execute()
+        logger.info(f"cart sweep finished in {now - started:.1f}s")
+
+    async def _tally(self, keys: list[str], cursor: int) -> None:
+        counts: dict[str, float] = {}
+
+        def bump(field: str, by: float = 1) -> None:
+            counts[field] = counts.get(field, 0) + by
+
+        if keys:
+            async with r.pipeline(transaction=False) as pipe:
+                for key in keys:
+                    pipe.hgetall(key)
+                replies = await pipe.execute(raise_on_error=False)
+            now = time.time()
+            for reply in replies:
+                if isinstance(reply, Exception):
+                    bump("legacy_carts")  # pre-hash JSON string, converted on next touch
+                    continue
+                if not reply:
+                    continue  # expired between SCAN and HGETALL
+                qty = [_item_qty(v) for f, v in reply.items() if not f.startswith("_")]
+                if not qty:
+                    bump("empty_carts")
+                    continue
+                value = float(reply.get("_total", 0))
+                age = now - int(reply.get("_mtime", now))
+                bump("carts")
+                bump("lines", len(qty))
+                bump("items", sum(qty))
+                bump("value", value)
+                bump(f"age:{_age_bucket(age)}")
+                if age >= ABANDONED_AFTER:
+                    bump("abandoned_carts")
+                    bump("abandoned_value", value)
+        async with r.pipeline(transaction=True) as pipe:
+            for field, by in counts.items():
+                if field.endswith("value"):
+                    pipe.hincrbyfloat(STATS_PARTIAL_KEY, field, by)
+                else:
+                    pipe.hincrby(STATS_PARTIAL_KEY, field, by)
+            pipe.hset(STATS_PARTIAL_KEY, "cursor", cursor)
+            pipe.hincrby(STATS_PARTIAL_KEY, "scanned", len(keys))
+            await pipe.execute()
+
+
+sweeper = _CartSweeper()
 
 
 # ---------- models ----------
 
 class AddItem(BaseModel):
     id: str
-    name: str
-    price: float
-    qty: int = 1
+    name: Optional[str] = None  # resolved from the catalog; only used for products it doesn't know
+    price: Optional[float] = None
+    qty: int = Field(1, ge=1)
     size: str = ""
 
 
 class RemoveItem(BaseModel):
     id: str
+    size: Optional[str] = None  # None = every size of this product
 
 
 class UpdateQty(BaseModel):
     id: str
     qty: int
+    size: Optional[str] = None  # None = first cart line of this product
+
+
+class BatchAdd(AddItem):
+    op: Literal["add"]
+
+
+class BatchRemove(RemoveItem):
+    op: Literal["remove"]
+
+
+class BatchUpdate(UpdateQty):
+    op: Literal["update"]
+
+
+class CartBatch(BaseModel):
+    ops: list[Annotated[Union[BatchAdd, BatchRemove, BatchUpdate], Field(discriminator="op")]] = Field(
+        min_length=1, max_length=50
+    )
+
+
+async def _resolve_adds(items: list[AddItem]) -> None:
+    """Fill name/price from the catalog in place. The catalog wins over client-supplied values;
+    those are only used when the product cannot be found. 404 if neither is available."""
+    products = await catalog.get_many([item.id for item in items])
+    for item in items:
+        product = products.get(item.id)
+        if product:
+            item.name, item.price = product["name"], product["price"]
+        elif item.name is None or item.price is None:
+            raise HTTPException(status_code=404, detail=f"Unknown product {item.id}")
 
 
 # ---------- routes ----------
 
 @app.get("/health")
-def health():
+async def health():
     try:
-        r.ping()
-        return {"status": "ok", "redis": "connected"}
+        await r.ping()
+        return {"status": "ok", "redis": "connected", "pool": pool.stats(), "catalog": catalog.stats()}
     except Exception as e:
         raise HTTPException(status_code=503, detail=f"Redis unavailable: {e}")
 
 
+def _stats_numbers(raw: dict) -> dict:
+    return {f: round(float(v), 2) if "." in v else int(v) for f, v in raw.items()}
+
+
+@app.get("/stats/carts")
+async def cart_stats():
+    """Rollup from the last completed sweep, plus how far the current one has got.
+
+    "carts" are non-empty carts; "age" buckets them by time since their last change
+    (1h, 1d, 3d, 7d = under 1 hour, 1 day, 3 days, the rest); "abandoned_*" are carts
+    idle for ABANDONED_AFTER seconds or more.
+    """
+    last, partial = await asyncio.gather(r.hgetall(STATS_KEY), r.hgetall(STATS_PARTIAL_KEY))
+    stats = _stats_numbers(last)
+    stats["age"] = {name: stats.pop(f"age:{name}", 0) for name, _ in AGE_BUCKETS}
+    stats["abandoned_after"] = ABANDONED_AFTER
+    stats["in_progress"] = (
+        {"scanned": int(partial.get("scanned", 0)), "started_at": float(partial["started_at"])}
+        if "cursor" in partial else None
+    )
+    return stats
+
+
+class _UploadTooLarge(Exception):
+    pass
+
+
+class _ImageUpload:
+    """The "file" part of a multipart/form-data body, hashed and written to a temp file in one pass.
+
+    feed() and finish() are meant for the threadpool: they run the bytes given through
+    the multipart parser, whose file-part data goes straight to SHA-256 and disk.
+    Raises _UploadTooLarge as soon as the file passes UPLOAD_MAX_BYTES.
+    """
+
+    def __init__(self, boundary: bytes):
+        self.tmp = os.path.join(UPLOADS_DIR, f"{uuid.uuid4().hex}.part")
+        self.filename: Optional[str] = None  # set once the file part's headers are in
+        self.size = 0
+        self._digest = hashlib.sha256()
+        self._out: Optional[BinaryIO] = None
+        self._in_file = False
+        self._field = b""
+        self._value = b""
+        self._disposition = b""
+        self._parser = MultipartParser(boundary, {
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+        })
+
+    @property
+    def digest(self) -> str:
+        return self._digest.hexdigest()
+
+    def _on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._value += data[start:end]
+
+    def _on_header_end(self) -> None:
+        if self._field.lower() == b"content-disposition":
+            self._disposition = self._value
+        self._field, self._value = b"", b""
+
+    def _on_headers_finished(self) -> None:
+        _, options = parse_options_header(self._disposition)
+        self._disposition = b""
+        if options.get(b"name") == b"file" and self._out is None:
+            self.filename = options.get(b"filename", b"").decode("utf-8", "replace")
+            self._out = open(self.tmp, "wb")
+            self._in_file = True
+
+    def _on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if not self._in_file:
+            return
+        self.size += end - start
+        if self.size > UPLOAD_MAX_BYTES:
+            raise _UploadTooLarge()
+        chunk = data[start:end]
+        self._digest.update(chunk)
+        self._out.write(chunk)
+
+    def _on_part_end(self) -> None:
+        self._in_file = False
+
+    def feed(self, data: bytes) -> None:
+        self._parser.write(data)
+
+    def finish(self, data: bytes) -> None:
+        self._parser.write(data)
+        self._parser.finalize()
+        if self._out is not None:
+            self._out.close()
+
+    def discard(self) -> None:
+        if self._out is not None:
+            self._out.close()
+            if os.path.exists(self.tmp):
+                os.remove(self.tmp)
+
+    def image_ext(self) -> Optional[str]:
+        """Extension for the format Pillow finds in the file, or None unless it is one of UPLOAD_FORMATS."""
+        try:
+            with Image.open(self.tmp) as img:
+                fmt = img.format
+                img.verify()
+        except Exception:  # not an image, truncated, or a decompression bomb
+            return None
+        return UPLOAD_FORMATS.get(fmt)
+
+    def store(self, dest: str) -> bool:
+        """Move the file to dest, or drop it if dest already holds the same upload; returns whether it did."""
+        if os.path.exists(dest):
+            self.discard()
+            return True
+        os.replace(self.tmp, dest)
+        return False
+
+
 @app.post("/upload/image")
-async def upload_image(file: UploadFile = File(...)):
-    ext = os.path.splitext(file.filename or "")[1].lower() or ".webp"
-    filename = f"{uuid.uuid4().hex}{ext}"
+async def upload_image(request: Request):
+    """Store the multipart "file" field under its SHA-256 name; WebP and thumbnail variants follow in the background.
+
+    The body is parsed as it arrives: the file is hashed and written in one pass,
+    and the upload is refused with 413 as soon as it passes UPLOAD_MAX_BYTES
+    (or up front, when Content-Length already says so). Files Pillow does not read as
+    one of UPLOAD_FORMATS are refused with 400; the stored extension follows the format.
+    """
+    content_type, options = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or not options.get(b"boundary"):
+        raise HTTPException(status_code=415, detail="Send multipart/form-data with a file field")
+    too_large = HTTPException(status_code=413, detail=f"Image exceeds {UPLOAD_MAX_BYTES} bytes")
+    body_limit = UPLOAD_MAX_BYTES + UPLOAD_FORM_OVERHEAD
+    length = request.headers.get("content-length", "")
+    if length.isdigit() and int(length) > body_limit:
+        raise too_large
+
+    upload = _ImageUpload(options[b"boundary"])
+    try:
+        received = 0
+        buffer = bytearray()
+        async for chunk in request.stream():
+            received += len(chunk)
+            if received > body_limit:
+                raise _UploadTooLarge()
+            buffer += chunk
+            if len(buffer) >= UPLOAD_CHUNK:
+                await run_in_threadpool(upload.feed, bytes(buffer))
+                buffer.clear()
+        await run_in_threadpool(upload.finish, bytes(buffer))
+    except _UploadTooLarge:
+        await run_in_threadpool(upload.discard)
+        raise too_large
+    except ValueError:  # python-multipart's parse errors
+        await run_in_threadpool(upload.discard)
+        raise HTTPException(status_code=400, detail="Malformed multipart body")
+    except BaseException:
+        await run_in_threadpool(upload.discard)
+        raise
+    if upload.filename is None:
+        raise HTTPException(status_code=400, detail="No file field in the form")
+
+    ext = await run_in_threadpool(upload.image_ext)
+    if ext is None:
+        await run_in_threadpool(upload.discard)
+        raise HTTPException(status_code=400, detail=f"Upload a {', '.join(UPLOAD_FORMATS)} image")
+    digest = upload.digest
+    filename = f"{digest}{ext}"
     dest = os.path.join(UPLOADS_DIR, filename)
-    content = await file.read()
-    with open(dest, "wb") as f:
-        f.write(content)
-    return {"url": f"{PUBLIC_BASE}/uploads/{filename}"}
+    duplicate = await run_in_threadpool(upload.store, dest)
+    if not duplicate:
+        variants.submit(dest)
+    return {
+        "url": f"{PUBLIC_BASE}/uploads/{filename}",
+        "webp_url": f"{PUBLIC_BASE}/uploads/{digest}.webp",
+        "thumb_url": f"{PUBLIC_BASE}/uploads/{digest}{THUMB_SUFFIX}",
+        "duplicate": duplicate,
+    }
 
 
 @app.get("/cart/{visitor_id}")
-def get_cart(visitor_id: str):
-    items = _load_items(visitor_id)
-    return {"items": items, "total": _calc_total(items)}
+async def get_cart(visitor_id: str, request: Request, since_version: Optional[int] = None):
+    """Full cart with ETag/Last-Modified (304 on If-None-Match), or only the changes after since_version.
+
+    With since_version the reply is {"version", "since_version", "changes", "total"}; when the
+    change log no longer reaches back that far the full cart is returned with "full": true.
+    """
+    keys = _cart_keys(visitor_id)
+    if since_version is not None:
+        reply = await _changes_script(keys=keys, args=[since_version])
+        if reply[0] == "delta":
+            changes = [change for raw in reply[4:] for change in json.loads(raw)["changes"]]
+            return JSONResponse(
+                {"version": int(reply[1]), "since_version": since_version, "changes": changes, "total": round(float(reply[3]), 2)},
+                headers=_cache_headers(reply[1], reply[2]),
+            )
+        cart = {**_cart_response(reply[1:]), "full": True}
+        return JSONResponse(cart, headers=_cache_headers(reply[2], reply[3]))
+
+    reply = await _get_script(keys=keys, args=_etag_versions(request.headers.get("if-none-match")))
+    if reply[0] == "":
+        return Response(status_code=304, headers=_cache_headers(reply[1], reply[2]))
+    return JSONResponse(_cart_response(reply), headers=_cache_headers(reply[1], reply[2]))
 
 
 @app.post("/cart/{visitor_id}/add")
-def add_to_cart(visitor_id: str, item: AddItem):
-    items = _load_items(visitor_id)
-    for existing in items:
-        if existing["id"] == item.id:
-            existing["qty"] = existing["qty"] + item.qty  # accumulate
-            existing["size"] = item.size
-            _save_items(visitor_id, items)
-            return {"items": items, "total": _calc_total(items)}
-    items.append({"id": item.id, "name": item.name, "price": item.price, "qty": item.qty, "size": item.size})
-    _save_items(visitor_id, items)
-    return {"items": items, "total": _calc_total(items)}
+async def add_to_cart(visitor_id: str, item: AddItem):
+    """Add qty of a product; name and price come from the catalog, so {id, qty, size} is enough."""
+    await _resolve_adds([item])
+    reply = await _add_script(
+        keys=_cart_keys(visitor_id),
+        args=[item.id, item.name, item.price, item.qty, item.size, CART_TTL],
+    )
+    return _cart_response(reply)
 
 
 @app.post("/cart/{visitor_id}/remove")
-def remove_from_cart(visitor_id: str, body: RemoveItem):
-    items = _load_items(visitor_id)
-    items = [i for i in items if i["id"] != body.id]
-    _save_items(visitor_id, items)
-    return {"items": items, "total": _calc_total(items)}
+async def remove_from_cart(visitor_id: str, body: RemoveItem):
+    reply = await _remove_script(
+        keys=_cart_keys(visitor_id),
+        args=[body.id, body.size or "", int(body.size is not None), CART_TTL],
+    )
+    return _cart_response(reply)
 
 
 @app.post("/cart/{visitor_id}/update")
-def update_qty(visitor_id: str, body: UpdateQty):
-    items = _load_items(visitor_id)
-    for item in items:
-        if item["id"] == body.id:
-            if body.qty <= 0:
-                items = [i for i in items if i["id"] != body.id]
-            else:
-                item["qty"] = body.qty
-            break
-    _save_items(visitor_id, items)
-    return {"items": items, "total": _calc_total(items)}
+async def update_qty(visitor_id: str, body: UpdateQty):
+    reply = await _update_script(
+        keys=_cart_keys(visitor_id),
+        args=[body.id, body.qty, body.size or "", int(body.size is not None), CART_TTL],
+    )
+    return _cart_response(reply)
+
+
+@app.post("/cart/{visitor_id}/batch")
+async def batch_update(visitor_id: str, body: CartBatch):
+    """Apply an ordered list of add/update/remove ops atomically and return the final cart."""
+    await _resolve_adds([op for op in body.ops if op.op == "add"])
+    ops = [op.model_dump(exclude_none=True) for op in body.ops]
+    reply = await _batch_script(keys=_cart_keys(visitor_id), args=[json.dumps(ops), CART_TTL])
+    return _cart_response(reply)
 
 
 @app.delete("/cart/{visitor_id}")
-def clear_cart(visitor_id: str):
-    r.delete(_cart_key(visitor_id))
-    return {"items": [], "total": 0.0}
+async def clear_cart(visitor_id: str):
+    return _cart_response(await _clear_script(keys=_cart_keys(visitor_id), args=[CART_TTL]))
+
+
+def _sse(event: str, data: str) -> str:
+    return f"event: {event}\ndata: {data}\n\n"
+
+
+@app.get("/cart/{visitor_id}/stream")
+async def cart_stream(visitor_id: str, request: Request):
+    """Server-sent events: one "snapshot" with the full cart, then a "delta" per mutation.
+
+    A delta is {"version", "prev", "changes": [...], "total"} where each change is
+    {"type": "set", "item": {...}}, {"type": "del", "id": ..., "size": ...} or {"type": "clear"}.
+    A new snapshot is sent if this listener falls too far behind.
+    """
+
+    async def stream():
+        # registered here, not before returning, so a body that never starts leaves nothing behind
+        queue = events.listen(visitor_id)
+        try:
+            resync = True
+            while True:
+                if resync:
+                    cart = _cart_response(await _get_script(keys=_cart_keys(visitor_id)))
+                    yield _sse("snapshot", json.dumps(cart))
+                    resync = False
+                try:
+                    data = await asyncio.wait_for(queue.get(), timeout=STREAM_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": keepalive\n\n"
+                    continue
+                if data is None:
+                    resync = True
+                else:
+                    yield _sse("delta", data)
+        finally:
+            events.unlisten(visitor_id, queue)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 # ---------- Twilio TwiML webhook ----------
@@ -0,0 +1,84 @@
+"""
+Redis memory report for cart keys: packed encoding vs JSON.
+
+Samples cart:* hashes with SCAN and measures each with MEMORY USAGE. For every
+sampled cart it also writes the same items to a scratch key twice, once as a
+JSON-valued hash and once as the legacy JSON-list string, measures both and
+deletes them. It prints bytes per key for each layout and the saving.
+
+Usage:
+    python memory_report.py                      # REDIS_HOST / REDIS_PORT from env
+    python memory_report.py --sample 2000
+"""
+
+import argparse
+import json
+import os
+import uuid
+
+import redis
+from dotenv import load_dotenv
+
+load_dotenv()
+
+FORMAT_PACKED = b"\x01"
+SEP = b"\x1f"
+
+
+def decode_item(raw: bytes) -> dict:
+    """Python mirror of the Lua decode_item in main.py."""
+    if not raw.startswith(FORMAT_PACKED):
+        return json.loads(raw)
+    item_id, name, price, qty, size, seq = raw[1:].decode().split(SEP.decode())
+    return {"id": item_id, "name": name, "price": float(price), "qty": int(qty), "size": size, "seq": int(seq)}
+
+
+def measure(r: redis.Redis, key: bytes) -> tuple[int, int, int] | None:
+    """(packed-as-stored, json hash, legacy json string) bytes for one cart, or None if not a cart hash."""
+    if r.type(key) != b"hash":
+        return None
+    stored = r.memory_usage(key, samples=0) or 0
+    fields = r.hgetall(key)
+    items = {f: decode_item(v) for f, v in fields.items() if not f.startswith(b"_")}
+    meta = {f: v for f, v in fields.items() if f.startswith(b"_")}
+
+    scratch = f"memory-report:{uuid.uuid4().hex}"
+    try:
+        r.hset(scratch, mapping={**meta, **{f: json.dumps(it) for f, it in items.items()}})
+        as_json = r.memory_usage(scratch, samples=0) or 0
+        r.delete(scratch)
+        legacy = [{k: it[k] for k in ("id", "name", "price", "qty", "size")} for it in sorted(items.values(), key=lambda it: it["seq"])]
+        r.set(scratch, json.dumps(legacy))
+        as_legacy = r.memory_usage(scratch, samples=0) or 0
+    finally:
+        r.delete(scratch)
+    return stored, as_json, as_legacy
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Cart key memory usage report")
+    parser.add_argument("--sample", type=int, default=1000, help="Max cart keys to measure")
+    args = parser.parse_args()
+
+    r = redis.Redis(host=os.getenv("REDIS_HOST", "127.0.0.1"), port=int(os.getenv("REDIS_PORT", "6379")))
+    rows = []
+    for key in r.scan_iter(match="cart:*", count=500):
+        row = measure(r, key)
+        if row:
+            rows.append(row)
+        if len(rows) >= args.sample:
+            break
+    if not rows:
+        print("No cart hashes found.")
+        return
+
+    n = len(rows)
+    stored, as_json, as_legacy = (sum(col) / n for col in zip(*rows))
+    print(f"Sampled {n} carts (bytes per key, MEMORY USAGE):")
+    print(f"  as stored (packed items): {stored:8.0f}")
+    print(f"  JSON item values:         {as_json:8.0f}   saved {as_json - stored:6.0f} ({(as_json - stored) / as_json:.0%})")
+    print(f"  legacy JSON string:       {as_legacy:8.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -12,7 +12,7 @@ const MAX_CALL_MS = 3 * 60_000;
 interface ShopPixelWidgetProps {
   onRecommend: (ids: string[]) => void;
   onExpand: (id: string | null) => void;
-  onCartAction: (action: { action: 'add' | 'remove'; id: string; qty?: number }) => void;
+  onCartAction: (action: { action: 'add' | 'remove' | 'update'; id: string; qty?: number; size?: string }) => void;
   onRoomReady: (room: any) => void;
   onCartOpen: (open: boolean) => void;
   lastRecommended: Product | null;
@@ -121,7 +121,10 @@ export default function ShopPixelWidget({ onRecommend, onExpand, onCartAction, o
         if ('cart_action' in attrs && attrs['cart_action']) {
           try {
             const parsed = JSON.parse(attrs['cart_action']);
-            if (parsed.action && parsed.id) onCartActionRef.current(parsed);
+            if (parsed.action === 'batch' && Array.isArray(parsed.ops)) {
+              parsed.ops.forEach((op: { op: 'add' | 'remove' | 'update'; id: string; qty?: number; size?: string }) =>
+                onCartActionRef.current({ action: op.op, id: op.id, qty: op.qty, size: op.size }));
+            } else if (parsed.action && parsed.id) onCartActionRef.current(parsed);
           } catch { /* ignore malformed */ }
         }
 
@@ -0,0 +1,175 @@
+"""
+Latency benchmark for the hotel-api hot paths.
+
+Hits a running hotel-api with a fixed mix of the requests a phone call makes —
+availability for all rooms and for one room, find-by-phone, and a booking that
+conflicts (exercises the conflict check without writing) — and prints p50/p95/p99
+per endpoint. Save a run and compare a later one against it:
+
+    docker run -d --name hotel-pg -e POSTGRES_PASSWORD=pg -p 5432:5432 postgres:16
+    uvicorn main:app --port 8001        # DB_HOST=127.0.0.1 DB_USER=postgres DB_PASSWORD=pg ...
+    python bench_hotel_api.py --url http://localhost:8001 --save before.json
+    # ...deploy the change...
+    python bench_hotel_api.py --url http://localhost:8001 --compare before.json
+
+--dsn skips HTTP and times the prepared hot queries from main.py directly on
+one connection, unprepared vs prepared, to isolate parse/plan cost:
+
+    python bench_hotel_api.py --dsn "host=127.0.0.1 user=postgres password=pg dbname=hotel_demo"
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+
+import httpx
+
+BENCH_PHONE = "+000000bench"
+BENCH_GUEST = "Bench Guest"
+
+
+def percentile(values: list[float], pct: float) -> float:
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100, method="inclusive")[int(pct) - 1]
+
+
+async def seed(client: httpx.AsyncClient) -> tuple[dict, str]:
+    """Make sure one far-future booking exists for the bench phone; return it and a room number."""
+    rooms = (await client.get("/rooms")).raise_for_status().json()
+    room = rooms[0]["number"]
+    check_in = date.today() + timedelta(days=3650)
+    booking = {
+        "room_number": room,
+        "guest_name": BENCH_GUEST,
+        "check_in": check_in.isoformat(),
+        "check_out": (check_in + timedelta(days=2)).isoformat(),
+        "phone": BENCH_PHONE,
+    }
+    res = await client.post("/bookings", json=booking)
+    if res.status_code not in (200, 409):
+        res.raise_for_status()
+    return booking, room
+
+
+def plan(booking: dict, room: str) -> dict[str, tuple[str, str, dict]]:
+    """endpoint -> (method, path, params-or-json)."""
+    dates = {"check_in": booking["check_in"], "check_out": booking["check_out"]}
+    return {
+        "availability": ("GET", "/availability", dates),
+        "availability_room": ("GET", "/availability", {**dates, "room_number": room}),
+        "find_by_phone": ("GET", "/bookings/find-by-phone", {"phone": BENCH_PHONE, "guest_name": "bench"}),
+        "booking_conflict": ("POST", "/bookings", {**booking, "guest_name": "Conflict"}),
+    }
+
+
+async def run(client: httpx.AsyncClient, requests: int, concurrency: int) -> dict:
+    booking, room = await seed(client)
+    calls = plan(booking, room)
+    names = list(calls)
+    latencies: dict[str, list[float]] = defaultdict(list)
+    errors: dict[str, int] = defaultdict(int)
+    cursor = iter(range(requests))
+
+    async def worker():
+        for n in cursor:
+            name = names[n % len(names)]
+            method, path, data = calls[name]
+            start = time.perf_counter()
+            if method == "GET":
+                res = await client.get(path, params=data)
+            else:
+                res = await client.post(path, json=data)
+            latencies[name].append(time.perf_counter() - start)
+            if res.status_code not in (200, 409):
+                errors[name] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        "elapsed": elapsed,
+        "rps": requests / elapsed,
+        "endpoints": {
+            name: {
+                "n": len(lat),
+                "p50": percentile(lat, 50) * 1000,
+                "p95": percentile(lat, 95) * 1000,
+                "p99": percentile(lat, 99) * 1000,
+                "errors": errors.get(name, 0),
+            }
+            for name, lat in latencies.items()
+        },
+    }
+
+
+def print_report(result: dict, baseline: dict | None) -> None:
+    print(f"\n{sum(e['n'] for e in result['endpoints'].values())} requests, {result['rps']:.0f} req/s")
+    header = f"{'endpoint':<20}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}"
+    print(header + (f"{'p50 before':>12}{'change':>9}" if baseline else ""))
+    for name, e in sorted(result["endpoints"].items()):
+        line = f"{name:<20}{e['p50']:>10.2f}{e['p95']:>10.2f}{e['p99']:>10.2f}{e['errors']:>8}"
+        before = (baseline or {}).get("endpoints", {}).get(name)
+        if before:
+            line += f"{before['p50']:>12.2f}{(e['p50'] - before['p50']) / before['p50']:>+9.0%}"
+        print(line)
+
+
+async def run_queries(dsn: str, repeat: int) -> None:
+    from psycopg import AsyncConnection
+    from psycopg.rows import dict_row
+
+    import main
+
+    check_in = date.today() + timedelta(days=3650)
+    dates = {"check_in": check_in, "check_out": check_in + timedelta(days=2)}
+    queries = {
+        "availability": (main.AVAILABILITY_SQL, {**dates, "room_number": None}),
+        "find_by_phone": (main.FIND_BY_PHONE_SQL, {"phone": BENCH_PHONE, "name_pattern": main.name_pattern("bench")}),
+    }
+    print(f"\n{'query':<20}{'plain p50 us':>14}{'prepared p50 us':>17}{'change':>9}")
+    async with await AsyncConnection.connect(dsn, autocommit=True, row_factory=dict_row) as conn:
+        for name, (sql, params) in queries.items():
+            p50 = {}
+            for prepare in (False, True):
+                lat = []
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    cur = await conn.execute(sql, params, prepare=prepare)
+                    await cur.fetchall()
+                    lat.append(time.perf_counter() - start)
+                p50[prepare] = percentile(lat, 50) * 1e6
+            print(f"{name:<20}{p50[False]:>14.0f}{p50[True]:>17.0f}{(p50[True] - p50[False]) / p50[False]:>+9.0%}")
+
+
+async def main_async(args) -> None:
+    if args.dsn:
+        await run_queries(args.dsn, args.requests)
+        return
+    async with httpx.AsyncClient(base_url=args.url, timeout=10) as client:
+        await run(client, min(args.requests, 200), args.concurrency)  # warm-up
+        result = await run(client, args.requests, args.concurrency)
+    baseline = json.load(open(args.compare)) if args.compare else None
+    print_report(result, baseline)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="hotel-api latency benchmark")
+    parser.add_argument("--url", default="http://localhost:8001")
+    parser.add_argument("--requests", type=int, default=4000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--save", help="Write the result as JSON")
+    parser.add_argument("--compare", help="JSON from an earlier --save to compare p50 against")
+    parser.add_argument("--dsn", help="Time the hot queries directly on this Postgres instead of over HTTP")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Query plan regression check for the hotel-api booking lookups.
+
+Inside one transaction that is rolled back at the end, adds AUDIT_ROOMS scratch
+rooms and seeds --bookings bookings (100k by default) over them, back to back and
+centred on today, ANALYZEs, then runs
+EXPLAIN ANALYZE on the lookups below and fails if any of them reads bookings
+with a sequential scan:
+
+    find-by-phone / cancel-by-phone   main.FIND_BY_PHONE_SQL
+    reschedule                        main.RESCHEDULE_SQL
+    guest name substring              lower(guest_name) LIKE '%...%' on its own
+
+Nothing is left behind in the database. Uses the same DB_* settings as main.py.
+
+Usage:
+    python explain_audit.py                    # exit status 1 on a seq scan
+    python explain_audit.py --bookings 200000 --verbose
+"""
+
+import argparse
+import asyncio
+import sys
+from datetime import date, timedelta
+
+from psycopg import AsyncConnection
+from psycopg.rows import dict_row
+
+import main
+
+AUDIT_ROOMS = 50
+
+SEED_SQL = """
+    WITH audit_rooms AS (
+        INSERT INTO rooms (number, type, description, details, price_per_night)
+        SELECT 'audit-' || k, 'Audit', '', '', 0 FROM generate_series(1, %(rooms)s) AS k
+        RETURNING id
+    ), r AS (
+        SELECT id, row_number() OVER (ORDER BY id) - 1 AS k FROM audit_rooms
+    )
+    INSERT INTO bookings (room_id, guest_name, check_in, check_out, phone, email)
+    SELECT r.id,
+           'Audit ' || substr(md5((n * %(rooms)s + r.k)::text), 1, 12),
+           CURRENT_DATE + (n - %(per_room)s / 2) * 3,
+           CURRENT_DATE + (n - %(per_room)s / 2) * 3 + 2,
+           '+3538' || lpad(((n * %(rooms)s + r.k) * 7919 %% 10000000)::text, 7, '0'),
+           ''
+    FROM r, generate_series(0, %(per_room)s - 1) AS n
+"""
+
+
+def seq_scans(plan: dict) -> list[str]:
+    """Relations read by a Seq Scan anywhere in an EXPLAIN (FORMAT JSON) plan tree."""
+    found = [plan.get("Relation Name", "?")] if plan["Node Type"] == "Seq Scan" else []
+    for child in plan.get("Plans", []):
+        found += seq_scans(child)
+    return found
+
+
+def index_names(plan: dict) -> list[str]:
+    found = [plan["Index Name"]] if "Index Name" in plan else []
+    for child in plan.get("Plans", []):
+        found += index_names(child)
+    return found
+
+
+async def audit(bookings: int, verbose: bool) -> int:
+    failures = 0
+    async with await AsyncConnection.connect(main.DB_CONNINFO, row_factory=dict_row) as conn:
+        try:
+            rooms = AUDIT_ROOMS
+            per_room = -(-bookings // rooms)
+            await conn.execute(SEED_SQL, {"rooms": rooms, "per_room": per_room})
+            await conn.execute("ANALYZE bookings")
+
+            # A seeded upcoming booking to look for: the first one on or after today.
+            sample = await (await conn.execute(
+                "SELECT phone, guest_name FROM bookings WHERE guest_name LIKE 'Audit %' AND check_in >= CURRENT_DATE "
+                "ORDER BY check_in LIMIT 1"
+            )).fetchone()
+            name_part = sample["guest_name"].split()[1][2:8]
+            far = date.today() + timedelta(days=per_room * 2 + 10)  # past every seeded stay
+            checks = {
+                "find_by_phone": (main.FIND_BY_PHONE_SQL, {"phone": sample["phone"], "name_pattern": main.name_pattern(name_part)}),
+                "reschedule": (main.RESCHEDULE_SQL, {"phone": sample["phone"], "check_in": far, "check_out": far + timedelta(days=2)}),
+                "name_substring": (
+                    "SELECT id FROM bookings WHERE lower(guest_name) LIKE %(name_pattern)s",
+                    {"name_pattern": main.name_pattern(name_part)},
+                ),
+            }
+            print(f"Seeded {per_room * rooms} bookings over {rooms} rooms.\n")
+            for name, (sql, params) in checks.items():
+                row = await (await conn.execute(f"EXPLAIN (ANALYZE, FORMAT JSON) {sql}", params)).fetchone()
+                result = row["QUERY PLAN"][0]
+                scans = [rel for rel in seq_scans(result["Plan"]) if rel == "bookings"]
+                status = "FAIL seq scan on bookings" if scans else "ok"
+                failures += bool(scans)
+                indexes = ", ".join(dict.fromkeys(index_names(result["Plan"]))) or "-"
+                print(f"{name:<16}{result['Execution Time']:>9.3f} ms  {status:<26} indexes: {indexes}")
+                if verbose:
+                    plan = await (await conn.execute(f"EXPLAIN ANALYZE {sql}", params)).fetchall()
+                    print("\n".join("    " + r["QUERY PLAN"] for r in plan) + "\n")
+        finally:
+            await conn.rollback()
+    return 1 if failures else 0
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(description="EXPLAIN ANALYZE regression check for booking lookups")
+    parser.add_argument("--bookings", type=int, default=100_000, help="Bookings to seed (rolled back afterwards)")
+    parser.add_argument("--verbose", action="store_true", help="Print the full text plans")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(audit(args.bookings, args.verbose)))
+
+
+if __name__ == "__main__":
+    main_cli()
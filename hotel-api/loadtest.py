@@ -0,0 +1,222 @@
+"""
+hotel-api load generator.
+
+Drives the traffic a busy front desk plus the voice agent produce — availability
+checks, flexible-date searches, phone lookups, new bookings, reschedules and
+cancellations — from --concurrency workers, and reports req/s, p50/p95/p99 and
+the share of 409 conflicts per endpoint. Seed a realistic database first with
+seed_data.py so conflicts happen at a realistic rate, then keep the --save output
+of a run to --compare the next one against after a schema or index change:
+
+    python seed_data.py --init --reset --rooms 200 --bookings 200000
+    python loadtest.py --save before.json
+    # ...apply the migration...
+    python loadtest.py --compare before.json
+
+New bookings land in the next --window days and use "+load..." phone numbers;
+whatever is still booked at the end is cancelled again.
+
+Targets:
+    default        in-process app on the DB_* database (same settings as main.py)
+    --url URL      a running hotel-api over HTTP
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+from collections import defaultdict
+from contextlib import AsyncExitStack
+from datetime import date, timedelta
+
+import httpx
+
+WORKLOAD = {"availability": 35, "search": 10, "find": 10, "book": 25, "reschedule": 10, "cancel": 10}
+NIGHTS = ([1, 2, 3, 4, 5, 7], [15, 30, 25, 15, 8, 7])
+ROOM_TYPES = ["Standard", "Superior", "Deluxe", "Penthouse"]
+
+
+async def open_client(stack: AsyncExitStack, url: str | None) -> httpx.AsyncClient:
+    """HTTP client for a remote hotel-api, or for the in-process app when url is None."""
+    if url:
+        return await stack.enter_async_context(httpx.AsyncClient(base_url=url, timeout=10))
+    import main
+
+    await stack.enter_async_context(main.lifespan(main.app))
+    transport = httpx.ASGITransport(app=main.app)
+    return await stack.enter_async_context(httpx.AsyncClient(transport=transport, base_url="http://hotel-api"))
+
+
+class Traffic:
+    """Builds requests for the mixed workload and tracks the bookings it made, for reschedule/cancel."""
+
+    def __init__(self, rooms: list[str], window: int, seed: int):
+        self.rng = random.Random(seed)
+        self.rooms = rooms
+        self.window = window
+        self.guests: list[dict] = []  # bookings made by this run that are not in flight
+        self.names: dict[str, str] = {}  # phone -> guest name
+        self.serial = 0
+
+    def stay(self) -> tuple[date, date]:
+        check_in = date.today() + timedelta(days=self.rng.randint(1, self.window))
+        return check_in, check_in + timedelta(days=self.rng.choices(*NIGHTS)[0])
+
+    def next(self) -> tuple[str, str, str, dict, dict | None]:
+        """(endpoint, method, path, params, json) for the next request; consumes a guest for reschedule/cancel."""
+        endpoint = self.rng.choices(list(WORKLOAD), weights=list(WORKLOAD.values()))[0]
+        if endpoint in ("find", "reschedule", "cancel") and not self.guests:
+            endpoint = "book"
+        check_in, check_out = self.stay()
+        if endpoint == "availability":
+            params = {"check_in": check_in.isoformat(), "check_out": check_out.isoformat()}
+            if self.rng.random() < 0.3:
+                params["room_number"] = self.rng.choice(self.rooms)
+            return endpoint, "GET", "/availability", params, None
+        if endpoint == "search":
+            params = {
+                "room_type": self.rng.choice(ROOM_TYPES),
+                "nights": (check_out - check_in).days,
+                "from": check_in.isoformat(),
+                "to": (check_in + timedelta(days=14)).isoformat(),
+            }
+            return endpoint, "GET", "/availability/search", params, None
+        if endpoint == "book":
+            self.serial += 1
+            body = {
+                "room_number": self.rng.choice(self.rooms),
+                "guest_name": f"Load Guest{self.serial}",
+                "check_in": check_in.isoformat(),
+                "check_out": check_out.isoformat(),
+                "phone": f"+load{self.serial:08d}",
+            }
+            return endpoint, "POST", "/bookings", {}, body
+        guest = self.guests.pop(self.rng.randrange(len(self.guests)))
+        if endpoint == "find":
+            self.guests.append(guest)
+            params = {"phone": guest["phone"], "guest_name": guest["guest_name"].split()[1]}
+            return endpoint, "GET", "/bookings/find-by-phone", params, None
+        if endpoint == "reschedule":
+            body = {"phone": guest["phone"], "new_check_in": check_in.isoformat(), "new_check_out": check_out.isoformat()}
+            return endpoint, "POST", "/bookings/reschedule", {}, body
+        return endpoint, "POST", "/bookings/cancel-by-phone", {}, {"phone": guest["phone"], "guest_name": guest["guest_name"]}
+
+    def done(self, endpoint: str, body: dict | None, status: int) -> None:
+        if endpoint == "book" and status == 200:
+            self.names[body["phone"]] = body["guest_name"]
+            self.guests.append({"phone": body["phone"], "guest_name": body["guest_name"]})
+        elif endpoint == "reschedule" and status in (200, 409):
+            self.guests.append({"phone": body["phone"], "guest_name": self.names[body["phone"]]})
+
+
+async def run_mixed(client: httpx.AsyncClient, traffic: Traffic, requests: int, concurrency: int) -> dict:
+    """Run the mixed workload. Returns {"elapsed", "latencies": {endpoint: [s]}, "statuses": {endpoint: {code: n}}}."""
+    latencies: dict[str, list[float]] = defaultdict(list)
+    statuses: dict[str, dict[int, int]] = defaultdict(lambda: defaultdict(int))
+    cursor = iter(range(requests))
+
+    async def worker():
+        for _ in cursor:
+            endpoint, method, path, params, body = traffic.next()
+            start = time.perf_counter()
+            try:
+                status = (await client.request(method, path, params=params, json=body)).status_code
+            except httpx.HTTPError:
+                status = 0
+            latencies[endpoint].append(time.perf_counter() - start)
+            statuses[endpoint][status] += 1
+            traffic.done(endpoint, body, status)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return {
+        "elapsed": time.perf_counter() - start,
+        "latencies": dict(latencies),
+        "statuses": {endpoint: dict(codes) for endpoint, codes in statuses.items()},
+    }
+
+
+async def clean_up(client: httpx.AsyncClient, traffic: Traffic) -> int:
+    """Cancel the bookings this run left behind."""
+    guests, traffic.guests = traffic.guests, []
+    for n in range(0, len(guests), 50):
+        await asyncio.gather(*(client.post("/bookings/cancel-by-phone", json=g) for g in guests[n:n + 50]))
+    return len(guests)
+
+
+def percentile(values: list[float], pct: float) -> float:
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100, method="inclusive")[int(pct) - 1]
+
+
+def summarize(result: dict) -> dict:
+    elapsed = result["elapsed"]
+    total = sum(len(v) for v in result["latencies"].values())
+    endpoints = {}
+    for endpoint in WORKLOAD:
+        lat = result["latencies"].get(endpoint, [])
+        if not lat:
+            continue
+        codes = result["statuses"][endpoint]
+        endpoints[endpoint] = {
+            "n": len(lat),
+            "rps": len(lat) / elapsed,
+            "p50": percentile(lat, 50) * 1000,
+            "p95": percentile(lat, 95) * 1000,
+            "p99": percentile(lat, 99) * 1000,
+            "conflict_rate": codes.get(409, 0) / len(lat),
+            "errors": sum(n for code, n in codes.items() if code not in (200, 409)),
+        }
+    return {"elapsed": elapsed, "rps": total / elapsed, "requests": total, "endpoints": endpoints}
+
+
+def print_report(summary: dict, baseline: dict | None) -> None:
+    print(f"\n{summary['requests']} requests in {summary['elapsed']:.2f}s — {summary['rps']:.0f} req/s overall\n")
+    header = f"{'endpoint':<14}{'n':>7}{'req/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'409':>7}{'errors':>8}"
+    print(header + (f"{'p95 before':>12}{'change':>9}" if baseline else ""))
+    for endpoint, e in summary["endpoints"].items():
+        line = (
+            f"{endpoint:<14}{e['n']:>7}{e['rps']:>8.0f}{e['p50']:>9.2f}{e['p95']:>9.2f}{e['p99']:>9.2f}"
+            f"{e['conflict_rate']:>7.1%}{e['errors']:>8}"
+        )
+        before = (baseline or {}).get("endpoints", {}).get(endpoint)
+        if before:
+            line += f"{before['p95']:>12.2f}{(e['p95'] - before['p95']) / before['p95']:>+9.0%}"
+        print(line)
+    if baseline:
+        print(f"\noverall {baseline['rps']:.0f} -> {summary['rps']:.0f} req/s")
+
+
+async def main_async(args) -> int:
+    async with AsyncExitStack() as stack:
+        client = await open_client(stack, args.url)
+        rooms = [room["number"] for room in (await client.get("/rooms")).raise_for_status().json()]
+        traffic = Traffic(rooms, args.window, args.seed)
+        await run_mixed(client, traffic, min(args.requests, 200), args.concurrency)  # warm-up
+        result = await run_mixed(client, traffic, args.requests, args.concurrency)
+        print(f"cancelled {await clean_up(client, traffic)} bookings left by the run")
+    summary = summarize(result)
+    print_report(summary, json.load(open(args.compare)) if args.compare else None)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(summary, f, indent=2)
+    return 1 if any(e["errors"] for e in summary["endpoints"].values()) else 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="hotel-api load generator")
+    parser.add_argument("--url", help="Base URL of a running hotel-api; default runs the app in-process")
+    parser.add_argument("--requests", type=int, default=10000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--window", type=int, default=90, help="New stays start within this many days")
+    parser.add_argument("--save", help="Write the summary as JSON")
+    parser.add_argument("--compare", help="JSON from an earlier --save to compare p95 against")
+    parser.add_argument("--seed", type=int, default=1)
+    raise SystemExit(asyncio.run(main_async(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,68 @@
+import asyncio
+import calendar
+import csv
+import hashlib
+import json
+import logging
 import os
+from collections import OrderedDict
+from contextlib import aclosing, asynccontextmanager
 from datetime import date, timedelta
 from typing import Optional
 
-import psycopg2
-import psycopg2.extras
+import numpy as np
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Path, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from psycopg import AsyncConnection, DataError, sql
+from psycopg.conninfo import make_conninfo
+from psycopg.errors import ExclusionViolation
+from psycopg.rows import dict_row, tuple_row
+from psycopg.types.json import Jsonb
+from psycopg_pool import AsyncConnectionPool, PoolTimeout
 from pydantic import BaseModel
 
 load_dotenv()
 
+logger = logging.getLogger("hotel-api")
+
 DB_HOST = os.getenv("DB_HOST", "n8n-postgres-1")
 DB_PORT = int(os.getenv("DB_PORT", "5432"))
 DB_NAME = os.getenv("DB_NAME", "hotel_demo")
 DB_USER = os.getenv("DB_USER", "n8n")
 DB_PASSWORD = os.getenv("DB_PASSWORD", "")
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "2"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "5"))  # seconds to wait for a free connection
+DB_CONNINFO = make_conninfo(host=DB_HOST, port=DB_PORT, dbname=DB_NAME, user=DB_USER, password=DB_PASSWORD)
+AVAILABILITY_HORIZON_DAYS = int(os.getenv("AVAILABILITY_HORIZON_DAYS", "548"))  # ~18 months from today
+AVAILABILITY_REBUILD_DELAY = float(os.getenv("AVAILABILITY_REBUILD_DELAY", "0.5"))  # seconds of NOTIFYs coalesced into one rebuild
+CALENDAR_CACHE_MONTHS = int(os.getenv("CALENDAR_CACHE_MONTHS", "24"))
+IDEMPOTENCY_TTL_HOURS = int(os.getenv("IDEMPOTENCY_TTL_HOURS", "24"))
+
+pool = AsyncConnectionPool(
+    DB_CONNINFO,
+    min_size=DB_POOL_MIN,
+    max_size=DB_POOL_MAX,
+    timeout=DB_POOL_TIMEOUT,
+    kwargs={"row_factory": dict_row, "autocommit": True},
+    open=False,
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await pool.open()
+    occupancy.start()
+    idempotency.start()
+    yield
+    await idempotency.stop()
+    await occupancy.stop()
+    await pool.close()
+
 
-app = FastAPI(title="Hotel Demo API")
+app = FastAPI(title="Hotel Demo API", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -30,18 +75,587 @@ app.add_middleware(
     ],
     allow_credentials=False,
     allow_methods=["GET", "POST", "DELETE", "OPTIONS"],
-    allow_headers=["Content-Type"],
+    allow_headers=["Content-Type", "If-None-Match", "Idempotency-Key"],
+    expose_headers=["ETag", "Idempotent-Replayed"],
 )
 
 
-def get_conn():
-    return psycopg2.connect(
-        host=DB_HOST,
-        port=DB_PORT,
-        dbname=DB_NAME,
-        user=DB_USER,
-        password=DB_PASSWORD,
+@asynccontextmanager
+async def get_conn():
+    """Borrow a pooled autocommit connection; always returns it. 503 if none frees up within DB_POOL_TIMEOUT."""
+    try:
+        async with pool.connection() as conn:
+            yield conn
+    except PoolTimeout:
+        raise HTTPException(status_code=503, detail="Database busy, try again")
+
+
+@asynccontextmanager
+async def get_cursor(dict_rows: bool = True, write: bool = False):
+    """Cursor on a pooled connection (dict rows unless dict_rows=False).
+
+    Each statement runs in autocommit, saving the BEGIN/COMMIT round trips. With
+    write=True everything in the block is one transaction, rolled back on any exception.
+    """
+    async with get_conn() as conn:
+        async with conn.cursor(row_factory=dict_row if dict_rows else tuple_row) as cur:
+            if write:
+                async with conn.transaction():
+                    yield cur
+            else:
+                yield cur
+
+
+# ---------- hot queries ----------
+# Executed with prepare=True: parsed and planned once per pooled connection,
+# then only bound and executed. Everything else uses psycopg's default of
+# preparing after a query has run a few times on the same connection.
+#
+# Overlapping stays are rejected by the bookings_room_stay_excl constraint
+# (migrations/20261017090000_booking_stay_exclusion.sql), so creating or
+# moving a booking is a single statement; ExclusionViolation becomes 409.
+
+AVAILABILITY_SQL = """
+    SELECT r.number, r.type, r.description, r.details, r.price_per_night,
+           NOT EXISTS (
+               SELECT 1 FROM bookings b
+               WHERE b.room_id = r.id
+                 AND b.stay && daterange(%(check_in)s, %(check_out)s, '[)')
+           ) AS available
+    FROM rooms r
+    WHERE %(room_number)s::text IS NULL OR r.number = %(room_number)s
+    ORDER BY r.number
+"""
+
+# Check-in dates from %(first)s to %(last)s with a matching room free for %(nights)s
+# nights, one row per free room, for the first %(limit)s such dates.
+SEARCH_SQL = """
+    SELECT check_in, number, type, description, details, price_per_night FROM (
+        SELECT d::date AS check_in, r.number, r.type, r.description, r.details, r.price_per_night,
+               dense_rank() OVER (ORDER BY d) AS date_rank
+        FROM generate_series(%(first)s::date, %(last)s::date, interval '1 day') d
+        JOIN rooms r ON %(type_pattern)s::text IS NULL OR r.type ILIKE %(type_pattern)s
+        WHERE NOT EXISTS (
+            SELECT 1 FROM bookings b
+            WHERE b.room_id = r.id AND b.stay && daterange(d::date, d::date + %(nights)s::int, '[)')
+        )
+    ) free
+    WHERE date_rank <= %(limit)s
+    ORDER BY check_in, number
+"""
+
+CREATE_BOOKING_SQL = """
+    WITH room AS (
+        SELECT id, type, price_per_night FROM rooms WHERE number = %(room_number)s
+    ), booking AS (
+        INSERT INTO bookings (room_id, guest_name, check_in, check_out, phone, email)
+        SELECT id, %(guest_name)s, %(check_in)s, %(check_out)s, %(phone)s, %(email)s FROM room
+        RETURNING id, created_at
     )
+    SELECT booking.id, booking.created_at, room.id as room_id, room.type, room.price_per_night FROM booking, room
+"""
+
+RESCHEDULE_SQL = """
+    UPDATE bookings b SET check_in = %(check_in)s, check_out = %(check_out)s
+    FROM rooms r
+    WHERE r.id = b.room_id AND b.id = (
+        SELECT id FROM bookings
+        WHERE phone = %(phone)s AND check_in >= CURRENT_DATE
+        ORDER BY check_in ASC LIMIT 1
+    )
+    RETURNING b.id, b.room_id, b.guest_name, r.number as room_number, r.type, r.price_per_night
+"""
+
+FIND_BY_PHONE_SQL = """
+    SELECT b.id, b.guest_name, b.check_in, b.check_out, b.email,
+           r.number as room_number, r.type
+    FROM bookings b JOIN rooms r ON r.id = b.room_id
+    WHERE b.phone = %(phone)s AND b.check_in >= CURRENT_DATE AND lower(b.guest_name) LIKE %(name_pattern)s
+    ORDER BY b.check_in ASC LIMIT 1
+"""
+# phone + check_in are served by bookings_phone_check_in_idx, the name substring by
+# the trigram index on lower(guest_name) (migrations/20261017110000_booking_lookup_indexes.sql).
+# explain_audit.py checks neither lookup falls back to a sequential scan.
+
+
+def name_pattern(guest_name: str) -> str:
+    """LIKE pattern matching names (guest names, room types) that contain guest_name, case-insensitively."""
+    escaped = guest_name.lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+# ---------- availability cache ----------
+
+class _OccupancyCache:
+    """Per-room occupancy bitmap for /availability: one bool per room per night.
+
+    Rows follow rooms ordered by number; column 0 is `origin` (today when built) and
+    the bitmap covers AVAILABILITY_HORIZON_DAYS nights. A stay [check_in, check_out)
+    sets its columns, so a date range is free when its slice of the row has no True.
+
+    Built from Postgres at startup, patched by the routes that write bookings and by
+    NOTIFYs on "bookings_changed" (migrations/20261017100000_booking_change_notify.sql)
+    for writes from anywhere else. Rebuilt when the day rolls over or the listener
+    reconnects; until then lookups return None and callers fall back to SQL.
+    """
+
+    def __init__(self):
+        self.ready = False
+        self.origin = date.min
+        self.rooms: list[dict] = []
+        self.occupied = np.zeros((0, AVAILABILITY_HORIZON_DAYS), dtype=bool)
+        self._row_of_room: dict[int, int] = {}  # room id -> bitmap row
+        self._row_of_number: dict[str, int] = {}
+        self._stays: dict[int, tuple[int, int, int]] = {}  # booking id -> (row, first column, end column)
+        self._task: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.fallbacks = 0
+        self.notifications = 0
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                async with await AsyncConnection.connect(DB_CONNINFO, autocommit=True) as conn:
+                    # LISTEN before the snapshot so nothing committed in between is missed;
+                    # replaying a change the snapshot already has is harmless.
+                    await conn.execute("LISTEN bookings_changed")
+                    await self._rebuild()
+                    stale = False
+                    while True:
+                        # A rebuild waits one more AVAILABILITY_REBUILD_DELAY round of reading, so a
+                        # burst of RELOAD/ROOMS notifications costs one rebuild, not one each.
+                        # Notifications dropped with the generator on break predate that rebuild.
+                        due = stale
+                        timeout = AVAILABILITY_REBUILD_DELAY if stale else 60
+                        async with aclosing(conn.notifies(timeout=timeout)) as notes:
+                            async for note in notes:
+                                self.notifications += 1
+                                if not self._apply_notification(json.loads(note.payload)) and not stale:
+                                    stale = True
+                                    self.ready = False  # lookups fall back to SQL until the rebuild
+                                    break
+                        if due or date.today() != self.origin:
+                            await self._rebuild()
+                            stale = False
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.ready = False
+                logger.warning(f"availability cache listener failed: {e}")
+                await asyncio.sleep(5)
+
+    async def _rebuild(self) -> None:
+        origin = date.today()
+        async with get_cursor() as cur:
+            await cur.execute("SELECT id, number, type, description, details, price_per_night FROM rooms ORDER BY number")
+            rooms = await cur.fetchall()
+            await cur.execute(
+                "SELECT id, room_id, check_in, check_out FROM bookings WHERE check_out > %s AND check_in < %s",
+                (origin, origin + timedelta(days=AVAILABILITY_HORIZON_DAYS)),
+            )
+            bookings = await cur.fetchall()
+        self.ready = False
+        self.origin = origin
+        self.rooms = [{k: v for k, v in room.items() if k != "id"} for room in rooms]
+        self._row_of_room = {room["id"]: n for n, room in enumerate(rooms)}
+        self._row_of_number = {room["number"]: n for n, room in enumerate(rooms)}
+        self.occupied = np.zeros((len(rooms), AVAILABILITY_HORIZON_DAYS), dtype=bool)
+        self._stays = {}
+        calendars.invalidate()
+        for b in bookings:
+            self.booked(b["id"], b["room_id"], b["check_in"], b["check_out"])
+        self.ready = True
+        logger.info(f"availability cache built: {len(rooms)} rooms, {len(self._stays)} stays from {origin}")
+
+    def _apply_notification(self, note: dict) -> bool:
+        """Apply one bookings_changed payload (one statement's changes); False if it needs a full rebuild."""
+        if note["op"] != "BOOKINGS":  # ROOMS, or RELOAD after a bulk write
+            return False
+        for booking_id in note["deletes"]:
+            self.cancelled(booking_id)
+        for b in note["upserts"]:
+            self.booked(b["id"], b["room_id"], date.fromisoformat(b["check_in"]), date.fromisoformat(b["check_out"]))
+        return True
+
+    def _columns(self, check_in: date, check_out: date) -> tuple[int, int]:
+        return (check_in - self.origin).days, (check_out - self.origin).days
+
+    def booked(self, booking_id: int, room_id: int, check_in: date, check_out: date) -> None:
+        """Record a new or moved booking (idempotent)."""
+        self.cancelled(booking_id)
+        calendars.invalidate()
+        row = self._row_of_room.get(room_id)
+        start, end = self._columns(check_in, check_out)
+        start, end = max(start, 0), min(end, AVAILABILITY_HORIZON_DAYS)
+        if row is None or start >= end:
+            return
+        self.occupied[row, start:end] = True
+        self._stays[booking_id] = (row, start, end)
+
+    def cancelled(self, booking_id: int) -> None:
+        # Stays of one room never overlap (exclusion constraint), so the columns can simply be cleared.
+        calendars.invalidate()
+        stay = self._stays.pop(booking_id, None)
+        if stay:
+            row, start, end = stay
+            self.occupied[row, start:end] = False
+
+    def lookup(self, check_in: date, check_out: date, room_number: Optional[str] = None) -> Optional[list[dict]]:
+        """Same rows as the availability query, or None when the range or state can't be answered from memory."""
+        start, end = self._columns(check_in, check_out)
+        if not self.ready or date.today() != self.origin or start < 0 or end > AVAILABILITY_HORIZON_DAYS:
+            self.fallbacks += 1
+            return None
+        self.hits += 1
+        if room_number is not None:
+            row = self._row_of_number.get(room_number)
+            if row is None:
+                return []
+            return [{**self.rooms[row], "available": not self.occupied[row, start:end].any()}]
+        busy = self.occupied[:, start:end].any(axis=1)
+        return [{**room, "available": not b} for room, b in zip(self.rooms, busy.tolist())]
+
+    def search(self, room_type: Optional[str], nights: int, first: date, last: date, limit: int) -> Optional[list[dict]]:
+        """Earliest check-in dates in [first, last] with a room of room_type free for `nights` nights,
+        as SEARCH_SQL would return them; None when this can't be answered from memory."""
+        start, end = self._columns(first, last)
+        if not self.ready or date.today() != self.origin or start < 0 or end + nights > AVAILABILITY_HORIZON_DAYS:
+            self.fallbacks += 1
+            return None
+        self.hits += 1
+        rows = [n for n, room in enumerate(self.rooms) if not room_type or room_type.lower() in room["type"].lower()]
+        if not rows:
+            return []
+        # Nights booked in every [day, day + nights) window, from a running count along each row.
+        booked = np.zeros((len(rows), end + nights - start + 1), dtype=np.int32)
+        np.cumsum(self.occupied[rows, start:end + nights], axis=1, out=booked[:, 1:])
+        free = booked[:, nights:] == booked[:, :-nights]
+        return [
+            {"check_in": first + timedelta(days=int(day)), "rooms": [self.rooms[rows[i]] for i in np.flatnonzero(free[:, day])]}
+            for day in np.flatnonzero(free.any(axis=0))[:limit]
+        ]
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "origin": self.origin.isoformat() if self.ready else None,
+            "rooms": len(self.rooms),
+            "stays": len(self._stays),
+            "hits": self.hits,
+            "fallbacks": self.fallbacks,
+            "notifications": self.notifications,
+        }
+
+
+occupancy = _OccupancyCache()
+
+
+# ---------- month calendar cache ----------
+
+class _CalendarCache:
+    """Encoded /calendar responses by (year, month), least recently used dropped past CALENDAR_CACHE_MONTHS.
+
+    Every booking change the occupancy cache sees (local writes, NOTIFYs, rebuilds)
+    empties it. It is only used while the occupancy listener is up, since changes
+    made elsewhere could be missed otherwise.
+    """
+
+    def __init__(self):
+        self._months: OrderedDict[tuple[int, int], tuple[str, bytes]] = OrderedDict()
+        self.generation = 0  # bumped on every invalidation; a build that raced one isn't stored
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: tuple[int, int]) -> Optional[tuple[str, bytes]]:
+        entry = self._months.get(key) if occupancy.ready else None
+        if entry:
+            self._months.move_to_end(key)
+            self.hits += 1
+        else:
+            self.misses += 1
+        return entry
+
+    def put(self, key: tuple[int, int], entry: tuple[str, bytes], generation: int) -> None:
+        if not occupancy.ready or generation != self.generation:
+            return
+        self._months[key] = entry
+        while len(self._months) > CALENDAR_CACHE_MONTHS:
+            self._months.popitem(last=False)
+
+    def invalidate(self) -> None:
+        self.generation += 1
+        self._months.clear()
+
+    def stats(self) -> dict:
+        return {"months": len(self._months), "hits": self.hits, "misses": self.misses}
+
+
+calendars = _CalendarCache()
+
+
+async def _build_calendar(year: int, month: int) -> tuple[str, bytes]:
+    """(ETag, JSON body) for one month; see get_calendar for the shape."""
+    days = calendar.monthrange(year, month)[1]
+    first = date(year, month, 1)
+    async with get_cursor() as cur:
+        await cur.execute("SELECT id, number FROM rooms ORDER BY number")
+        rooms = await cur.fetchall()
+        await cur.execute(
+            """
+            SELECT id, room_id, guest_name, phone, check_in, check_out FROM bookings
+            WHERE stay && daterange(%s, %s, '[)')
+            ORDER BY check_in
+            """,
+            (first, first + timedelta(days=days)),
+        )
+        bookings = await cur.fetchall()
+    row_of_room = {room["id"]: n for n, room in enumerate(rooms)}
+    # separate autocommit reads: drop bookings of a room added in between (the next build shows them)
+    bookings = [b for b in bookings if b["room_id"] in row_of_room]
+    cells = np.zeros((len(rooms), days), dtype=np.int64)
+    for b in bookings:
+        start = max((b["check_in"] - first).days, 0)
+        end = min((b["check_out"] - first).days, days)
+        cells[row_of_room[b["room_id"]], start:end] = b["id"]
+    body = json.dumps(
+        {
+            "year": year,
+            "month": month,
+            "days": days,
+            "rooms": [room["number"] for room in rooms],
+            "cells": cells.tolist(),
+            "bookings": {
+                b["id"]: [b["guest_name"], b["phone"], b["check_in"].isoformat(), b["check_out"].isoformat()]
+                for b in bookings
+            },
+        },
+        separators=(",", ":"),
+    ).encode()
+    return f'"{hashlib.sha1(body).hexdigest()[:16]}"', body
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header lists etag (weak comparison) or is "*"."""
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in (tag.removeprefix("W/") for tag in tags)
+
+
+# ---------- idempotency keys ----------
+
+class _IdempotencyKeys:
+    """Stored responses for requests sent with an Idempotency-Key header.
+
+    claim() and save() run inside the request's write transaction
+    (migrations/20261017120000_idempotency_keys.sql): the key row is inserted before
+    the booking write and gets the response before commit. A concurrent retry blocks
+    on the key until then and replays the stored response; if the first attempt fails
+    (409, 404) its key rolls back with it and the retry runs normally. Keys expire
+    after IDEMPOTENCY_TTL_HOURS and are purged hourly.
+    """
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self.replays = 0
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                async with get_cursor(dict_rows=False) as cur:
+                    await cur.execute(
+                        "DELETE FROM idempotency_keys WHERE created_at < now() - make_interval(hours => %s)",
+                        (IDEMPOTENCY_TTL_HOURS,),
+                    )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"idempotency key purge failed: {e}")
+            await asyncio.sleep(3600)
+
+    async def claim(self, cur, key: str, endpoint: str, req: BaseModel) -> Optional[dict]:
+        """Reserve key for this request; the stored response if it was already handled."""
+        request_hash = hashlib.sha256(f"{endpoint} {req.model_dump_json()}".encode()).hexdigest()
+        await cur.execute(
+            "DELETE FROM idempotency_keys WHERE key = %s AND created_at < now() - make_interval(hours => %s)",
+            (key, IDEMPOTENCY_TTL_HOURS),
+        )
+        await cur.execute(
+            "INSERT INTO idempotency_keys (key, request_hash) VALUES (%s, %s) ON CONFLICT (key) DO NOTHING RETURNING key",
+            (key, request_hash),
+        )
+        if await cur.fetchone():
+            return None
+        await cur.execute("SELECT request_hash, response FROM idempotency_keys WHERE key = %s", (key,))
+        stored = await cur.fetchone()
+        if stored["request_hash"] != request_hash:
+            raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+        self.replays += 1
+        return stored["response"]
+
+    async def save(self, cur, key: str, response: dict) -> None:
+        await cur.execute("UPDATE idempotency_keys SET response = %s WHERE key = %s", (Jsonb(response), key))
+
+    @staticmethod
+    def replayed(response: dict) -> JSONResponse:
+        return JSONResponse(response, headers={"Idempotent-Replayed": "true"})
+
+
+idempotency = _IdempotencyKeys()
+
+
+# ---------- bulk import / export ----------
+# Imports are COPYed into a temp staging table, checked with a few set-based
+# UPDATEs that fill in a rejection reason, and the clean rows merged into bookings
+# with one INSERT ... SELECT. Exports stream COPY TO STDOUT straight to the client.
+
+IMPORT_COLUMNS = ("room_number", "guest_name", "check_in", "check_out", "phone", "email", "created_at")
+EXPORT_COLUMNS = ("id", *IMPORT_COLUMNS)  # id is accepted on import and ignored, so exports re-import as-is
+IMPORT_REQUIRED = {"room_number", "guest_name", "check_in", "check_out"}
+IMPORT_REJECTED_SHOWN = 100
+
+IMPORT_STAGING_SQL = """
+    CREATE TEMP TABLE booking_import (
+        row integer GENERATED ALWAYS AS IDENTITY,
+        id integer, room_number text, guest_name text, check_in date, check_out date,
+        phone text, email text, created_at timestamptz,
+        room_id integer, reason text
+    ) ON COMMIT DROP
+"""
+
+# Run in order; each only looks at rows no earlier check rejected.
+IMPORT_CHECKS = [
+    "UPDATE booking_import s SET room_id = r.id FROM rooms r WHERE r.number = s.room_number",
+    "UPDATE booking_import SET reason = 'unknown room' WHERE room_id IS NULL",
+    """
+    UPDATE booking_import SET reason = 'missing guest_name, check_in or check_out'
+    WHERE reason IS NULL AND (guest_name IS NULL OR check_in IS NULL OR check_out IS NULL)
+    """,
+    "UPDATE booking_import SET reason = 'check_out must be after check_in' WHERE reason IS NULL AND check_out <= check_in",
+    """
+    UPDATE booking_import s SET reason = 'overlaps an existing booking'
+    WHERE reason IS NULL AND EXISTS (
+        SELECT 1 FROM bookings b
+        WHERE b.room_id = s.room_id AND b.stay && daterange(s.check_in, s.check_out, '[)')
+    )
+    """,
+]
+
+# Rows still clean after IMPORT_CHECKS, in the order _overlapping_rows() needs.
+IMPORT_CANDIDATES_SQL = """
+    SELECT row, room_id, check_in, check_out FROM booking_import
+    WHERE reason IS NULL ORDER BY room_id, check_in, row
+"""
+IMPORT_REJECT_OVERLAPS_SQL = "UPDATE booking_import SET reason = 'overlaps another row of the import' WHERE row = ANY(%s)"
+
+IMPORT_MERGE_SQL = """
+    INSERT INTO bookings (room_id, guest_name, check_in, check_out, phone, email, created_at)
+    SELECT room_id, guest_name, check_in, check_out, coalesce(phone, ''), coalesce(email, ''), coalesce(created_at, now())
+    FROM booking_import WHERE reason IS NULL ORDER BY row
+    RETURNING id, room_id, check_in, check_out
+"""
+
+# Bookings overlapping [from, to], in the EXPORT_COLUMNS order.
+EXPORT_SQL = """
+    SELECT b.id, r.number AS room_number, b.guest_name, b.check_in, b.check_out, b.phone, b.email, b.created_at
+    FROM bookings b JOIN rooms r ON r.id = b.room_id
+    WHERE (%(first)s::date IS NULL OR b.check_out > %(first)s) AND (%(last)s::date IS NULL OR b.check_in <= %(last)s)
+    ORDER BY b.check_in, r.number
+"""
+
+
+def _overlapping_rows(candidates) -> list[int]:
+    """Rows overlapping an accepted stay earlier in the same room, taken greedily.
+
+    candidates come ordered by room, check_in and row, so the stay starting first
+    (then the earlier row) wins, and a rejected row doesn't block the ones after it.
+    """
+    rejected, room_id, accepted_end = [], None, None
+    for c in candidates:
+        if c["room_id"] != room_id:
+            room_id, accepted_end = c["room_id"], None
+        if accepted_end is not None and c["check_in"] < accepted_end:
+            rejected.append(c["row"])
+        else:
+            accepted_end = c["check_out"]
+    return rejected
+
+
+async def _copy_csv(cur, stream) -> None:
+    """COPY a CSV body into booking_import; the header line names the columns, in any order."""
+    buffer = b""
+    async for chunk in stream:
+        buffer += chunk
+        if b"\n" in buffer:
+            break
+    header, _, rest = buffer.partition(b"\n")
+    columns = next(csv.reader([header.decode("utf-8-sig").strip()]), [])
+    unknown = set(columns) - set(EXPORT_COLUMNS)
+    if unknown or not IMPORT_REQUIRED <= set(columns):
+        raise HTTPException(
+            status_code=400,
+            detail=f"CSV header must name {', '.join(sorted(IMPORT_REQUIRED))} and only columns from {', '.join(EXPORT_COLUMNS)}",
+        )
+    statement = sql.SQL("COPY booking_import ({}) FROM STDIN WITH (FORMAT csv)").format(
+        sql.SQL(", ").join(map(sql.Identifier, columns))
+    )
+    async with cur.copy(statement) as copy:
+        await copy.write(rest)
+        async for chunk in stream:
+            await copy.write(chunk)
+
+
+async def _copy_ndjson(cur, stream) -> None:
+    """COPY an NDJSON body (one booking object per line) into booking_import."""
+    row = 0
+
+    async def write(copy, line: bytes) -> None:
+        nonlocal row
+        if not line.strip():
+            return
+        row += 1
+        try:
+            booking = json.loads(line)
+        except ValueError:
+            booking = None
+        if not isinstance(booking, dict):
+            raise HTTPException(status_code=400, detail=f"Row {row} is not a JSON object")
+        values = [booking.get(column) for column in IMPORT_COLUMNS]
+        for column, value in zip(IMPORT_COLUMNS, values):
+            if isinstance(value, (dict, list)):
+                raise HTTPException(status_code=400, detail=f"Row {row}: {column} must be a string, number or null")
+        await copy.write_row(values)
+
+    statement = sql.SQL("COPY booking_import ({}) FROM STDIN").format(sql.SQL(", ").join(map(sql.Identifier, IMPORT_COLUMNS)))
+    async with cur.copy(statement) as copy:
+        buffer = b""
+        async for chunk in stream:
+            *lines, buffer = (buffer + chunk).split(b"\n")
+            for line in lines:
+                await write(copy, line)
+        await write(copy, buffer)
 
 
 # ---------- models ----------
@@ -58,28 +672,48 @@ class BookingRequest(BaseModel):
 # ---------- routes ----------
 
 @app.get("/health")
-def health():
+async def health():
     try:
-        conn = get_conn()
-        conn.close()
-        return {"status": "ok"}
+        async with get_cursor(dict_rows=False) as cur:
+            await cur.execute("SELECT 1")
+        return {"status": "ok", "pool": pool.get_stats(), "availability_cache": occupancy.stats(), "calendar_cache": calendars.stats(),
+                "idempotency_replays": idempotency.replays}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=503, detail=str(e))
 
 
 @app.get("/rooms")
-def get_rooms():
-    conn = get_conn()
-    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-    cur.execute("SELECT * FROM rooms ORDER BY number")
-    rooms = [dict(r) for r in cur.fetchall()]
-    cur.close()
-    conn.close()
-    return rooms
+async def get_rooms():
+    async with get_cursor() as cur:
+        await cur.execute("SELECT * FROM rooms ORDER BY number")
+        return await cur.fetchall()
+
+
+@app.get("/calendar/{year}/{month}")
+async def get_calendar(request: Request, year: int = Path(ge=2000, le=2100), month: int = Path(ge=1, le=12)):
+    """Room x day occupancy for one month, for the bookings dashboard.
+
+    {"year", "month", "days", "rooms": [number, ...], "cells": [[booking id or 0 per day] per room],
+    "bookings": {id: [guest_name, phone, check_in, check_out]}}. A cell is the night starting that
+    day. Served from an in-process cache with an ETag; If-None-Match gets a 304.
+    """
+    key = (year, month)
+    entry = calendars.get(key)
+    if entry is None:
+        generation = calendars.generation
+        entry = await _build_calendar(year, month)
+        calendars.put(key, entry, generation)
+    etag, body = entry
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 
 @app.get("/bookings")
-def get_bookings(year: int, month: int):
+async def get_bookings(year: int, month: int):
     """Return all bookings that overlap with given month."""
     start = date(year, month, 1)
     # last day of month
@@ -88,25 +722,22 @@ def get_bookings(year: int, month: int):
     else:
         end = date(year, month + 1, 1) - timedelta(days=1)
 
-    conn = get_conn()
-    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-    cur.execute(
-        """
-        SELECT b.id, b.guest_name, b.phone, b.check_in, b.check_out, b.created_at,
-               r.number as room_number, r.type, r.price_per_night
-        FROM bookings b
-        JOIN rooms r ON r.id = b.room_id
-        WHERE b.check_in <= %s AND b.check_out >= %s
-        ORDER BY b.check_in
-        """,
-        (end, start),
-    )
-    rows = cur.fetchall()
-    cur.close()
-    conn.close()
+    async with get_cursor() as cur:
+        await cur.execute(
+            """
+            SELECT b.id, b.guest_name, b.phone, b.check_in, b.check_out, b.created_at,
+                   r.number as room_number, r.type, r.price_per_night
+            FROM bookings b
+            JOIN rooms r ON r.id = b.room_id
+            WHERE b.check_in <= %s AND b.check_out >= %s
+            ORDER BY b.check_in
+            """,
+            (end, start),
+        )
+        rows = await cur.fetchall()
     return [
         {
-            **dict(r),
+            **r,
             "check_in": r["check_in"].isoformat(),
             "check_out": r["check_out"].isoformat(),
             "created_at": r["created_at"].isoformat(),
@@ -116,114 +747,124 @@ def get_bookings(year: int, month: int):
 
 
 @app.get("/availability")
-def check_availability(check_in: date, check_out: date, room_number: Optional[str] = None):
+async def check_availability(check_in: date, check_out: date, room_number: Optional[str] = None):
     """Check which rooms are available for given dates."""
-    conn = get_conn()
-    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-
-    if room_number:
-        cur.execute(
-            """
-            SELECT r.number, r.type, r.description, r.details, r.price_per_night,
-                   NOT EXISTS (
-                       SELECT 1 FROM bookings b
-                       WHERE b.room_id = r.id
-                         AND b.check_in < %s AND b.check_out > %s
-                   ) AS available
-            FROM rooms r WHERE r.number = %s
-            """,
-            (check_out, check_in, room_number),
-        )
-    else:
-        cur.execute(
-            """
-            SELECT r.number, r.type, r.description, r.details, r.price_per_night,
-                   NOT EXISTS (
-                       SELECT 1 FROM bookings b
-                       WHERE b.room_id = r.id
-                         AND b.check_in < %s AND b.check_out > %s
-                   ) AS available
-            FROM rooms r ORDER BY r.number
-            """,
-            (check_out, check_in),
+    if check_out <= check_in:
+        raise HTTPException(status_code=400, detail="check_out must be after check_in")
+    rows = occupancy.lookup(check_in, check_out, room_number)
+    if rows is not None:
+        return rows
+    async with get_cursor() as cur:
+        await cur.execute(
+            AVAILABILITY_SQL,
+            {"check_in": check_in, "check_out": check_out, "room_number": room_number},
+            prepare=True,
         )
+        return await cur.fetchall()
+
+
+@app.get("/availability/search")
+async def search_availability(
+    room_type: Optional[str] = None,
+    nights: int = Query(1, ge=1, le=30),
+    first: Optional[date] = Query(None, alias="from"),
+    last: Optional[date] = Query(None, alias="to"),
+    limit: int = Query(5, ge=1, le=31),
+):
+    """Earliest stays of `nights` nights starting between from and to (default: today and 60 days on)
+    with a room whose type contains room_type free, and which rooms are free for each."""
+    first = first or date.today()
+    last = last or first + timedelta(days=60)
+    if last < first or (last - first).days > 366:
+        raise HTTPException(status_code=400, detail="to must be on or after from, at most 366 days later")
+    first = max(first, date.today())  # no check-ins in the past
+
+    windows = [] if last < first else occupancy.search(room_type, nights, first, last, limit)
+    if windows is None:
+        async with get_cursor() as cur:
+            await cur.execute(
+                SEARCH_SQL,
+                {
+                    "type_pattern": name_pattern(room_type) if room_type else None,
+                    "nights": nights,
+                    "first": first,
+                    "last": last,
+                    "limit": limit,
+                },
+            )
+            windows = []
+            for row in await cur.fetchall():
+                check_in = row.pop("check_in")
+                if not windows or windows[-1]["check_in"] != check_in:
+                    windows.append({"check_in": check_in, "rooms": []})
+                windows[-1]["rooms"].append(row)
+    return {
+        "room_type": room_type,
+        "nights": nights,
+        "windows": [
+            {
+                "check_in": w["check_in"].isoformat(),
+                "check_out": (w["check_in"] + timedelta(days=nights)).isoformat(),
+                "rooms": w["rooms"],
+            }
+            for w in windows
+        ],
+    }
+
 
-    rows = [dict(r) for r in cur.fetchall()]
-    cur.close()
-    conn.close()
-    return rows
+async def _find_upcoming(cur, phone: str, guest_name: str) -> Optional[dict]:
+    """Earliest upcoming booking for phone whose guest name contains guest_name."""
+    await cur.execute(FIND_BY_PHONE_SQL, {"phone": phone, "name_pattern": name_pattern(guest_name)}, prepare=True)
+    return await cur.fetchone()
 
 
 @app.post("/bookings")
-def create_booking(req: BookingRequest):
+async def create_booking(req: BookingRequest, idempotency_key: Optional[str] = Header(None, max_length=255)):
     if req.check_out <= req.check_in:
         raise HTTPException(status_code=400, detail="check_out must be after check_in")
 
-    conn = get_conn()
-    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-
-    # get room
-    cur.execute("SELECT * FROM rooms WHERE number = %s", (req.room_number,))
-    room = cur.fetchone()
-    if not room:
-        cur.close()
-        conn.close()
-        raise HTTPException(status_code=404, detail=f"Room {req.room_number} not found")
-
-    # check availability
-    cur.execute(
-        """
-        SELECT id FROM bookings
-        WHERE room_id = %s AND check_in < %s AND check_out > %s
-        """,
-        (room["id"], req.check_out, req.check_in),
-    )
-    conflict = cur.fetchone()
-    if conflict:
-        cur.close()
-        conn.close()
-        raise HTTPException(status_code=409, detail=f"Room {req.room_number} is not available for those dates")
-
-    # create booking
-    cur.execute(
-        """
-        INSERT INTO bookings (room_id, guest_name, check_in, check_out, phone, email)
-        VALUES (%s, %s, %s, %s, %s, %s) RETURNING id, created_at
-        """,
-        (room["id"], req.guest_name, req.check_in, req.check_out, req.phone, req.email),
-    )
-    result = cur.fetchone()
-    conn.commit()
-    cur.close()
-    conn.close()
+    # with a key the claim, the insert and the stored response commit together
+    async with get_cursor(write=idempotency_key is not None) as cur:
+        if idempotency_key:
+            replay = await idempotency.claim(cur, idempotency_key, "POST /bookings", req)
+            if replay is not None:
+                return idempotency.replayed(replay)
+        try:
+            await cur.execute(CREATE_BOOKING_SQL, req.model_dump(), prepare=True)
+        except ExclusionViolation:
+            raise HTTPException(status_code=409, detail=f"Room {req.room_number} is not available for those dates")
+        result = await cur.fetchone()
+        if not result:
+            raise HTTPException(status_code=404, detail=f"Room {req.room_number} not found")
 
-    nights = (req.check_out - req.check_in).days
-    return {
-        "booking_id": result["id"],
-        "room_number": req.room_number,
-        "room_type": room["type"],
-        "guest_name": req.guest_name,
-        "phone": req.phone,
-        "email": req.email,
-        "check_in": req.check_in.isoformat(),
-        "check_out": req.check_out.isoformat(),
-        "nights": nights,
-        "total": float(room["price_per_night"]) * nights,
-        "created_at": result["created_at"].isoformat(),
-    }
+        nights = (req.check_out - req.check_in).days
+        response = {
+            "booking_id": result["id"],
+            "room_number": req.room_number,
+            "room_type": result["type"],
+            "guest_name": req.guest_name,
+            "phone": req.phone,
+            "email": req.email,
+            "check_in": req.check_in.isoformat(),
+            "check_out": req.check_out.isoformat(),
+            "nights": nights,
+            "total": float(result["price_per_night"]) * nights,
+            "created_at": result["created_at"].isoformat(),
+        }
+        if idempotency_key:
+            await idempotency.save(cur, idempotency_key, response)
+    occupancy.booked(result["id"], result["room_id"], req.check_in, req.check_out)
+    return response
 
 
 @app.delete("/bookings/{booking_id}")
-def cancel_booking(booking_id: int):
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("DELETE FROM bookings WHERE id = %s RETURNING id", (booking_id,))
-    deleted = cur.fetchone()
-    conn.commit()
-    cur.close()
-    conn.close()
+async def cancel_booking(booking_id: int):
+    async with get_cursor(dict_rows=False) as cur:
+        await cur.execute("DELETE FROM bookings WHERE id = %s RETURNING id", (booking_id,))
+        deleted = await cur.fetchone()
     if not deleted:
         raise HTTPException(status_code=404, detail="Booking not found")
+    occupancy.cancelled(booking_id)
     return {"status": "cancelled", "booking_id": booking_id}
 
 
@@ -234,80 +875,51 @@ class RescheduleRequest(BaseModel):
 
 
 @app.post("/bookings/reschedule")
-def reschedule_booking(req: RescheduleRequest):
+async def reschedule_booking(req: RescheduleRequest, idempotency_key: Optional[str] = Header(None, max_length=255)):
     if req.new_check_out <= req.new_check_in:
         raise HTTPException(status_code=400, detail="new_check_out must be after new_check_in")
 
-    conn = get_conn()
-    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-
-    # find booking by phone (most recent upcoming)
-    cur.execute(
-        """
-        SELECT b.id, b.room_id, b.guest_name, b.check_in, b.check_out,
-               r.number as room_number, r.type, r.price_per_night
-        FROM bookings b JOIN rooms r ON r.id = b.room_id
-        WHERE b.phone = %s AND b.check_in >= CURRENT_DATE
-        ORDER BY b.check_in ASC LIMIT 1
-        """,
-        (req.phone,),
-    )
-    booking = cur.fetchone()
-    if not booking:
-        cur.close(); conn.close()
-        raise HTTPException(status_code=404, detail="No upcoming booking found for this phone number")
-
-    # check new dates don't conflict with another booking in same room (excluding this one)
-    cur.execute(
-        """
-        SELECT id FROM bookings
-        WHERE room_id = %s AND id != %s AND check_in < %s AND check_out > %s
-        """,
-        (booking["room_id"], booking["id"], req.new_check_out, req.new_check_in),
-    )
-    if cur.fetchone():
-        cur.close(); conn.close()
-        raise HTTPException(status_code=409, detail="Room is not available for the new dates")
-
-    # update
-    cur.execute(
-        "UPDATE bookings SET check_in = %s, check_out = %s WHERE id = %s",
-        (req.new_check_in, req.new_check_out, booking["id"]),
-    )
-    conn.commit()
-    cur.close(); conn.close()
+    async with get_cursor(write=idempotency_key is not None) as cur:
+        if idempotency_key:
+            replay = await idempotency.claim(cur, idempotency_key, "POST /bookings/reschedule", req)
+            if replay is not None:
+                return idempotency.replayed(replay)
+        # move the most recent upcoming booking for this phone; the constraint ignores its own old stay
+        try:
+            await cur.execute(
+                RESCHEDULE_SQL,
+                {"phone": req.phone, "check_in": req.new_check_in, "check_out": req.new_check_out},
+                prepare=True,
+            )
+        except ExclusionViolation:
+            raise HTTPException(status_code=409, detail="Room is not available for the new dates")
+        booking = await cur.fetchone()
+        if not booking:
+            raise HTTPException(status_code=404, detail="No upcoming booking found for this phone number")
 
-    nights = (req.new_check_out - req.new_check_in).days
-    return {
-        "status": "rescheduled",
-        "booking_id": booking["id"],
-        "room_number": booking["room_number"],
-        "room_type": booking["type"],
-        "guest_name": booking["guest_name"],
-        "new_check_in": req.new_check_in.isoformat(),
-        "new_check_out": req.new_check_out.isoformat(),
-        "nights": nights,
-        "total": float(booking["price_per_night"]) * nights,
-    }
+        nights = (req.new_check_out - req.new_check_in).days
+        response = {
+            "status": "rescheduled",
+            "booking_id": booking["id"],
+            "room_number": booking["room_number"],
+            "room_type": booking["type"],
+            "guest_name": booking["guest_name"],
+            "new_check_in": req.new_check_in.isoformat(),
+            "new_check_out": req.new_check_out.isoformat(),
+            "nights": nights,
+            "total": float(booking["price_per_night"]) * nights,
+        }
+        if idempotency_key:
+            await idempotency.save(cur, idempotency_key, response)
+    occupancy.booked(booking["id"], booking["room_id"], req.new_check_in, req.new_check_out)
+    return response
 
 
 @app.get("/bookings/find-by-phone")
-def find_booking_by_phone(phone: str, guest_name: str):
+async def find_booking_by_phone(phone: str, guest_name: str):
     """Find an upcoming booking by phone + name without modifying it."""
-    conn = get_conn()
-    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-    cur.execute(
-        """
-        SELECT b.id, b.guest_name, b.check_in, b.check_out, b.email,
-               r.number as room_number, r.type
-        FROM bookings b JOIN rooms r ON r.id = b.room_id
-        WHERE b.phone = %s AND LOWER(b.guest_name) LIKE LOWER(%s) AND b.check_in >= CURRENT_DATE
-        ORDER BY b.check_in ASC LIMIT 1
-        """,
-        (phone, f"%{guest_name}%"),
-    )
-    booking = cur.fetchone()
-    cur.close(); conn.close()
+    async with get_cursor() as cur:
+        booking = await _find_upcoming(cur, phone, guest_name)
     if not booking:
         raise HTTPException(status_code=404, detail="No upcoming booking found for this name and phone number")
     return {
@@ -326,29 +938,15 @@ class CancelByPhoneRequest(BaseModel):
 
 
 @app.post("/bookings/cancel-by-phone")
-def cancel_booking_by_phone(req: CancelByPhoneRequest):
-    conn = get_conn()
-    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-
-    # find upcoming booking by phone + name (case-insensitive name match)
-    cur.execute(
-        """
-        SELECT b.id, b.guest_name, b.check_in, b.check_out,
-               r.number as room_number, r.type
-        FROM bookings b JOIN rooms r ON r.id = b.room_id
-        WHERE b.phone = %s AND LOWER(b.guest_name) LIKE LOWER(%s) AND b.check_in >= CURRENT_DATE
-        ORDER BY b.check_in ASC LIMIT 1
-        """,
-        (req.phone, f"%{req.guest_name}%"),
-    )
-    booking = cur.fetchone()
-    if not booking:
-        cur.close(); conn.close()
-        raise HTTPException(status_code=404, detail="No upcoming booking found for this name and phone number")
+async def cancel_booking_by_phone(req: CancelByPhoneRequest):
+    async with get_cursor(write=True) as cur:
+        # find upcoming booking by phone + name (case-insensitive name match)
+        booking = await _find_upcoming(cur, req.phone, req.guest_name)
+        if not booking:
+            raise HTTPException(status_code=404, detail="No upcoming booking found for this name and phone number")
 
-    cur.execute("DELETE FROM bookings WHERE id = %s", (booking["id"],))
-    conn.commit()
-    cur.close(); conn.close()
+        await cur.execute("DELETE FROM bookings WHERE id = %s", (booking["id"],))
+    occupancy.cancelled(booking["id"])
 
     return {
         "status": "cancelled",
@@ -358,3 +956,82 @@ def cancel_booking_by_phone(req: CancelByPhoneRequest):
         "check_in": booking["check_in"].isoformat(),
         "check_out": booking["check_out"].isoformat(),
     }
+
+
+@app.post("/bookings/import")
+async def import_bookings(request: Request):
+    """Bulk-add bookings from a CSV (text/csv, with a header) or NDJSON (application/x-ndjson) body.
+
+    Rows for unknown rooms, with bad dates, or overlapping an existing booking or another
+    row of the same import are skipped and listed; the rest are added in one transaction.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    if content_type == "text/csv":
+        copy_body = _copy_csv
+    elif content_type in ("application/x-ndjson", "application/jsonl"):
+        copy_body = _copy_ndjson
+    else:
+        raise HTTPException(status_code=415, detail="Send text/csv or application/x-ndjson")
+
+    async with get_cursor(write=True) as cur:
+        await cur.execute(IMPORT_STAGING_SQL)
+        try:
+            await copy_body(cur, request.stream())
+        except DataError as e:
+            raise HTTPException(status_code=400, detail=str(e).splitlines()[0])
+        for check in IMPORT_CHECKS:
+            await cur.execute(check)
+        await cur.execute(IMPORT_CANDIDATES_SQL)
+        overlapping = _overlapping_rows(await cur.fetchall())
+        if overlapping:
+            await cur.execute(IMPORT_REJECT_OVERLAPS_SQL, (overlapping,))
+        try:
+            await cur.execute(IMPORT_MERGE_SQL)
+        except ExclusionViolation:  # a booking made while this import ran
+            raise HTTPException(status_code=409, detail="Bookings changed during the import, try again")
+        imported = await cur.fetchall()
+        await cur.execute("SELECT count(*) AS n FROM booking_import WHERE reason IS NOT NULL")
+        rejected_count = (await cur.fetchone())["n"]
+        await cur.execute(
+            "SELECT row, reason FROM booking_import WHERE reason IS NOT NULL ORDER BY row LIMIT %s",
+            (IMPORT_REJECTED_SHOWN,),
+        )
+        rejected = await cur.fetchall()
+    for b in imported:
+        occupancy.booked(b["id"], b["room_id"], b["check_in"], b["check_out"])
+
+    return {
+        "received": len(imported) + rejected_count,
+        "imported": len(imported),
+        "rejected": rejected_count,
+        "rejected_rows": rejected,  # first IMPORT_REJECTED_SHOWN; row counts data rows from 1
+    }
+
+
+@app.get("/bookings/export")
+async def export_bookings(
+    fmt: str = Query("csv", alias="format", pattern="^(csv|ndjson)$"),
+    first: Optional[date] = Query(None, alias="from"),
+    last: Optional[date] = Query(None, alias="to"),
+):
+    """Stream bookings overlapping [from, to] (all by default) as CSV with a header, or NDJSON."""
+    if fmt == "csv":
+        statement = f"COPY ({EXPORT_SQL}) TO STDOUT WITH (FORMAT csv, HEADER true)"
+        media_type = "text/csv"
+    else:
+        # row_to_json escapes control characters, so with quote and delimiter bytes
+        # that never occur in JSON the CSV writer emits each document unchanged.
+        statement = f"COPY (SELECT row_to_json(e)::text FROM ({EXPORT_SQL}) e) TO STDOUT WITH (FORMAT csv, QUOTE E'\\x01', DELIMITER E'\\x02')"
+        media_type = "application/x-ndjson"
+
+    # The connection is taken when the body starts, so a response that is never
+    # sent (client gone first) never holds one.
+    async def body():
+        async with get_cursor(dict_rows=False) as cur:
+            async with cur.copy(statement, {"first": first, "last": last}) as copy:
+                async for data in copy:
+                    yield bytes(data)
+
+    return StreamingResponse(
+        body(), media_type=media_type, headers={"Content-Disposition": f'attachment; filename="bookings.{fmt}"'}
+    )
@@ -0,0 +1,33 @@
+-- Store each booking's stay as a daterange and let Postgres reject overlaps.
+--
+-- stay is generated from check_in/check_out, which stay the columns the API
+-- writes. The exclusion constraint makes a second booking of the same room for
+-- an overlapping stay fail with exclusion_violation (SQLSTATE 23P01), which the
+-- API maps to 409, and its GiST index serves the overlap test in /availability.
+--
+-- Apply with: psql "$DATABASE_URL" -f 20261017090000_booking_stay_exclusion.sql
+-- If it fails on existing data, list the overlapping pairs first:
+--   SELECT a.id, b.id FROM bookings a JOIN bookings b
+--     ON a.room_id = b.room_id AND a.id < b.id
+--    AND a.check_in < b.check_out AND a.check_out > b.check_in;
+
+-- btree_gist provides the GiST operator class for room_id WITH =
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+
+ALTER TABLE bookings
+  ADD COLUMN IF NOT EXISTS stay daterange
+  GENERATED ALWAYS AS (daterange(check_in, check_out, '[)')) STORED;
+
+-- ADD CONSTRAINT has no IF NOT EXISTS; check pg_constraint so a re-run is a no-op
+DO $$
+BEGIN
+  IF NOT EXISTS (
+    SELECT 1 FROM pg_constraint
+    WHERE conname = 'bookings_room_stay_excl' AND conrelid = 'bookings'::regclass
+  ) THEN
+    ALTER TABLE bookings
+      ADD CONSTRAINT bookings_room_stay_excl
+      EXCLUDE USING gist (room_id WITH =, stay WITH &&);
+  END IF;
+END
+$$;
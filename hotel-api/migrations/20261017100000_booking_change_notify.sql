@@ -0,0 +1,80 @@
+-- NOTIFY hotel-api of every booking and room change, so each instance can keep
+-- its in-memory occupancy bitmap in step with writes from any source.
+--
+-- Channel "bookings_changed", one notification per statement, JSON payload:
+--   {"op": "BOOKINGS", "upserts": [{"id", "room_id", "check_in", "check_out"}, ...], "deletes": [id, ...]}
+--   {"op": "RELOAD"}           -- a statement changed more than 50 bookings; reload everything
+--   {"op": "ROOMS"}            -- rooms table changed; reload everything
+-- Statement-level triggers with transition tables keep a COPY or bulk UPDATE to
+-- one notification (NOTIFY payloads are capped at 8000 bytes, hence RELOAD).
+-- Notifications are delivered when the writing transaction commits.
+--
+-- Apply with: psql "$DATABASE_URL" -f 20261017100000_booking_change_notify.sql
+
+CREATE OR REPLACE FUNCTION notify_booking_change() RETURNS trigger AS $$
+DECLARE
+  changed bigint;
+  upserts json;
+  deletes json;
+BEGIN
+  IF TG_OP = 'INSERT' THEN
+    SELECT count(*), json_agg(json_build_object('id', id, 'room_id', room_id, 'check_in', check_in, 'check_out', check_out))
+      INTO changed, upserts
+      FROM (SELECT id, room_id, check_in, check_out FROM new_rows LIMIT 51) r;
+  ELSIF TG_OP = 'UPDATE' THEN
+    -- transition tables rule out UPDATE OF <columns>, so skip rows whose stay is unchanged here
+    SELECT count(*), json_agg(json_build_object('id', id, 'room_id', room_id, 'check_in', check_in, 'check_out', check_out))
+      INTO changed, upserts
+      FROM (
+        SELECT n.id, n.room_id, n.check_in, n.check_out
+        FROM new_rows n JOIN old_rows o ON o.id = n.id
+        WHERE (n.room_id, n.check_in, n.check_out) IS DISTINCT FROM (o.room_id, o.check_in, o.check_out)
+        LIMIT 51
+      ) r;
+  ELSE
+    SELECT count(*), json_agg(id) INTO changed, deletes FROM (SELECT id FROM old_rows LIMIT 51) r;
+  END IF;
+
+  IF changed > 50 THEN
+    PERFORM pg_notify('bookings_changed', '{"op": "RELOAD"}');
+  ELSIF changed > 0 THEN
+    PERFORM pg_notify('bookings_changed', json_build_object(
+      'op', 'BOOKINGS',
+      'upserts', coalesce(upserts, '[]'::json),
+      'deletes', coalesce(deletes, '[]'::json))::text);
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION notify_rooms_change() RETURNS trigger AS $$
+BEGIN
+  PERFORM pg_notify('bookings_changed', '{"op": "ROOMS"}');
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- transition tables need one trigger per event
+DROP TRIGGER IF EXISTS bookings_notify ON bookings;
+DROP TRIGGER IF EXISTS bookings_notify_insert ON bookings;
+CREATE TRIGGER bookings_notify_insert
+  AFTER INSERT ON bookings
+  REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION notify_booking_change();
+
+DROP TRIGGER IF EXISTS bookings_notify_update ON bookings;
+CREATE TRIGGER bookings_notify_update
+  AFTER UPDATE ON bookings
+  REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION notify_booking_change();
+
+DROP TRIGGER IF EXISTS bookings_notify_delete ON bookings;
+CREATE TRIGGER bookings_notify_delete
+  AFTER DELETE ON bookings
+  REFERENCING OLD TABLE AS old_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION notify_booking_change();
+
+DROP TRIGGER IF EXISTS rooms_notify ON rooms;
+CREATE TRIGGER rooms_notify
+  AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON rooms
+  FOR EACH STATEMENT EXECUTE FUNCTION notify_rooms_change();
@@ -0,0 +1,20 @@
+-- Indexes for finding a caller's booking by phone and name.
+--
+-- find-by-phone, cancel-by-phone and reschedule look up the next upcoming
+-- booking for a phone: (phone, check_in) answers phone = ? AND check_in >= today
+-- ORDER BY check_in LIMIT 1 straight from the index. The name filter is a
+-- substring match on lower(guest_name) (LIKE '%name%'), which a btree can't
+-- serve; the trigram GIN index can, on its own or combined with the phone one.
+--
+-- CONCURRENTLY avoids locking bookings against writes while building, so this
+-- can't run inside a transaction block. Apply with:
+--   psql "$DATABASE_URL" -f 20261017110000_booking_lookup_indexes.sql
+-- and check the plans with: python explain_audit.py
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS bookings_phone_check_in_idx
+  ON bookings (phone, check_in);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS bookings_guest_name_trgm_idx
+  ON bookings USING gin (lower(guest_name) gin_trgm_ops);
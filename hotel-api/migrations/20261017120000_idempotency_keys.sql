@@ -0,0 +1,19 @@
+-- Stored responses for Idempotency-Key requests (POST /bookings, POST /bookings/reschedule).
+--
+-- A key is claimed by inserting its row in the same transaction as the booking
+-- write and filled with the response before commit, so a retry either waits for
+-- the first attempt and replays its response, or (if that attempt failed and
+-- rolled back) runs again. request_hash is the endpoint plus the request body;
+-- reusing a key for a different request is rejected. Rows older than
+-- IDEMPOTENCY_TTL_HOURS (24) are ignored and purged hourly by hotel-api.
+--
+-- Apply with: psql "$DATABASE_URL" -f 20261017120000_idempotency_keys.sql
+
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+  key text PRIMARY KEY,
+  request_hash text NOT NULL,
+  response jsonb,
+  created_at timestamptz NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idempotency_keys_created_at_idx ON idempotency_keys (created_at);
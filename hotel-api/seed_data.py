@@ -0,0 +1,181 @@
+"""
+Synthetic data for hotel-api: N rooms and about M bookings at a target occupancy.
+
+Rooms get a realistic type mix (Standard / Superior / Deluxe / Penthouse) and
+prices. Bookings are laid out per room as back-to-back stays of 1-14 nights
+(mostly 2-4) separated by random gaps sized so the rooms are booked for
+--occupancy of the nights, over a period that starts --history years ago
+and runs into the future, so it never violates the no-overlap constraint.
+Rows go in with COPY.
+
+Only for a local/scratch database: --reset deletes every booking and room first.
+Without it the new rooms are added next to the existing ones, numbered from the
+floor above the highest existing room number (bookings only go on the new rooms).
+
+    docker run -d --name hotel-pg -e POSTGRES_PASSWORD=pg -p 5432:5432 postgres:16
+    export DB_HOST=127.0.0.1 DB_USER=postgres DB_PASSWORD=pg DB_NAME=postgres
+    python seed_data.py --init --reset --rooms 200 --bookings 200000
+    python loadtest.py
+
+--init creates the rooms/bookings tables if missing and applies migrations/*.sql
+in order (they need the btree_gist and pg_trgm extensions, shipped with the
+official postgres image).
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import time
+from datetime import date, timedelta
+
+from psycopg import AsyncConnection
+
+import main
+
+ROOM_TYPES = [  # (type, share of rooms, price range per night, description)
+    ("Standard", 0.5, (75, 99), "Cosy double room with garden view"),
+    ("Superior", 0.3, (115, 145), "Spacious room with sea view and balcony"),
+    ("Deluxe", 0.17, (175, 220), "Suite with separate lounge and jacuzzi bath"),
+    ("Penthouse", 0.03, (390, 520), "Top-floor penthouse with private terrace"),
+]
+NIGHTS = ([1, 2, 3, 4, 5, 7, 10, 14], [12, 26, 22, 14, 9, 10, 4, 3])
+FIRST_NAMES = ["Aoife", "Sean", "Niamh", "Conor", "Emma", "Liam", "Saoirse", "Jack", "Ciara", "Oisin",
+               "Anna", "James", "Sophie", "Daniel", "Grace", "Michael", "Orla", "Patrick", "Kate", "Tom"]
+LAST_NAMES = ["Murphy", "Kelly", "O'Sullivan", "Walsh", "Smith", "O'Brien", "Byrne", "Ryan", "O'Connor",
+              "O'Neill", "Doyle", "McCarthy", "Gallagher", "Kennedy", "Lynch", "Murray", "Quinn", "Moore"]
+
+BASE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rooms (
+    id serial PRIMARY KEY,
+    number text NOT NULL UNIQUE,
+    type text NOT NULL,
+    description text NOT NULL DEFAULT '',
+    details text NOT NULL DEFAULT '',
+    price_per_night numeric(8, 2) NOT NULL
+);
+CREATE TABLE IF NOT EXISTS bookings (
+    id serial PRIMARY KEY,
+    room_id integer NOT NULL REFERENCES rooms(id),
+    guest_name text NOT NULL,
+    check_in date NOT NULL,
+    check_out date NOT NULL,
+    phone text NOT NULL DEFAULT '',
+    email text NOT NULL DEFAULT '',
+    created_at timestamptz NOT NULL DEFAULT now()
+);
+"""
+
+
+def sql_statements(sql: str) -> list[str]:
+    """Split a migration into statements on ';', leaving $$-quoted function bodies whole."""
+    statements, current, quoted = [], [], False
+    for line in sql.splitlines():
+        if line.strip().startswith("--") and not quoted:
+            continue
+        current.append(line)
+        quoted ^= line.count("$$") % 2 == 1
+        if not quoted and line.rstrip().endswith(";"):
+            statements.append("\n".join(current).strip())
+            current = []
+    if "".join(current).strip():
+        statements.append("\n".join(current).strip())
+    return statements
+
+
+async def init_schema(conn: AsyncConnection) -> None:
+    await conn.execute(BASE_SCHEMA)
+    migrations = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+    for name in sorted(os.listdir(migrations)):
+        if not name.endswith(".sql"):
+            continue
+        for statement in sql_statements(open(os.path.join(migrations, name)).read()):
+            try:
+                await conn.execute(statement)
+            except Exception as e:  # already applied (constraint exists etc.)
+                print(f"  {name}: {str(e).splitlines()[0]}")
+        print(f"applied {name}")
+
+
+def first_free_floor(numbers: list[str]) -> int:
+    """Floor above the highest existing room number ("1207" is floor 12), 0 for an empty hotel."""
+    return max((int(n) // 100 for n in numbers if n.isdigit()), default=0)
+
+
+def make_rooms(count: int, rng: random.Random, first_floor: int = 0) -> list[tuple]:
+    rooms = []
+    for n in range(count):
+        share = n / count
+        for room_type, weight, (low, high), description in ROOM_TYPES:
+            if share < weight:
+                break
+            share -= weight
+        floor, index = divmod(n, 20)
+        floor += first_floor
+        number = f"{floor + 1}{index + 1:02d}"
+        details = f"Floor {floor + 1}. {rng.choice(['King bed', 'Queen bed', 'Twin beds'])}, " \
+                  f"{rng.choice(['shower', 'bath', 'bath and shower'])}."
+        rooms.append((number, room_type, description, details, rng.randrange(low, high + 1)))
+    return rooms
+
+
+def make_bookings(room_ids: list[int], bookings: int, occupancy: float, history_years: float, rng: random.Random):
+    """Yield booking rows: back-to-back stays per room with gaps that give the target occupancy."""
+    mean_nights = sum(n * w for n, w in zip(*NIGHTS)) / sum(NIGHTS[1])
+    span = int(bookings * mean_nights / (len(room_ids) * occupancy)) + 1
+    start = date.today() - timedelta(days=int(history_years * 365))
+    end = start + timedelta(days=max(span, 1))
+    mean_gap = mean_nights * (1 - occupancy) / occupancy
+    made = 0
+    for room_id in room_ids:
+        day = start + timedelta(days=rng.randrange(0, 7))
+        while day < end:
+            nights = rng.choices(*NIGHTS)[0]
+            first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+            phone = f"+3538{rng.randrange(10_000_000):07d}"
+            yield (room_id, f"{first} {last}", day, day + timedelta(days=nights), phone, "")
+            made += 1
+            day += timedelta(days=nights + round(rng.expovariate(1 / mean_gap)) if mean_gap else nights)
+    print(f"{made} bookings from {start} to {end} (~{occupancy:.0%} of nights booked)")
+
+
+async def seed(args) -> None:
+    rng = random.Random(args.seed)
+    async with await AsyncConnection.connect(main.DB_CONNINFO, autocommit=True) as conn:
+        if args.init:
+            await init_schema(conn)
+        if args.reset:
+            await conn.execute("TRUNCATE bookings, rooms RESTART IDENTITY CASCADE")
+        started = time.perf_counter()
+        async with conn.cursor() as cur:
+            await cur.execute("SELECT coalesce(max(id), 0) FROM rooms")
+            (last_id,) = await cur.fetchone()
+            await cur.execute("SELECT number FROM rooms")
+            first_floor = first_free_floor([row[0] for row in await cur.fetchall()])
+            async with cur.copy("COPY rooms (number, type, description, details, price_per_night) FROM STDIN") as copy:
+                for row in make_rooms(args.rooms, rng, first_floor):
+                    await copy.write_row(row)
+            await cur.execute("SELECT id FROM rooms WHERE id > %s ORDER BY id", (last_id,))
+            room_ids = [row[0] for row in await cur.fetchall()]
+            async with cur.copy("COPY bookings (room_id, guest_name, check_in, check_out, phone, email) FROM STDIN") as copy:
+                for row in make_bookings(room_ids, args.bookings, args.occupancy, args.history, rng):
+                    await copy.write_row(row)
+            await cur.execute("ANALYZE rooms")
+            await cur.execute("ANALYZE bookings")
+        print(f"seeded {len(room_ids)} rooms in {time.perf_counter() - started:.1f}s")
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(description="Seed a local hotel-api database with synthetic rooms and bookings")
+    parser.add_argument("--rooms", type=int, default=100)
+    parser.add_argument("--bookings", type=int, default=100_000, help="Approximate number of bookings")
+    parser.add_argument("--occupancy", type=float, default=0.7, help="Share of room-nights booked, 0-1")
+    parser.add_argument("--history", type=float, default=3, help="Years of past bookings before today")
+    parser.add_argument("--init", action="store_true", help="Create tables if missing and apply migrations/*.sql")
+    parser.add_argument("--reset", action="store_true", help="Delete all rooms and bookings first")
+    parser.add_argument("--seed", type=int, default=1)
+    asyncio.run(seed(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main_cli()